@@ -1,15 +1,21 @@
 import os
 import numpy as np
-import cv2
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 import tkinter as tk
 from tkinter import filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from skimage.io import imread
-from skimage.transform import AffineTransform, warp
-from skimage.measure import ransac
-import EBSDImageGenerator
-import pandas as pd
+from data_cache import ParsedDataCache, file_fingerprint
+import registration_core
+import ebsd_maps
+from display_pyramid import PyramidDisplay
+from marker_overlay import MarkerOverlay
+from contrast import ContrastEngine
+import warp_engine
+import exporters
+from job_scheduler import JobScheduler
+from live_fit import LiveAffineFit
+from memory_budget import BufferPool, StagePeaks
+import session
 
 # GUI Class
 class ImageRegistrationTool:
@@ -23,20 +29,55 @@ class ImageRegistrationTool:
         self.lrs_image_original = None        # Unmodified LRS image data
         self.transformed_image = None         # LRS image currently displayed (the "moving" image)
         self.registered_image = None
+        self.registration_transform = None    # Transform of the last registration
+        self.ebsd_header = {}                 # .ang header (XSTEP/YSTEP, ...) of the EBSD data
+        self.ebsd_maps = None                 # Maps of the .ang file, built on first use (ebsd_maps.LazyMaps)
+        self.ebsd_map_shown = None            # Map in original_image (the menu may be ahead while it builds)
+        self.lrs_sampler = None               # LRS values at EBSD points for the last registration
+        self.lrs_path = None
+        # Session state: fingerprints of the loaded inputs, the last
+        # registration (session.registration_record) and its request; the
+        # generation counts shown registrations and keys the jobs on them
+        self.input_fingerprints = {}
+        self.registration_record = None
+        self.registration_token = None
+        self.registration_generation = 0
 
         # Lists of picked points
         self.fixed_points = []
         self.moving_points = []
+        # Least-squares fit of the pairs, updated on every point edit
+        self.live_fit = LiveAffineFit()
+        # Listbox -> [(text, outlier flag), ...] of the rows it shows
+        self.point_rows = {}
 
         # Data for zoom (unused in example but included from your code)
         self.zoom_levels = [1.0, 1.0, 1.0, 1.0]  # For each subplot
+        # Downsampled display levels; zoom/pan only redraws the visible crop
+        self.display = PyramidDisplay()
 
         # Matrices for LRS data (intensity, waveNumber, shift)
         self.raw_lrs_intensity_matrix = None
         self.raw_lrs_waveNumber_matrix = None
         self.raw_lrs_shift_matrix = None
+        self.lrs_x_values = None              # LRS grid coordinates (X per column, Y per row)
+        self.lrs_y_values = None
+
+        # On-disk cache of parsed .ang / LRS CSV inputs (memory-mapped on reload)
+        self.data_cache = ParsedDataCache()
+        # Remap tables of recent transforms, reused when re-registering
+        self.warp_cache = warp_engine.CoordinateCache()
+        # Working-memory cap; larger registrations switch to the tiled warp
+        self.warp_memory_budget = warp_engine.DEFAULT_MEMORY_BUDGET
+        # Loading, registration and export run here, off the Tk main loop
+        self.jobs = JobScheduler(self.root)
+        # Registration/overlay buffers reused across runs, and per-stage
+        # peak memory while the low-memory mode is on
+        self.buffers = BufferPool()
+        self.stage_peaks = StagePeaks()
 
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         # ========== Row 0: Header label ==========
@@ -84,7 +125,9 @@ class ImageRegistrationTool:
         self.root.grid_rowconfigure(2, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
 
-        self.fig, self.axs = plt.subplots(1, 4, figsize=(16, 5))
+        # A bare Figure (no pyplot) is all the Tk canvas needs.
+        self.fig = Figure(figsize=(16, 5))
+        self.axs = self.fig.subplots(1, 4)
         titles = ["EBSD IQ Image", "LRS Image", "Registered Image", "Superimposed Image"]
         for ax, title in zip(self.axs, titles):
             ax.set_title(title)
@@ -92,14 +135,52 @@ class ImageRegistrationTool:
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         self.canvas.mpl_connect("scroll_event", self.on_zoom)
         self.canvas.mpl_connect("button_press_event", self.on_click)
+        self.canvas.mpl_connect("resize_event", lambda event: self.display.refresh_all())
+        self.contrast = ContrastEngine(self.root, self.display, self.canvas)
+        # Control points are blitted over the cached panels, not redrawn with them
+        self.fixed_markers = MarkerOverlay(self.canvas, self.axs[0], 'red')
+        self.moving_markers = MarkerOverlay(self.canvas, self.axs[1], 'blue')
 
         # ========== Row 3: Control panel (buttons) ==========
         control_frame = tk.Frame(self.root)
         control_frame.grid(row=3, column=0, columnspan=4, pady=10)
         tk.Button(control_frame, text="Load EBSD Data", command=self.load_original_image).grid(row=0, column=0, padx=5)
         tk.Button(control_frame, text="Load LRS Data", command=self.load_transformed_image).grid(row=0, column=1, padx=5)
-        tk.Button(control_frame, text="Register with Affine", command=self.register_with_affine).grid(row=0, column=2, padx=5)
-        tk.Button(control_frame, text="Register with RANSAC", command=self.register_with_ransac).grid(row=0, column=3, padx=5)
+        tk.Button(control_frame, text="Auto Pre-align", command=self.auto_prealign).grid(row=0, column=2, padx=5)
+        tk.Button(control_frame, text="Register with Affine", command=self.register_with_affine).grid(row=0, column=3, padx=5)
+        tk.Button(control_frame, text="Register with RANSAC", command=self.register_with_ransac).grid(row=0, column=4, padx=5)
+        tk.Button(control_frame, text="Clear Data Cache", command=self.clear_data_cache).grid(row=0, column=5, padx=5)
+        tk.Label(control_frame, text="Export format:").grid(row=0, column=6, padx=(15, 2))
+        formats = exporters.available_formats()
+        self.export_format = tk.StringVar(self.root, value="npz")
+        tk.OptionMenu(control_frame, self.export_format, *formats).grid(row=0, column=7, padx=5)
+        # EBSD map shown and registered against (built from one parse of the .ang)
+        tk.Label(control_frame, text="EBSD map:").grid(row=0, column=8, padx=(15, 2))
+        self.ebsd_map_name = tk.StringVar(self.root, value="ci")
+        tk.OptionMenu(control_frame, self.ebsd_map_name, *ebsd_maps.MAP_NAMES, command=self.show_ebsd_map).grid(
+            row=0, column=9, padx=5
+        )
+        tk.Button(control_frame, text="Cancel", command=self.cancel_jobs).grid(row=1, column=0, padx=5, pady=(5, 0))
+        # Polish the point fit against the image content (ecc_refine.py)
+        self.refine_registration = tk.BooleanVar(self.root, value=False)
+        tk.Checkbutton(control_frame, text="Refine on image content", variable=self.refine_registration).grid(
+            row=1, column=1, columnspan=2, sticky="w", pady=(5, 0)
+        )
+        # Reuse registration buffers and report peak memory per stage
+        self.low_memory_mode = tk.BooleanVar(self.root, value=False)
+        tk.Checkbutton(control_frame, text="Low-memory mode", variable=self.low_memory_mode,
+                       command=self.toggle_low_memory_mode).grid(row=1, column=3, sticky="w", pady=(5, 0))
+        self.status_text = tk.StringVar(self.root, value="")
+        tk.Label(control_frame, textvariable=self.status_text, anchor="w").grid(
+            row=1, column=4, columnspan=4, sticky="w", pady=(5, 0)
+        )
+        # Warp every band of a full LRS spectrum export (spectral_cube.py)
+        tk.Button(control_frame, text="Register Spectral Cube", command=self.register_spectral_cube).grid(
+            row=1, column=8, columnspan=2, padx=5, pady=(5, 0)
+        )
+        # Control points, transform and registered result, restored on reload
+        tk.Button(control_frame, text="Save Session", command=self.save_session).grid(row=2, column=0, padx=5, pady=(5, 0))
+        tk.Button(control_frame, text="Load Session", command=self.load_session).grid(row=2, column=1, padx=5, pady=(5, 0))
 
         # ========== Row 4: Point editing frame ==========
         edit_frame = tk.Frame(self.root)
@@ -114,6 +195,9 @@ class ImageRegistrationTool:
 
         tk.Button(edit_frame, text="Delete Selected Point (Original)", command=self.delete_original_point).grid(row=2, column=0, pady=5)
         tk.Button(edit_frame, text="Delete Selected Point (Transformed)", command=self.delete_transformed_point).grid(row=2, column=1, pady=5)
+        tk.Button(edit_frame, text="Snap LRS Points (Sub-pixel)", command=self.snap_lrs_points).grid(row=3, column=0, columnspan=2, pady=5)
+        self.fit_text = tk.StringVar(self.root, value="")
+        tk.Label(edit_frame, textvariable=self.fit_text, justify=tk.LEFT).grid(row=4, column=0, columnspan=2)
 
         # ========== Row 5: Logger window ==========
         logger_frame = tk.Frame(self.root)
@@ -131,6 +215,39 @@ class ImageRegistrationTool:
         self.logger.config(state=tk.DISABLED)
         self.logger.see(tk.END)
 
+    def set_status(self, message=""):
+        """Shows the state of background jobs next to the Cancel button."""
+        self.status_text.set(message)
+
+    def show_progress(self, fraction, message):
+        self.set_status(f"{message} {fraction:.0%}")
+
+    def toggle_low_memory_mode(self):
+        if self.low_memory_mode.get():
+            self.stage_peaks.enable()
+            self.log("Low-memory mode: registration buffers are reused and peak memory is reported per stage.")
+        else:
+            self.stage_peaks.disable()
+            self.buffers.release("registered")
+
+    def log_peak(self, stage):
+        message = self.stage_peaks.format(stage)
+        if message:
+            self.log(message)
+
+    def cancel_jobs(self):
+        if self.jobs.busy():
+            self.jobs.cancel()
+            self.log("Cancelling running jobs...")
+
+    def on_close(self):
+        self.jobs.shutdown()
+        try:
+            self.save_session(quiet=True)
+        except (OSError, ValueError) as e:
+            print(f"Session not saved: {e}")
+        self.root.destroy()
+
     # ----------------------------------------------------------------------
     # Mouse Events (Click + Zoom)
     # ----------------------------------------------------------------------
@@ -140,18 +257,16 @@ class ImageRegistrationTool:
             x, y = event.xdata, event.ydata
             if x is not None and y is not None:
                 self.fixed_points.append((x, y))
-                self.original_points_listbox.insert(tk.END, f"({x:.1f}, {y:.1f})")
-                self.axs[0].scatter(x, y, color='red', zorder=5)
-                self.canvas.draw()
+                self.fixed_markers.add((x, y))
+                self.update_live_fit()
 
         # If clicked inside the LRS axes:
         elif event.inaxes == self.axs[1]:
             x, y = event.xdata, event.ydata
             if x is not None and y is not None:
                 self.moving_points.append((x, y))
-                self.transformed_points_listbox.insert(tk.END, f"({x:.1f}, {y:.1f})")
-                self.axs[1].scatter(x, y, color='blue', zorder=5)
-                self.canvas.draw()
+                self.moving_markers.add((x, y))
+                self.update_live_fit()
 
     def on_zoom(self, event):
         for ax in self.axs:
@@ -183,95 +298,30 @@ class ImageRegistrationTool:
                     x_max = min(x_max, self.original_image.shape[1])
                     y_max = min(y_max, self.original_image.shape[0])
 
+                # The display pyramid swaps in the level and crop for the new
+                # limits; draw_idle folds fast scroll ticks into one redraw.
                 ax.set_xlim(x_min, x_max)
                 ax.set_ylim(y_max, y_min)
-                self.canvas.draw()
+                self.canvas.draw_idle()
 
     # ----------------------------------------------------------------------
     # Contrast Sliders
     # ----------------------------------------------------------------------
-    @staticmethod
-    def normalize_image(image, orig_dtype,contrast_factor):
-        """
-        Normalizes an adjusted image for display.
-
-        For integer images (e.g. uint8, int16, etc.):
-          - Computes the current min and max of the image.
-          - Linearly scales the image data so that the minimum becomes 0 and the maximum becomes 255.
-          - Clips any values outside [0, 255] and converts to uint8.
-
-        For float images:
-          - Computes the current min and max of the image.
-          - Linearly scales the image data so that the minimum becomes 0 and the maximum becomes 1.
-          - Clips any values outside [0, 1] and returns a float32 array.
-
-        Parameters:
-            image (np.ndarray): The contrast-adjusted image (should be float32 for arithmetic).
-            orig_dtype (dtype): The original data type of the image.
-
-        Returns:
-            np.ndarray: The normalized image ready for display.
-        """
-
-        print(f"before adusting : min: {image.min()}, max: {image.max()}, mean: {image.mean()}")
-        if image is None:
-            return None
-
-        im_min = image.min()
-        im_max = image.max()
-
-        # Avoid division by zero if the image is constant.
-        if im_max == im_min:
-            scaled = np.zeros_like(image)
-        else:
-            scaled = (image - im_min) / (im_max - im_min)
-
-        if np.issubdtype(orig_dtype, np.integer):
-            # Scale to full 0-255 range and convert to uint8.
-            scaled = scaled * 255.0
-            scaled = scaled.astype(np.float32) * contrast_factor
-            scaled = np.clip(scaled, 0, 255).astype(np.uint8)
-            #return scaled.astype(np.uint8)
-        elif np.issubdtype(orig_dtype, np.floating):
-            # Scale to full 0-1 range.
-            scaled = scaled.astype(np.float32) * contrast_factor
-            scaled = np.clip(scaled, 0, 1)
-            #return scaled.astype(np.float32)
-        adjusted = scaled
-        print(f"after adusting : min: {adjusted.min()}, max: {adjusted.max()}, mean: {adjusted.mean()}")
-        return adjusted
-
-
-    # Inside your ImageRegistrationTool class:
-
     def update_contrast_ebsd(self, value):
         """
         Adjusts the contrast of the EBSD image (axs[0]) based on slider.
         """
         if self.original_image is not None:
-            contrast_factor = float(value)
-            # Multiply the original image by the contrast factor.
-            adjusted_image = self.original_image.astype(np.float32) * contrast_factor
-            # Normalize the adjusted image to the proper display range.
-            adjusted_image = self.normalize_image(self.original_image, self.original_image.dtype,contrast_factor)
-            print(f"EBSD contrast updated: {contrast_factor}")
-            self.axs[0].imshow(adjusted_image, cmap='gray')
-            self.canvas.draw()
+            # Only the colour limits of the shown image change; ticks during
+            # a drag are coalesced into one redraw.
+            self.contrast.request(self.axs[0], float(value))
 
     def update_contrast_lrs(self, value):
         """
         Adjusts the contrast of the LRS image (axs[1]) based on slider.
-        Uses the unmodified self.lrs_image_original as a source.
         """
         if self.lrs_image_original is not None:
-            contrast_factor = float(value)
-            # Multiply the original LRS image by the contrast factor.
-            adjusted_image = self.lrs_image_original.astype(np.float32) * contrast_factor
-            # Normalize the adjusted image.
-            adjusted_image = self.normalize_image(self.lrs_image_original, self.lrs_image_original.dtype,contrast_factor)
-            print(f"LRS contrast updated: {contrast_factor}")
-            self.axs[1].imshow(adjusted_image, cmap='gray')
-            self.canvas.draw()
+            self.contrast.request(self.axs[1], float(value))
 
     # ----------------------------------------------------------------------
     # Registration Methods
@@ -280,51 +330,255 @@ class ImageRegistrationTool:
         if len(self.fixed_points) < 3 or len(self.moving_points) < 3:
             self.log("At least 3 points are required for affine registration.")
             return
+        self.start_registration("affine")
 
-        try:
-            fixed_points_coords = np.array(self.fixed_points)
-            moving_points_coords = np.array(self.moving_points)
+    def register_with_ransac(self):
+        if len(self.fixed_points) < 3 or len(self.moving_points) < 3:
+            self.log("At least 3 points are required for RANSAC registration.")
+            return
+        self.start_registration("ransac")
 
-            transform = AffineTransform()
-            transform.estimate(moving_points_coords, fixed_points_coords)
-            self.apply_transformation(transform)
+    def auto_prealign(self):
+        """
+        Places control points from an automatic pre-alignment of the LRS map
+        onto the EBSD image (replacing the picked ones) and registers with
+        them.  The points can then be corrected and registered again.
+        """
+        if self.original_image is None or self.transformed_image is None:
+            self.log("Error: Load both original and transformed images before pre-alignment.")
+            return
+        inputs = (self._input_key("ebsd"), self._map_name(), self._input_key("lrs"))
+        self.set_status("Pre-aligning...")
+        self.jobs.submit(
+            "prealign",
+            lambda job, fixed, moving: registration_core.prealign_points(
+                fixed, moving, progress=lambda done, total: job.progress(done / total, "Pre-aligning")
+            ),
+            self.original_image,
+            self.transformed_image,
+            token=None if inputs[0] is None or inputs[2] is None else inputs,
+            on_done=self.apply_prealignment,
+            on_error=lambda e: (self.set_status(), self.log(f"Pre-alignment error: {e}")),
+            on_progress=self.show_progress,
+            on_cancel=lambda: (self.set_status(), self.log("Pre-alignment cancelled.")),
+        )
 
-            # Extract rotation and scaling from the transformation matrix
-            rotation = np.degrees(np.arctan2(transform.params[1, 0], transform.params[0, 0]))
-            scale = np.sqrt(transform.params[0, 0]**2 + transform.params[1, 0]**2)
+    def apply_prealignment(self, result):
+        fixed_points, moving_points, score = result
+        self.set_status()
+        self.set_control_points(fixed_points, moving_points)
+        self.log(f"Pre-alignment placed {len(fixed_points)} control points (overlap correlation {score:.2f}).")
+        if score < 0.3:
+            self.log("Warning: Low correlation; check the control points before relying on the registration.")
+        self.start_registration("affine")
+
+    def set_control_points(self, fixed_points, moving_points):
+        """Replaces both point lists, their listboxes and markers."""
+        self.fixed_points = list(fixed_points)
+        self.moving_points = list(moving_points)
+        self.fixed_markers.set_points(self.fixed_points)
+        self.moving_markers.set_points(self.moving_points)
+        self.update_live_fit()
 
-            self.log("Affine Registration Completed.")
-            self.log(f"Rotation: {rotation:.2f} degrees")
-            self.log(f"Scaling: {scale:.2f}")
-        except Exception as e:
-            self.log(f"Affine registration error: {e}")
+    # ----------------------------------------------------------------------
+    # Live fit of the control points
+    # ----------------------------------------------------------------------
+    def update_live_fit(self):
+        """
+        Updates the least-squares fit to the current pairs and shows each
+        pair's residual in the listboxes and the fit with its RMS error below
+        them.  Only the changed pairs update the fit; nothing is warped.
+        """
+        self.live_fit.sync(self.fixed_points, self.moving_points)
+        transform = self.live_fit.transform()
+        residuals = rms = outliers = None
+        if transform is not None:
+            residuals = self.live_fit.residuals()
+            rms = self.live_fit.rms()
+            if len(residuals) > 3:
+                # Pairs far above the RMS error are likely mis-clicked.
+                outliers = residuals > max(2.0 * rms, 1.0)
+        self._show_points(self.original_points_listbox, self.fixed_points, residuals, outliers)
+        self._show_points(self.transformed_points_listbox, self.moving_points, residuals, outliers)
+        if transform is None:
+            pairs = len(self.live_fit)
+            self.fit_text.set(f"{pairs} pairs: at least 3 non-collinear pairs are needed for a fit." if pairs else "")
+            return
+        rotation, scale = registration_core.transform_summary(transform)
+        shift = transform.params[:2, 2]
+        self.fit_text.set(
+            f"{len(self.live_fit)} pairs, RMS error {rms:.2f} px | rotation {rotation:.2f} deg, "
+            f"scale {scale:.3f}, shift ({shift[0]:.1f}, {shift[1]:.1f})"
+        )
 
-    def register_with_ransac(self):
-        if len(self.fixed_points) < 3 or len(self.moving_points) < 3:
-            self.log("At least 3 points are required for RANSAC registration.")
+    def _show_points(self, listbox, points, residuals, outliers):
+        """
+        Updates the listbox rows whose text or outlier colour changed.  The
+        rows shown are remembered, so unchanged rows cost no Tk call (a refit
+        that moves every residual still rewrites every row).
+        """
+        rows = []
+        for index, (x, y) in enumerate(points):
+            text = f"({x:.1f}, {y:.1f})"
+            if residuals is not None and index < len(residuals):
+                text += f"  err {residuals[index]:.2f}"
+            flagged = bool(outliers is not None and index < len(outliers) and outliers[index])
+            rows.append((text, flagged))
+        shown = self.point_rows.get(listbox, [])
+        for index, (text, flagged) in enumerate(rows):
+            if index < len(shown) and shown[index] == (text, flagged):
+                continue
+            if index >= len(shown) or shown[index][0] != text:
+                if index < len(shown):
+                    listbox.delete(index)
+                listbox.insert(index, text)
+            listbox.itemconfig(index, fg="red" if flagged else "black")
+        if len(shown) > len(rows):
+            listbox.delete(len(rows), tk.END)
+        self.point_rows[listbox] = rows
+
+    def _delete_point_row(self, listbox, index):
+        listbox.delete(index)
+        shown = self.point_rows.get(listbox)
+        if shown is not None and index < len(shown):
+            del shown[index]
+
+    def start_registration(self, method):
+        """
+        Fits and applies the transform in a background job.  Clicking
+        "Register" again with unchanged points and images reuses the running
+        job; a changed request cancels it and starts afresh.
+        """
+        if self.original_image is None or self.transformed_image is None:
+            self.log("Error: Load both original and transformed images before registration.")
             return
 
-        try:
-            fixed_points_coords = np.array(self.fixed_points)
-            moving_points_coords = np.array(self.moving_points)
-
-            model, _ = ransac(
-                (moving_points_coords, fixed_points_coords),
-                AffineTransform,
-                min_samples=3,
-                residual_threshold=2
+        label = "Affine" if method == "affine" else "RANSAC"
+        fixed_points = list(self.fixed_points)
+        moving_points = list(self.moving_points)
+        # The intensity matrix is the shift map, so it is warped once and
+        # shared by both names.
+        channels = [self.transformed_image, self.raw_lrs_waveNumber_matrix]
+        refine = bool(self.refine_registration.get())
+        token = self._registration_token(method, fixed_points, moving_points, refine, self._map_name())
+        if token is not None and token == self.registration_token and self.registered_image is not None:
+            # Same points, images and options as the result on screen.
+            self.log(f"{label} registration unchanged; reusing the last result.")
+            self.export_registered_image()
+            return
+        request = {
+            "method": method, "refine": refine, "map_name": self._map_name(),
+            "fixed_points": fixed_points, "moving_points": moving_points, "token": token,
+        }
+        out = None
+        if self.low_memory_mode.get():
+            out = self._registration_buffer(len(channels))
+        self.set_status(f"{label} registration running...")
+        self.jobs.submit(
+            "register",
+            self._registration_job,
+            method,
+            fixed_points,
+            moving_points,
+            channels,
+            self.original_image.shape,
+            os.path.join(os.path.dirname(self.original_image_path), registration_core.TILED_OUTPUT_NAME),
+            self.original_image if refine else None,
+            out,
+            token=token,
+            on_done=lambda result: self.finish_registration(label, *result, request=request),
+            on_error=lambda e: (self.set_status(), self.log(f"{label} registration error: {e}")),
+            on_progress=self.show_progress,
+            on_cancel=lambda: (self.set_status(), self.log(f"{label} registration cancelled.")),
+        )
+
+    def _registration_buffer(self, count):
+        """
+        The reused warp output buffer.  The previous result lives in it, so
+        its panels are cleared first; while that result is still being
+        exported a fresh buffer is used instead.
+        """
+        self.display.remove(self.axs[2])
+        self.display.remove(self.axs[3])
+        self.registered_image = self.registed_lrs_waveNumber_matrix = None
+        self.registed_lrs_shift_matrix = self.registed_lrs_intensity_matrix = None
+        self.canvas.draw_idle()
+        if self.jobs.busy("export") or self.jobs.busy("store-warp"):
+            self.buffers.release("registered")
+        return self.buffers.take("registered", (count,) + self.original_image.shape[:2])
+
+    def _registration_job(self, job, method, fixed_points, moving_points, channels, output_shape, tiled_path,
+                          refine_image=None, out=None):
+        """
+        Worker side of a registration: fit, refine against ``refine_image``
+        (the EBSD image) if given, then warp every LRS channel (into ``out``
+        if given).
+        """
+        with self.stage_peaks.stage("registration"):
+            return self._register(job, method, fixed_points, moving_points, channels, output_shape, tiled_path,
+                                  refine_image, out)
+
+    def _register(self, job, method, fixed_points, moving_points, channels, output_shape, tiled_path,
+                  refine_image, out):
+        transform = registration_core.estimate_transform(method, fixed_points, moving_points)
+        job.check()
+        report = None
+        if refine_image is not None:
+            transform, report = registration_core.refine_transform(
+                transform, refine_image, channels[0],
+                progress=lambda done, total: job.progress(done / total, "Refining")
             )
-            self.apply_transformation(model)
 
-            # Extract rotation and scaling from the transformation matrix
-            rotation = np.degrees(np.arctan2(model.params[1, 0], model.params[0, 0]))
-            scale = np.sqrt(model.params[0, 0]**2 + model.params[1, 0]**2)
+        # Register the LRS image and every raw LRS channel to EBSD shape in
+        # one batched pass; too large registrations are warped tile by tile
+        # into a memory-mapped result next to the EBSD data.
+        registered, tiled_path = registration_core.warp_registration(
+            channels,
+            transform,
+            output_shape,
+            memory_budget=self.warp_memory_budget,
+            tiled_path=tiled_path,
+            cache=self.warp_cache,
+            progress=lambda done, total: job.progress(done / total, "Warping tiles"),
+            out=out
+        )
+        return transform, registered, tiled_path, report
+
+    def _input_key(self, name):
+        """Hashable fingerprint of loaded input ``name`` ("ebsd"/"lrs"), or None."""
+        fingerprint = self.input_fingerprints.get(name)
+        if fingerprint is None:
+            return None
+        return fingerprint["path"], fingerprint["size"], fingerprint["mtime_ns"], fingerprint["sha1"]
 
-            self.log("RANSAC Registration Completed.")
-            self.log(f"Rotation: {rotation:.2f} degrees")
-            self.log(f"Scaling: {scale:.2f}")
-        except Exception as e:
-            self.log(f"RANSAC registration error: {e}")
+    def _registration_token(self, method, fixed_points, moving_points, refine, map_name):
+        """
+        Identity of a registration request: options, points, EBSD map and the
+        fingerprints of the loaded files (None while an input has none).
+        """
+        inputs = tuple(self._input_key(name) for name in session.INPUTS)
+        if None in inputs:
+            return None
+        points = tuple(tuple((float(x), float(y)) for x, y in pts) for pts in (fixed_points, moving_points))
+        return (method, points, bool(refine), map_name, inputs)
+
+    def _map_name(self):
+        return self.ebsd_map_shown if self.ebsd_maps is not None else None
+
+    def finish_registration(self, label, transform, registered, tiled_path, report, request=None):
+        if report is not None:
+            import ecc_refine
+
+            self.log(ecc_refine.format_report(report))
+        self.log_peak("registration")
+        self.apply_transformation(label, transform, registered, tiled_path)
+        if request is not None:
+            self.registration_token = request["token"]
+            self.registration_record = session.registration_record(
+                request["method"], request["refine"], request["map_name"], request["fixed_points"],
+                request["moving_points"], transform, registered.shape[1:], self.input_fingerprints
+            )
+            self.store_registration(registered)
 
     # ----------------------------------------------------------------------
     # Loading Images
@@ -332,47 +586,152 @@ class ImageRegistrationTool:
     def load_original_image(self):
         file_path = filedialog.askopenfilename()
         if file_path:
-            self.original_image_path = file_path
+            self.set_status("Loading EBSD data...")
+            self.jobs.submit(
+                "load-ebsd",
+                self._read_original_image,
+                file_path,
+                self.ebsd_map_name.get(),
+                token=file_path,
+                on_done=lambda result: self.show_original_image(file_path, *result),
+                on_error=lambda e: (self.set_status(), self.log(f"Error loading EBSD file: {e}")),
+                on_cancel=self.set_status,
+            )
+
+    def _read_original_image(self, job, file_path, map_name=None):
+        with self.stage_peaks.stage("EBSD loading"):
+            workers = os.cpu_count() or 1
+            # Fingerprinted before parsing, so a file edited meanwhile reads as changed.
+            fingerprint = file_fingerprint(file_path)
             if file_path.endswith('.ang'):
-                # EBSD file
-                try:
-                    output_folder = os.path.dirname(file_path)
-                    ebsd_gen = EBSDImageGenerator.EBSDImageGenerator(file_path, output_folder)
-                    self.original_image = np.array(ebsd_gen.image)
-                    self.axs[0].imshow(self.original_image, cmap='gray')
-                    self.canvas.draw()
-                    self.log("Loaded EBSD Image.")
-                except Exception as e:
-                    self.log(f"Error loading EBSD file: {e}")
-            else:
-                # Standard image file
-                self.original_image = np.array(imread(file_path, as_gray=True))
-                self.axs[0].imshow(self.original_image, cmap='gray')
-                self.canvas.draw()
-                self.log("Loaded Original Image.")
+                # One parse serves every map, but only ``map_name`` is built
+                # now; the others are built when first selected.
+                maps, header = registration_core.load_ebsd_maps(
+                    file_path, cache=self.data_cache, workers=workers, lazy=True
+                )
+                maps.build(map_name if map_name in maps else maps.names[0])
+                return None, header, maps, fingerprint
+            image, header = registration_core.load_fixed_data(file_path, cache=self.data_cache, workers=workers)
+            return image, header, None, fingerprint
+
+    def show_original_image(self, file_path, image, header=None, maps=None, fingerprint=None):
+        self.set_status()
+        self.original_image_path = file_path
+        self.input_fingerprints["ebsd"] = fingerprint
+        self.ebsd_header = header or {}
+        self.ebsd_maps = maps
+        shown = image
+        if maps is not None:
+            if self.ebsd_map_name.get() not in maps:
+                self.ebsd_map_name.set(maps.names[0])
+            self.ebsd_map_shown = self.ebsd_map_name.get()
+            image, shown = maps.gray(self.ebsd_map_shown), maps.image(self.ebsd_map_shown)
+        self.original_image = image
+        self.display.show(self.axs[0], shown, cmap='gray')
+        self.canvas.draw()
+        self.log("Loaded EBSD Image." if file_path.endswith('.ang') else "Loaded Original Image.")
+        self.log_peak("EBSD loading")
+
+    def show_ebsd_map(self, name):
+        """Shows EBSD map ``name`` and registers against it from now on."""
+        if self.ebsd_maps is None:
+            self.log("EBSD maps are only available for .ang data.")
+            return
+        if name not in self.ebsd_maps:
+            self.log(f"EBSD map {name!r} is not available for this file.")
+            return
+        if name in self.ebsd_maps.built:
+            self._show_built_map(self.ebsd_maps, name)
+            return
+        # First use of this map: build it from the parsed columns in the background.
+        maps = self.ebsd_maps
+        self.set_status(f"Building EBSD map {name}...")
+        self.jobs.submit(
+            "build-map",
+            lambda job: maps.build(name),
+            token=(self._input_key("ebsd"), name),
+            on_done=lambda _: self._show_built_map(maps, name),
+            on_error=lambda e: (self.set_status(), self.log(f"Error building EBSD map {name!r}: {e}")),
+            on_cancel=self.set_status,
+        )
+
+    def _show_built_map(self, maps, name):
+        self.set_status()
+        if maps is not self.ebsd_maps or self.ebsd_map_name.get() != name:
+            return  # another file or map was chosen meanwhile
+        # RGB maps (IPF) are shown in colour and registered as their mean.
+        self.ebsd_map_shown = name
+        self.original_image = maps.gray(name)
+        self.display.show(self.axs[0], maps.image(name), cmap='gray')
+        self.canvas.draw()
+        self.log(f"Showing EBSD map: {name}")
 
     def load_transformed_image(self):
         file_path = filedialog.askopenfilename()
         if file_path:
-            # Store an original copy for repeated contrast adjustments
-            self.lrs_image_original = self.load_lrs_csv(file_path)
-            # Copy it for displaying
-            self.transformed_image = self.lrs_image_original.copy()
+            self.set_status("Loading LRS data...")
+            self.jobs.submit(
+                "load-lrs",
+                self._read_lrs_job,
+                file_path,
+                token=file_path,
+                on_done=lambda result: self.show_transformed_image(*result, file_path=file_path),
+                on_error=lambda e: (self.set_status(), self.log(f"Error loading LRS file: {e}")),
+                on_cancel=self.set_status,
+            )
 
-            # Show LRS in subplot[1]
-            self.axs[1].imshow(self.transformed_image, cmap='gray')
-            self.canvas.draw()
-            self.log("Loaded Transformed Image.")
+    def _read_lrs_job(self, job, file_path):
+        with self.stage_peaks.stage("LRS loading"):
+            fingerprint = file_fingerprint(file_path)
+            return self.read_lrs_arrays(file_path), fingerprint
+
+    def show_transformed_image(self, result, fingerprint=None, file_path=None):
+        arrays, from_cache = result
+        self.set_status()
+        self.lrs_path = file_path
+        self.input_fingerprints["lrs"] = fingerprint
+        if from_cache:
+            self.log("LRS data loaded from cache.")
+        self.lrs_image_original = self.set_lrs_arrays(arrays)
+        # Contrast only changes colour limits, so the displayed image is a
+        # read-only view of the original rather than a copy.
+        self.transformed_image = self.lrs_image_original.view()
+        self.transformed_image.flags.writeable = False
+
+        # Show LRS in subplot[1]
+        self.display.show(self.axs[1], self.transformed_image, cmap='gray')
+        self.canvas.draw()
+        self.log("Loaded Transformed Image.")
+        self.log_peak("LRS loading")
 
     def load_lrs_csv(self, csv_file):
         """
         Reads a CSV file and returns a 2D array of MaxIntensity values.
         Expects columns: X, Y, WaveNumber, MaxIntensity, shift.
+        Parsed matrices are cached on disk and memory-mapped on later loads.
+        """
+        arrays, from_cache = self.read_lrs_arrays(csv_file)
+        if from_cache:
+            self.log("LRS data loaded from cache.")
+        return self.set_lrs_arrays(arrays)
+
+    def read_lrs_arrays(self, csv_file):
         """
-        df = pd.read_csv(csv_file, delimiter=",")
-        intensity_matrix = df.pivot(index='Y', columns='X', values='shift').to_numpy()
-        waveNumber_matrix = df.pivot(index='Y', columns='X', values='WaveNumber').to_numpy()
-        shift_matrix = df.pivot(index='Y', columns='X', values='shift').to_numpy()
+        Grids the LRS CSV (or reuses the cached grid); safe to call off the UI thread.
+
+        Returns:
+            tuple: ({"channels", "x", "y"} arrays, True if read from the cache)
+        """
+        return registration_core.load_lrs(csv_file, cache=self.data_cache)
+
+    def set_lrs_arrays(self, arrays):
+        """Installs gridded LRS channels and returns the intensity matrix."""
+        waveNumber_matrix, shift_matrix = arrays["channels"]
+        # The displayed "intensity" has always been the shift map; share it
+        # instead of holding a second copy.
+        intensity_matrix = shift_matrix
+        self.lrs_x_values = arrays["x"]
+        self.lrs_y_values = arrays["y"]
 
         self.lrs_max = np.max(intensity_matrix)
         self.raw_lrs_intensity_matrix = intensity_matrix
@@ -381,93 +740,339 @@ class ImageRegistrationTool:
 
         return intensity_matrix
 
+    def clear_data_cache(self):
+        """Drops every cached parse so the next load re-reads the text files."""
+        removed = self.data_cache.invalidate()
+        self.log(f"Cleared {removed} cached data file(s).")
+
     # ----------------------------------------------------------------------
     # Applying Transformation
     # ----------------------------------------------------------------------
-    def apply_transformation(self, transform):
-        if self.original_image is None or self.transformed_image is None:
-            self.log("Error: Load both original and transformed images before registration.")
+    def apply_transformation(self, label, transform, registered, tiled_path=None, export=True):
+        """Shows a finished registration and exports it in the background (if ``export``)."""
+        self.set_status()
+        if tiled_path is not None:
+            self.log(f"Tiled warp written to: {tiled_path}")
+        channels = registration_core.registered_channels(registered)
+        self.registered_image = channels["intensity"]
+        self.registed_lrs_waveNumber_matrix = channels["waveNumber"]
+        self.registed_lrs_shift_matrix = channels["shift"]
+        self.registed_lrs_intensity_matrix = self.registed_lrs_shift_matrix
+        self.registration_transform = transform
+        self.registration_generation += 1
+        # Sparse lookups (e.g. grain centroids) read the raw LRS grids
+        # through the transform instead of the full registered arrays.
+        self.lrs_sampler = registration_core.make_sampler(
+            {"channels": (self.raw_lrs_waveNumber_matrix, self.raw_lrs_shift_matrix)}, transform, self.ebsd_header
+        )
+
+        # Show registered image in axs[2], superimposed in axs[3]
+        self.display.show(self.axs[2], self.registered_image, cmap='gray')
+        # Blend into a reused float32 buffer instead of two float64 temporaries;
+        # the panel still shows that buffer, so drop its levels before refilling
+        self.display.remove(self.axs[3])
+        overlay =self.buffers.take("overlay", self.original_image.shape[:2])
+        np.add(self.original_image, self.registered_image, out=overlay)
+        overlay *= 0.5
+        self.display.show(self.axs[3], overlay, cmap='gray')
+        self.canvas.draw()
+
+        # Extract rotation and scaling from the transformation matrix
+        rotation, scale = registration_core.transform_summary(transform)
+        self.log(f"{label} Registration Completed.")
+        self.log(f"Rotation: {rotation:.2f} degrees")
+        self.log(f"Scaling: {scale:.2f}")
+
+        # Optionally export the registered image
+        if export:
+            self.export_registered_image()
+
+    def sample_registered_lrs(self, x, y, physical=False, names=None):
+        """
+        Registered LRS values at EBSD points, without warping the full grids.
+
+        Parameters:
+            x, y (array-like): EBSD pixel columns/rows, or physical positions
+                (XSTEP/YSTEP units) if ``physical``.
+            names (iterable or None): Channels ("intensity", "waveNumber",
+                "shift"); default all.
+
+        Returns:
+            dict: Channel name -> values, shaped like the queries.
+        """
+        if self.lrs_sampler is None:
+            raise ValueError("Register the LRS data before sampling it at EBSD points.")
+        return self.lrs_sampler.sample(x, y, names=names, physical=physical)
+
+    def register_spectral_cube(self):
+        """
+        Applies the last registration to every band of a hyperspectral LRS
+        export (or converted cube folder), streaming the bands into a
+        memory-mapped cube next to the EBSD data.
+        """
+        if self.registration_transform is None or self.original_image is None:
+            self.log("Error: Register the LRS data before warping its spectral cube.")
+            return
+        file_path = filedialog.askopenfilename()
+        if not file_path:
             return
+        output_folder = os.path.dirname(self.original_image_path)
+        self.set_status("Warping spectral cube...")
+        self.jobs.submit(
+            "spectral-cube",
+            self._spectral_cube_job,
+            file_path,
+            self.registration_transform,
+            self.transformed_image.shape[:2],
+            self.original_image.shape[:2],
+            output_folder,
+            token=(file_path, self.registration_generation),
+            on_done=self._log_spectral_cube,
+            on_error=lambda e: (self.set_status(), self.log(f"Spectral cube error: {e}")),
+            on_progress=self.show_progress,
+            on_cancel=lambda: (self.set_status(), self.log("Spectral cube warp cancelled.")),
+        )
 
-        try:
-            # Register the LRS image to EBSD shape
-            self.registered_image = warp(
-                self.transformed_image,
-                transform.inverse,
-                output_shape=self.original_image.shape
-            )
-            self.registed_lrs_intensity_matrix = warp(
-                self.raw_lrs_intensity_matrix,
-                transform.inverse,
-                output_shape=self.original_image.shape
-            )
-            self.registed_lrs_waveNumber_matrix = warp(
-                self.raw_lrs_waveNumber_matrix,
-                transform.inverse,
-                output_shape=self.original_image.shape
+    def _spectral_cube_job(self, job, file_path, transform, lrs_shape, output_shape, output_folder):
+        import spectral_cube
+
+        with self.stage_peaks.stage("spectral cube"):
+            cube = spectral_cube.open_cube(
+                file_path, progress=lambda done, total: job.progress(done / total, "Converting export")
             )
-            self.registed_lrs_shift_matrix = warp(
-                self.raw_lrs_shift_matrix,
-                transform.inverse,
-                output_shape=self.original_image.shape
+            if cube.shape[:2] != tuple(lrs_shape):
+                raise ValueError(f"Cube grid {cube.shape[:2]} does not match the registered LRS grid {tuple(lrs_shape)}")
+            out_path = os.path.join(output_folder, registration_core.CUBE_OUTPUT_NAME)
+            warped = spectral_cube.warp_cube(
+                cube, transform, output_shape, out_path,
+                memory_budget=self.warp_memory_budget,
+                progress=lambda done, total: job.progress(done / total, "Warping bands"),
             )
+            np.save(os.path.join(output_folder, registration_core.CUBE_WAVENUMBERS_NAME), cube.wavenumbers)
+            return out_path, warped.shape
 
-            # Show registered image in axs[2], superimposed in axs[3]
-            self.axs[2].imshow(self.registered_image, cmap='gray')
-            self.axs[3].imshow(0.5 * self.original_image + 0.5 * self.registered_image, cmap='gray')
-            self.canvas.draw()
-
-            # Optionally export the registered image
-            self.export_registered_image()
-        except Exception as e:
-            self.log(f"Error during transformation: {e}")
+    def _log_spectral_cube(self, result):
+        out_path, shape = result
+        self.set_status()
+        self.log(f"Registered spectral cube ({shape[0]} bands, {shape[1]} x {shape[2]}) saved as: {out_path}")
+        self.log_peak("spectral cube")
 
     # ----------------------------------------------------------------------
     # Exporting
     # ----------------------------------------------------------------------
     def export_registered_image(self):
-        try:
-            output_folder = os.path.dirname(self.original_image_path)
-            output_path = os.path.join(output_folder, "registeredLRSImage.png")
-            output_path_lrs_intensity = os.path.join(output_folder, "registeredLrsIntensity.csv")
-            output_path_lrs_waveNumber = os.path.join(output_folder, "RegistredLrs_waveNumber.csv")
-            output_path_lrs_shift = os.path.join(output_folder, "Registred_registeredLrsShift.csv")
-
-            lrs_out_intensity = self.registered_image
-            lrs_out_waveNumber = self.registed_lrs_waveNumber_matrix
-            lrs_out_shift = self.registed_lrs_shift_matrix
-
-            # Save CSV files
-            np.savetxt(
-                output_path_lrs_intensity,
-                lrs_out_intensity,
-                delimiter=",",
-                header=f"{lrs_out_intensity.shape[0]},{lrs_out_intensity.shape[1]}",
-                comments="",
-                fmt="%.2f"
+        output_folder = os.path.dirname(self.original_image_path)
+        fmt = self.export_format.get()
+        channels = {
+            "intensity": self.registered_image,
+            "waveNumber": self.registed_lrs_waveNumber_matrix,
+            "shift": self.registed_lrs_shift_matrix,
+        }
+        self.jobs.submit(
+            "export",
+            self._export_job,
+            output_folder,
+            channels,
+            self.registration_transform.params,
+            list(self.fixed_points),
+            list(self.moving_points),
+            fmt,
+            token=(self.registration_generation, fmt),
+            on_done=self._log_export,
+            on_error=lambda e: self.log(f"Error exporting registered image: {e}"),
+        )
+
+    def _export_job(self, job, output_folder, channels, transform, fixed_points, moving_points, fmt):
+        with self.stage_peaks.stage("export"):
+            return registration_core.export_results(
+                output_folder, channels, transform, fixed_points, moving_points, fmt=fmt
             )
-            np.savetxt(
-                output_path_lrs_waveNumber,
-                lrs_out_waveNumber,
-                delimiter=",",
-                header=f"{lrs_out_intensity.shape[0]},{lrs_out_intensity.shape[1]}",
-                comments="",
-                fmt="%.2f"
+
+    def _log_export(self, result):
+        written, output_path = result
+        self.log(f"Registered LRS channels saved as: {', '.join(written)}")
+        self.log(f"Registered image saved as: {output_path}")
+        self.log_peak("export")
+
+    # ----------------------------------------------------------------------
+    # Sessions
+    # ----------------------------------------------------------------------
+    def _session_path(self):
+        return os.path.join(os.path.dirname(self.original_image_path), session.SESSION_FILE_NAME)
+
+    def store_registration(self, registered):
+        """Keeps the registered stack on disk for the session, then saves it."""
+        record = self.registration_record
+        self.jobs.submit(
+            "store-warp",
+            lambda job, folder, stack: session.store_warp(folder, stack),
+            os.path.dirname(self.original_image_path),
+            registered,
+            token=self.registration_generation,
+            on_done=lambda warp: self._stored_registration(record, warp),
+            on_error=lambda e: self.log(f"Error storing the registered result: {e}"),
+        )
+
+    def _stored_registration(self, record, warp):
+        record["warp"] = warp
+        if record is self.registration_record:
+            self.save_session(quiet=True)
+
+    def save_session(self, quiet=False):
+        """
+        Writes the input fingerprints, control points and last registration
+        to registrationSession.json next to the EBSD data.
+        """
+        if self.original_image is None or self.transformed_image is None:
+            if not quiet:
+                self.log("Error: Load both EBSD and LRS data before saving a session.")
+            return None
+        path = self._session_path()
+        session.save_session(
+            path, self.input_fingerprints, self.fixed_points, self.moving_points,
+            map_name=self._map_name(), registration=self.registration_record
+        )
+        if not quiet:
+            self.log(f"Session saved as: {path}")
+        return path
+
+    def load_session(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Registration session", "*.json"), ("All files", "*")])
+        if not file_path:
+            return
+        try:
+            saved = session.load_session(file_path)
+        except (OSError, ValueError) as e:
+            self.log(f"Error loading session: {e}")
+            return
+        self.set_status("Restoring session...")
+        self.jobs.submit(
+            "restore-session",
+            self._restore_session_job,
+            saved,
+            token=file_path,
+            on_done=lambda result: self.apply_session(file_path, saved, *result),
+            on_error=lambda e: (self.set_status(), self.log(f"Error restoring session: {e}")),
+            on_progress=self.show_progress,
+            on_cancel=lambda: (self.set_status(), self.log("Session restore cancelled.")),
+        )
+
+    def _restore_session_job(self, job, saved):
+        """
+        Worker side of a session restore: loads both inputs, then reuses the
+        saved transform and registered result unless they are stale.
+
+        Returns:
+            tuple: (current fingerprints, changed inputs, EBSD data, LRS data,
+            registration (transform, registered, tiled_path) or None,
+            recomputed steps)
+        """
+        fingerprints, changed = session.current_fingerprints(saved)
+        ebsd_path = saved["inputs"]["ebsd"]["path"]
+        ebsd = self._read_original_image(job, ebsd_path, saved.get("map_name"))[:3]
+        job.check()
+        lrs, _ = self._read_lrs_job(job, saved["inputs"]["lrs"]["path"])
+        record = saved.get("registration")
+        if record is None:
+            return fingerprints, changed, ebsd, lrs, None, []
+        job.check()
+
+        image, _, maps = ebsd
+        if maps is not None:
+            map_name = record["map_name"] if record["map_name"] in maps else maps.names[0]
+            image = maps.gray(map_name)
+        waveNumber_matrix, shift_matrix = lrs[0]["channels"]
+        recomputed = []
+        params = session.fresh_transform(record, fingerprints)
+        if params is not None:
+            transform = session.transform_from_params(params)
+        else:
+            transform = registration_core.estimate_transform(
+                record["method"], record["fixed_points"], record["moving_points"]
             )
-            np.savetxt(
-                output_path_lrs_shift,
-                lrs_out_shift,
-                delimiter=",",
-                header=f"{lrs_out_intensity.shape[0]},{lrs_out_intensity.shape[1]}",
-                comments="",
-                fmt="%.2f"
+            if record["refine"]:
+                transform, _ = registration_core.refine_transform(transform, image, shift_matrix)
+            recomputed.append("transform")
+
+        registered = session.fresh_warp(record, transform.params, image.shape, fingerprints)
+        tiled_path = None
+        if registered is None:
+            with self.stage_peaks.stage("registration"):
+                registered, tiled_path = registration_core.warp_registration(
+                    [shift_matrix, waveNumber_matrix],
+                    transform,
+                    image.shape,
+                    memory_budget=self.warp_memory_budget,
+                    tiled_path=os.path.join(os.path.dirname(ebsd_path), registration_core.TILED_OUTPUT_NAME),
+                    cache=self.warp_cache,
+                    progress=lambda done, total: job.progress(done / total, "Warping tiles"),
+                )
+            recomputed.append("warp")
+        return fingerprints, changed, ebsd, lrs, (transform, registered, tiled_path), recomputed
+
+    def apply_session(self, file_path, saved, fingerprints, changed, ebsd, lrs, registration, recomputed):
+        """Installs a restored session: inputs, control points and registration."""
+        record = saved.get("registration")
+        if saved.get("map_name"):
+            self.ebsd_map_name.set(saved["map_name"])
+        self.show_original_image(saved["inputs"]["ebsd"]["path"], *ebsd, fingerprint=fingerprints["ebsd"])
+        self.show_transformed_image(lrs, fingerprints["lrs"], file_path=saved["inputs"]["lrs"]["path"])
+        self.set_control_points(saved["fixed_points"], saved["moving_points"])
+        for name in changed:
+            self.log(f"Warning: {name.upper()} data changed since the session was saved.")
+
+        self.registration_record = self.registration_token = None
+        if registration is not None:
+            transform, registered, tiled_path = registration
+            label = "Affine" if record["method"] == "affine" else "RANSAC"
+            # Recomputed results are exported again; reused ones already were.
+            self.apply_transformation(label, transform, registered, tiled_path, export=bool(recomputed))
+            self.registration_token = self._registration_token(
+                record["method"], record["fixed_points"], record["moving_points"], record["refine"],
+                record["map_name"]
             )
+            if recomputed:
+                self.log(f"Session restored; recomputed: {', '.join(recomputed)}.")
+                self.registration_record = session.registration_record(
+                    record["method"], record["refine"], record["map_name"], record["fixed_points"],
+                    record["moving_points"], transform, registered.shape[1:], fingerprints
+                )
+                self.store_registration(registered)
+            else:
+                self.log("Session restored; reused the saved transform and registered result.")
+                self.registration_record = record
+        else:
+            self.log("Session restored (no registration saved).")
+        self.log(f"Session file: {file_path}")
+
+    # ----------------------------------------------------------------------
+    # Snapping Points
+    # ----------------------------------------------------------------------
+    def snap_lrs_points(self):
+        """
+        Moves every LRS point to the sub-pixel position where its EBSD
+        neighbourhood correlates best (see point_snapping.py).
+        """
+        if self.original_image is None or self.transformed_image is None:
+            self.log("Error: Load both original and transformed images before snapping points.")
+            return
+        import point_snapping
 
-            # Save PNG image
-            cv2.imwrite(output_path, (self.registered_image * 255).astype(np.uint8))
-            self.log(f"Registered image saved as: {output_path}")
-        except Exception as e:
-            self.log(f"Error exporting registered image: {e}")
+        try:
+            snapped, scores, moved = point_snapping.snap_points(
+                self.original_image, self.transformed_image, self.fixed_points, self.moving_points
+            )
+        except ValueError as e:
+            self.log(f"Error: {e}")
+            return
+        shifts = np.hypot(*(np.array(snapped) - np.array(self.moving_points, dtype=np.float64)).T)
+        self.set_control_points(self.fixed_points, snapped)
+        self.log(f"Snapped {moved.sum()} of {len(moved)} LRS points "
+                 f"(mean shift {shifts[moved].mean() if moved.any() else 0.0:.2f} px, "
+                 f"mean correlation {scores.mean():.2f}).")
+        kept = [str(index + 1) for index in np.flatnonzero(~moved)]
+        if kept:
+            self.log(f"Points kept where clicked (weak or ambiguous match): {', '.join(kept)}")
 
     # ----------------------------------------------------------------------
     # Deleting Points
@@ -477,16 +1082,18 @@ class ImageRegistrationTool:
         if selected:
             index = selected[0]
             self.fixed_points.pop(index)
-            self.original_points_listbox.delete(index)
-            self.canvas.draw()
+            self._delete_point_row(self.original_points_listbox, index)
+            self.fixed_markers.remove(index)
+            self.update_live_fit()
 
     def delete_transformed_point(self):
         selected = self.transformed_points_listbox.curselection()
         if selected:
             index = selected[0]
             self.moving_points.pop(index)
-            self.transformed_points_listbox.delete(index)
-            self.canvas.draw()
+            self._delete_point_row(self.transformed_points_listbox, index)
+            self.moving_markers.remove(index)
+            self.update_live_fit()
 
 
 if __name__ == "__main__":
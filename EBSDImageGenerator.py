@@ -1,22 +1,35 @@
 import os
 import warnings
 
-import cv2
 import numpy as np
-import pandas as pd
 from PIL import Image
 
+import ebsd_maps
+import hex_grid
+from ang_parser import read_ang
+
+# Zero-based .ang data column rendered by generate_image.
+IMAGE_COLUMN = 6
+
 
 class EBSDImageGenerator:
-    def __init__(self, filepath, output_folder):
+    def __init__(self, filepath, output_folder, engine="numpy", cache=None, workers=1, maps=(), lazy_maps=False):
         self.filepath = filepath
         self.output_folder = output_folder
+        self.engine = engine  # "numpy" (fast, column selective) or "pandas" (legacy)
+        self.workers = workers  # >1 parses large files in a process pool
+        self.cache = cache    # optional data_cache.ParsedDataCache
+        self.map_names = tuple(maps)  # extra maps (see ebsd_maps.MAP_NAMES), parsed in the same pass
+        self.lazy_maps = lazy_maps    # build each map on first use (ebsd_maps.LazyMaps)
         self.header = {}
         self.data = None
         self.image = None
+        self.maps = None
         self.validate_file()
         self.read_file()
         self.generate_image()
+        if self.map_names:
+            self.generate_maps()
         #self.save_image()
 
     def validate_file(self):
@@ -25,28 +38,41 @@ class EBSDImageGenerator:
         print(f"File located: {self.filepath}")
 
     def read_file(self):
-        valid_keys = {"XSTEP", "YSTEP", "NCOLS_ODD", "NROWS"}
-        with open(self.filepath, 'r') as f:
-            header_lines = [line for line in f if line.startswith('#')]
-        for line in header_lines:
-            if ':' in line:
-                key, value = line[2:].split(':')
-                key = key.strip()
-                if key in valid_keys:
-                    self.header[key] = float(value.strip())
-
-        # Read numeric data without the deprecated argument
-        self.data = pd.read_csv(self.filepath, comment='#', delim_whitespace=True, header=None, on_bad_lines='skip')
+        columns = tuple(sorted({IMAGE_COLUMN} | set(ebsd_maps.required_columns(self.map_names))))
+        variant = f"ang:columns={','.join(map(str, columns))}"
+        if self.cache is not None:
+            cached = self.cache.get(self.filepath, variant)
+            if cached is not None:
+                arrays, self.header = cached
+                self.data = {int(name): array for name, array in arrays.items()}
+                print("Header and numeric data loaded from cache.")
+                self.resample_hex_grid()
+                return
+
+        # Single pass over the file; only the columns needed for the image and maps are converted.
+        self.header, self.data = read_ang(
+            self.filepath, columns=columns, engine=self.engine, workers=self.workers
+        )
+        if self.cache is not None:
+            arrays = self.cache.put(self.filepath, variant, {str(c): a for c, a in self.data.items()}, self.header)
+            self.data = {int(name): array for name, array in arrays.items()}
         print("Header and numeric data successfully loaded.")
+        self.resample_hex_grid()
+
+    def resample_hex_grid(self):
+        """Hex-grid scans: resample every column to square XSTEP pixels (see hex_grid.py)."""
+        if hex_grid.is_hex(self.header):
+            self.header, self.data = hex_grid.to_square_grid(self.header, self.data)
+            print(f"Hex grid resampled to a square {int(self.header['NROWS'])} x {int(self.header['NCOLS_ODD'])} grid.")
 
     def generate_image(self):
         ncols_odd = int(self.header.get('NCOLS_ODD', 0))
         nrows = int(self.header.get('NROWS', 0))
-        if 6 not in self.data.columns:
+        if IMAGE_COLUMN not in self.data:
             raise ValueError("Column 7 (CI values) not found in data")
 
         expected_size = nrows * ncols_odd
-        current_size = len(self.data[5])
+        current_size = len(self.data[IMAGE_COLUMN])
 
         if current_size < expected_size:
             nrows=nrows-1
@@ -65,12 +91,29 @@ class EBSDImageGenerator:
         #     #raise ValueError(f"Data size mismatch: IQ values do not match specified grid dimensions. expected : {nrows * ncols_odd} got : {self.data[5]}")
         #     warnings.warn(f"Data size mismatch: IQ values do not match specified grid dimensions. expected : {nrows * ncols_odd} got : {self.data[5]}")
 
-        self.image =Image.fromarray(self.data[6].values.reshape(nrows, ncols_odd))
+        self.image =Image.fromarray(self.data[IMAGE_COLUMN].reshape(nrows, ncols_odd))
         print("EBSD IQ image generated successfully.")
 
+    def generate_maps(self):
+        """Builds the requested maps (ebsd_maps.EBSDMaps or LazyMaps) from the parsed columns."""
+        image = np.asarray(self.image)
+        available = ebsd_maps.available_maps(self.header)
+        names = [name for name in self.map_names if name in available]
+        if len(names) < len(self.map_names):
+            print(f"warning!!! no IPF colour key for symmetry {ebsd_maps.phase_symmetries(self.header)}; "
+                  f"skipping the IPF map")
+        if self.lazy_maps:
+            self.maps = ebsd_maps.LazyMaps(self.data, self.header, names, image.shape)
+            print(f"EBSD maps available: {', '.join(self.maps.names)}")
+            return
+        self.maps = ebsd_maps.generate_maps(self.data, self.header, names, image.shape)
+        print(f"EBSD maps generated: {', '.join(self.maps.names)}")
+
 
     def save_image(self):
         if self.image is not None:
+            import cv2
+
             output_path = os.path.join(self.output_folder, "ImageAngNi.png")
             norm_image = cv2.normalize(self.image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
             cv2.imwrite(output_path, norm_image)
@@ -0,0 +1,388 @@
+"""
+Readers for TSL/EDAX .ang EBSD scan files.
+
+The "numpy" engine memory-maps the file, parses the ``#`` header and then
+tokenizes the numeric body in line-aligned chunks with ``np.loadtxt``.  Only
+the requested columns are converted, and they are written straight into
+preallocated arrays of the requested dtype, so the full float64 table that
+pandas builds is never materialized.
+
+With ``workers > 1`` the data section is split at line-aligned byte offsets
+and the pieces are parsed in a process pool; every worker writes its rows
+directly into a shared-memory output block.
+
+The "pandas" engine is the original ``pd.read_csv`` path and is kept as a
+fallback for files the fast engine cannot handle.
+"""
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Header keys that are kept (as floats) in the parsed header dictionary.
+HEADER_KEYS = {"XSTEP", "YSTEP", "NCOLS_ODD", "NCOLS_EVEN", "NROWS"}
+
+# Header keys that are kept as strings ("SqrGrid" or "HexGrid").
+TEXT_HEADER_KEYS = {"GRID"}
+
+# "# Symmetry <code>" lines (one per phase) are collected, in phase order,
+# as a list of ints under this key.
+SYMMETRY_KEY = "SYMMETRY"
+
+# Size of the line-aligned body chunks handed to the tokenizer.
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# Files smaller than this are parsed serially even when workers > 1; the
+# process pool start-up would cost more than it saves.
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+# Byte ranges handed out per worker (more pieces than workers balances load).
+PIECES_PER_WORKER = 4
+
+ENGINES = ("numpy", "pandas")
+
+
+def parse_header_line(line, header):
+    """
+    Parses a single ``# KEY: value`` header line into ``header``.
+
+    Parameters:
+        line (str): Header line including the leading ``#``.
+        header (dict): Dictionary updated in place.
+    """
+    if ':' in line:
+        key, value = line[2:].split(':', 1)
+        key = key.strip()
+        if key in HEADER_KEYS:
+            header[key] = float(value.strip())
+        elif key in TEXT_HEADER_KEYS:
+            header[key] = value.strip()
+        return
+    fields = line[1:].split()
+    if len(fields) == 2 and fields[0] == "Symmetry":
+        header.setdefault(SYMMETRY_KEY, []).append(int(float(fields[1])))
+
+
+def read_header(buffer):
+    """
+    Reads the leading ``#`` lines of an .ang file.
+
+    Parameters:
+        buffer (bytes-like): Whole file contents (usually an mmap).
+
+    Returns:
+        tuple: (header dict, byte offset of the first data line)
+    """
+    header = {}
+    offset = 0
+    size = len(buffer)
+    while offset < size and buffer[offset:offset + 1] == b'#':
+        end = buffer.find(b'\n', offset)
+        if end == -1:
+            end = size
+        parse_header_line(bytes(buffer[offset:end]).decode('latin-1').rstrip('\r'), header)
+        offset = end + 1
+    return header, min(offset, size)
+
+
+def _normalize_dtypes(columns, dtype):
+    if isinstance(dtype, dict):
+        return {c: np.dtype(dtype.get(c, np.float32)) for c in columns}
+    return {c: np.dtype(dtype) for c in columns}
+
+
+def _first_line_fields(buffer, offset):
+    """Returns the number of whitespace separated fields on the first data line."""
+    size = len(buffer)
+    while offset < size:
+        end = buffer.find(b'\n', offset)
+        if end == -1:
+            end = size
+        line = bytes(buffer[offset:end]).split(b'#', 1)[0]
+        fields = line.split()
+        if fields:
+            return len(fields)
+        offset = end + 1
+    return 0
+
+
+def _estimate_rows(header, body_bytes, first_line_bytes):
+    ncols = int(header.get("NCOLS_ODD", 0))
+    nrows = int(header.get("NROWS", 0))
+    if ncols > 0 and nrows > 0:
+        return nrows * ncols
+    return int(body_bytes / max(first_line_bytes, 1) * 1.1) + 1
+
+
+def parse_lines_tolerant(chunk, columns, ncols):
+    """
+    Slow, line-by-line parse of a body chunk that mirrors the pandas fallback:
+    blank and comment lines are ignored, lines with too many fields are
+    skipped and short lines are padded with NaN.
+
+    Returns:
+        np.ndarray: float64 array of shape (rows, len(columns)).
+    """
+    rows = []
+    for line in chunk.splitlines():
+        fields = line.split(b'#', 1)[0].split()
+        if not fields or len(fields) > ncols:
+            continue
+        rows.append([float(fields[c]) if c < len(fields) else np.nan for c in columns])
+    if not rows:
+        return np.empty((0, len(columns)))
+    return np.asarray(rows, dtype=np.float64)
+
+
+def count_fields(chunk):
+    """Counts the whitespace separated fields in a chunk with vectorized byte tests."""
+    printable = np.frombuffer(chunk, dtype=np.uint8) > 32
+    if printable.size == 0:
+        return 0
+    return int(printable[0]) + int(np.count_nonzero(printable[1:] & ~printable[:-1]))
+
+
+def parse_chunk(chunk, columns, ncols):
+    """
+    Tokenizes one line-aligned chunk of the data section.
+
+    ``np.loadtxt`` only checks that the requested columns exist, so the total
+    field count is compared against ``rows * ncols`` to catch ragged lines;
+    such chunks go through :func:`parse_lines_tolerant` instead.
+
+    Returns:
+        np.ndarray: float64 array of shape (rows, len(columns)).
+    """
+    try:
+        values = np.loadtxt(io.BytesIO(chunk), usecols=columns, comments='#', ndmin=2)
+    except ValueError:
+        return parse_lines_tolerant(chunk, columns, ncols)
+    if count_fields(chunk) != values.shape[0] * ncols:
+        return parse_lines_tolerant(chunk, columns, ncols)
+    return values
+
+
+def _line_aligned_end(buffer, start, chunk_bytes):
+    size = len(buffer)
+    end = start + chunk_bytes
+    if end >= size:
+        return size
+    newline = buffer.find(b'\n', end)
+    return size if newline == -1 else newline + 1
+
+
+def _mmap_readonly(f):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _open_body(mm, columns):
+    header, offset = read_header(mm)
+    ncols = _first_line_fields(mm, offset)
+    missing = [c for c in columns if c >= ncols]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in data ({ncols} columns per line)")
+    return header, offset, ncols
+
+
+def _parse_range(mm, start, stop, columns, ncols, chunk_bytes):
+    """Yields float64 (rows, len(columns)) blocks for the lines in mm[start:stop]."""
+    while start < stop:
+        end = min(_line_aligned_end(mm, start, chunk_bytes), stop)
+        yield parse_chunk(mm[start:end], columns, ncols)
+        start = end
+
+
+def _read_numpy(filepath, columns, dtypes, chunk_bytes):
+    if os.path.getsize(filepath) == 0:
+        return {}, {c: np.empty(0, dtype=dtypes[c]) for c in columns}
+
+    with open(filepath, 'rb') as f, _mmap_readonly(f) as mm:
+        header, offset, ncols = _open_body(mm, columns)
+
+        first_newline = mm.find(b'\n', offset)
+        first_line_bytes = (first_newline if first_newline != -1 else len(mm)) - offset + 1
+        capacity = _estimate_rows(header, len(mm) - offset, first_line_bytes)
+        data = {c: np.empty(capacity, dtype=dtypes[c]) for c in columns}
+
+        count = 0
+        for values in _parse_range(mm, offset, len(mm), columns, ncols, chunk_bytes):
+            rows = values.shape[0]
+            if count + rows > capacity:
+                capacity = max(2 * capacity, count + rows)
+                for c in columns:
+                    data[c] = np.resize(data[c], capacity)
+            for j, c in enumerate(columns):
+                data[c][count:count + rows] = values[:, j]
+            count += rows
+
+    for c in columns:
+        if count != data[c].shape[0]:
+            data[c] = data[c][:count].copy()
+    return header, data
+
+
+# ----------------------------------------------------------------------
+# Parallel reader
+# ----------------------------------------------------------------------
+def split_body(mm, offset, pieces):
+    """Splits mm[offset:] into at most ``pieces`` line-aligned (start, stop) ranges."""
+    size = len(mm)
+    step = max((size - offset) // max(pieces, 1), 1)
+    bounds = []
+    start = offset
+    while start < size:
+        stop = _line_aligned_end(mm, start, step)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def count_lines(buffer, start, stop, block_bytes=CHUNK_BYTES):
+    """Counts the lines in buffer[start:stop], including an unterminated last line."""
+    lines = 0
+    for block_start in range(start, stop, block_bytes):
+        block = np.frombuffer(buffer, dtype=np.uint8, count=min(block_bytes, stop - block_start), offset=block_start)
+        lines += int(np.count_nonzero(block == 10))
+    if stop > start and buffer[stop - 1:stop] != b'\n':
+        lines += 1
+    return lines
+
+
+def _count_lines_worker(filepath, start, stop):
+    with open(filepath, 'rb') as f, _mmap_readonly(f) as mm:
+        return count_lines(mm, start, stop)
+
+
+def _shared_views(shm, layout, total_rows):
+    views = {}
+    byte_offset = 0
+    for column, dtype in layout:
+        dtype = np.dtype(dtype)
+        views[column] = np.ndarray((total_rows,), dtype=dtype, buffer=shm.buf, offset=byte_offset)
+        byte_offset += total_rows * dtype.itemsize
+    return views
+
+
+def _attach_shared(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attachment with the resource tracker;
+        # that is harmless as long as the workers share the parent's tracker.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _parse_worker(filepath, start, stop, columns, ncols, chunk_bytes, shm_name, layout, total_rows, row_offset):
+    """Parses mm[start:stop] and writes the rows into the shared block at ``row_offset``."""
+    shm = _attach_shared(shm_name)
+    try:
+        views = _shared_views(shm, layout, total_rows)
+        rows = 0
+        with open(filepath, 'rb') as f, _mmap_readonly(f) as mm:
+            for values in _parse_range(mm, start, stop, columns, ncols, chunk_bytes):
+                n = values.shape[0]
+                for j, c in enumerate(columns):
+                    views[c][row_offset + rows:row_offset + rows + n] = values[:, j]
+                rows += n
+        del views
+        return rows
+    finally:
+        shm.close()
+
+
+def _read_parallel(filepath, columns, dtypes, chunk_bytes, workers, min_bytes):
+    if os.path.getsize(filepath) < max(min_bytes, 1):
+        return _read_numpy(filepath, columns, dtypes, chunk_bytes)
+
+    with open(filepath, 'rb') as f, _mmap_readonly(f) as mm:
+        header, offset, ncols = _open_body(mm, columns)
+        bounds = split_body(mm, offset, workers * PIECES_PER_WORKER)
+    if len(bounds) < 2:
+        return _read_numpy(filepath, columns, dtypes, chunk_bytes)
+
+    # Start the tracker before forking so the workers share it instead of each
+    # spawning their own one that would unlink the block when they exit.
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Pass 1: line counts give every piece an upper bound on its rows and
+        # therefore a fixed slot in the shared output block.
+        line_counts = list(pool.map(_count_lines_worker, *zip(*[(filepath, a, b) for a, b in bounds])))
+        slots = np.concatenate([[0], np.cumsum(line_counts)]).astype(np.int64)
+        total_lines = int(slots[-1])
+
+        layout = [(c, dtypes[c].str) for c in columns]
+        block_bytes = max(sum(total_lines * dtypes[c].itemsize for c in columns), 1)
+        shm = shared_memory.SharedMemory(create=True, size=block_bytes)
+        try:
+            # Pass 2: parse every piece straight into its slot.
+            futures = [
+                pool.submit(_parse_worker, filepath, a, b, columns, ncols, chunk_bytes,
+                            shm.name, layout, total_lines, int(slots[i]))
+                for i, (a, b) in enumerate(bounds)
+            ]
+            rows = [future.result() for future in futures]
+
+            # Blank / skipped lines leave gaps at the end of a slot; copy the
+            # filled part of every slot out of the shared block.
+            views = _shared_views(shm, layout, total_lines)
+            count = int(sum(rows))
+            data = {c: np.empty(count, dtype=dtypes[c]) for c in columns}
+            position = 0
+            for i, n in enumerate(rows):
+                for c in columns:
+                    data[c][position:position + n] = views[c][slots[i]:slots[i] + n]
+                position += n
+            del views
+        finally:
+            shm.close()
+            shm.unlink()
+    return header, data
+
+
+def _read_pandas(filepath, columns, dtypes):
+    import pandas as pd
+
+    header = {}
+    with open(filepath, 'r') as f:
+        header_lines = [line for line in f if line.startswith('#')]
+    for line in header_lines:
+        parse_header_line(line.rstrip('\n'), header)
+
+    frame = pd.read_csv(filepath, comment='#', sep=r'\s+', header=None, on_bad_lines='skip')
+    missing = [c for c in columns if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in data ({len(frame.columns)} columns per line)")
+    data = {c: frame[c].to_numpy(dtype=dtypes[c]) for c in columns}
+    return header, data
+
+
+def read_ang(filepath, columns=(6,), dtype=np.float32, engine="numpy", chunk_bytes=CHUNK_BYTES, workers=1,
+             parallel_min_bytes=PARALLEL_MIN_BYTES):
+    """
+    Reads the header and selected numeric columns of an .ang file.
+
+    Parameters:
+        filepath (str): Path to the .ang file.
+        columns (sequence of int): Zero-based data columns to extract.
+        dtype (dtype or dict): Output dtype, or a {column: dtype} mapping.
+        engine (str): "numpy" (single pass, column selective) or "pandas".
+        chunk_bytes (int): Approximate chunk size for the "numpy" engine.
+        workers (int): Worker processes for the "numpy" engine; values above
+            one parse large files in parallel with identical results.
+        parallel_min_bytes (int): Files smaller than this are parsed serially.
+
+    Returns:
+        tuple: (header dict, {column: 1-D np.ndarray})
+    """
+    columns = tuple(int(c) for c in columns)
+    dtypes = _normalize_dtypes(columns, dtype)
+    if engine == "numpy" and workers and workers > 1:
+        return _read_parallel(filepath, columns, dtypes, chunk_bytes, workers, parallel_min_bytes)
+    if engine == "numpy":
+        return _read_numpy(filepath, columns, dtypes, chunk_bytes)
+    if engine == "pandas":
+        return _read_pandas(filepath, columns, dtypes)
+    raise ValueError(f"Unknown .ang parser engine: {engine!r} (expected one of {ENGINES})")
@@ -0,0 +1,172 @@
+"""
+Headless batch registration of EBSD/LRS pairs.
+
+Usage:
+    python batch_register.py MANIFEST [--workers N] [--format npz|hdf5|zarr|csv]
+                             [--method affine|ransac] [--seed N] [--refine] [--map NAME]
+                             [--backend NAME] [--report FILE]
+
+The manifest is a CSV file with a header and one job per line:
+
+    fixed,lrs,points[,method][,output]
+    scan1/map.ang,scan1/lrs.csv,scan1/points.csv,affine,
+    scan2/map.ang,scan2/lrs.csv,scan2/registeredLRS.npz,ransac,results/scan2
+    scan3/map.ang,scan3/lrs.csv,auto,,
+
+``fixed`` is an EBSD .ang file or an image, ``lrs`` the LRS CSV export and
+``points`` a control-point file (see registration_core.read_control_points)
+or ``auto`` to place the points by automatic pre-alignment (prealign.py).
+Relative paths are resolved against the manifest folder.  Empty ``method``
+/ ``output`` fall back to the command-line method and the folder of the
+fixed file, which is where the GUI writes its exports.  ``--map`` registers
+.ang inputs against another EBSD map (ci, iq, phase, fit or ipf; see
+ebsd_maps.py) instead of the default image (.ang data column 6).
+
+The warp backend is picked by timing unless ``--backend`` names one
+(skimage is the reference).  All backends agree with skimage to within
+warp_engine.EQUIVALENCE_RTOL of the value range, so results match the GUI's
+to that tolerance; each job's result records the backend it used.
+
+Jobs run in a process pool; a failing job is reported and does not stop the
+others.  The exit status is non-zero if any job failed.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ebsd_maps
+import warp_engine
+
+
+def read_manifest(manifest_path):
+    """Reads the job manifest into a list of job dicts with absolute paths."""
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+
+    def resolve(path):
+        return os.path.normpath(os.path.join(folder, path)) if path else None
+
+    def resolve_points(points):
+        return points if points == "auto" else resolve(points)
+
+    jobs = []
+    with open(manifest_path, newline='') as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            missing = [key for key in ("fixed", "lrs", "points") if not (row.get(key) or "").strip()]
+            if missing:
+                raise ValueError(f"{manifest_path}:{line_number}: missing {', '.join(missing)}")
+            jobs.append({
+                "fixed": resolve(row["fixed"].strip()),
+                "lrs": resolve(row["lrs"].strip()),
+                "points": resolve_points(row["points"].strip()),
+                "method": (row.get("method") or "").strip() or None,
+                "output": resolve((row.get("output") or "").strip()),
+            })
+    return jobs
+
+
+def run_job(job, method, fmt, memory_budget, seed, refine=False, fixed_map=None, backend="auto"):
+    """Runs one manifest job; never raises, so one failure cannot stop the batch."""
+    import registration_core
+
+    start = time.perf_counter()
+    result = {"job": job}
+    try:
+        if job["output"]:
+            os.makedirs(job["output"], exist_ok=True)
+        summary = registration_core.register(
+            job["fixed"],
+            job["lrs"],
+            job["points"],
+            method=job["method"] or method,
+            output_folder=job["output"],
+            fmt=fmt,
+            memory_budget=memory_budget,
+            rng=seed,
+            refine=refine,
+            fixed_map=fixed_map,
+            backend=backend
+        )
+        result.update(summary, status="ok")
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, workers=None, method="affine", fmt="npz", memory_budget=warp_engine.DEFAULT_MEMORY_BUDGET,
+              seed=None, refine=False, fixed_map=None, backend="auto"):
+    """
+    Runs ``jobs`` across a process pool.
+
+    Returns:
+        list: One result dict per job, in manifest order.
+    """
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_job, job, method, fmt, memory_budget, seed, refine, fixed_map, backend): index
+            for index, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory).
+                results[index] = {"job": jobs[index], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            report_result(index, results[index])
+    return results
+
+
+def report_result(index, result):
+    name = os.path.basename(result["job"]["fixed"])
+    if result["status"] == "ok":
+        timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"].items())
+        print(f"[{index + 1}] {name}: ok in {result['seconds']:.2f}s ({timings}); "
+              f"rotation {result['rotation']:.2f} deg, scale {result['scale']:.2f}, {result['backend']} warp")
+        if "refinement" in result:
+            refinement = result["refinement"]
+            print(f"    refined in {sum(refinement['iterations'])} iterations: correlation "
+                  f"{refinement['metric_before']:.3f} -> {refinement['metric_after']:.3f}")
+    else:
+        print(f"[{index + 1}] {name}: FAILED: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="CSV manifest of registration jobs")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--method", choices=("affine", "ransac"), default="affine",
+                        help="method for jobs that do not name one")
+    parser.add_argument("--format", dest="fmt", default="npz", help="export format (npz, hdf5, zarr, csv)")
+    parser.add_argument("--memory-budget-mb", type=int, default=warp_engine.DEFAULT_MEMORY_BUDGET // 1024 ** 2,
+                        help="warp working-memory cap; larger registrations use the tiled warp")
+    parser.add_argument("--seed", type=int, default=None, help="RANSAC seed for reproducible runs")
+    parser.add_argument("--refine", action="store_true",
+                        help="refine each fitted transform on the image content (ECC)")
+    parser.add_argument("--map", dest="fixed_map", choices=ebsd_maps.MAP_NAMES, default=None,
+                        help=".ang map to register against (default: data column 6, as the GUI)")
+    parser.add_argument("--backend", choices=("auto",) + tuple(warp_engine.BACKENDS), default="auto",
+                        help="warp backend (default: the fastest equivalent one, picked by timing)")
+    parser.add_argument("--report", help="write per-job results as JSON to this file")
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+    start = time.perf_counter()
+    results = run_batch(jobs, args.workers, args.method, args.fmt, args.memory_budget_mb * 1024 ** 2, args.seed,
+                        args.refine, args.fixed_map, args.backend)
+    failed = sum(result["status"] != "ok" for result in results)
+    print(f"{len(results) - failed}/{len(results)} jobs succeeded in {time.perf_counter() - start:.2f}s")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,661 @@
+"""
+Micro-benchmarks for the data loading and registration pipeline.
+
+Usage:
+    python benchmarks.py ang-parsers [--ang FILE] [--rows N] [--cols N] [--repeat N]
+    python benchmarks.py ang-parallel [--ang FILE] [--workers 1 2 4 8 16]
+    python benchmarks.py ang-maps [--ang FILE] [--rows N] [--cols N]
+    python benchmarks.py ang-hex [--rows N] [--cols N]
+    python benchmarks.py warp [--size N] [--channels N]
+    python benchmarks.py warp-backends [--size N] [--channels N] [--order N]
+    python benchmarks.py warp-tiled [--size N] [--channels N] [--budget-mb N]
+    python benchmarks.py cube-warp [--size N] [--bands N] [--lrs-size N] [--budget-mb N]
+    python benchmarks.py export [--size N]
+    python benchmarks.py display [--size N]
+    python benchmarks.py markers [--size N] [--points N]
+    python benchmarks.py contrast [--size N]
+    python benchmarks.py ransac [--points N ...] [--outliers F] [--trials N]
+    python benchmarks.py prealign [--sizes N ...] [--rotation DEG]
+    python benchmarks.py imports [--modules NAME ...] [--scale F] [--importtime]
+
+When no input file is given a synthetic .ang scan of the requested size is
+written to a temporary folder first.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+# Import-time budgets: module -> (seconds, heavy modules it must not load).
+# The core and CLI only need NumPy; the GUI needs matplotlib but loads OpenCV
+# (display pyramid) and the analysis libraries on first use.
+HEAVY_MODULES = ("cv2", "numba", "scipy", "skimage", "pandas", "h5py", "zarr", "matplotlib", "tkinter")
+GUI_HEAVY = ("cv2", "numba", "scipy", "skimage", "pandas", "h5py", "zarr", "matplotlib.pyplot")
+IMPORT_BUDGETS = {
+    "ang_parser": (0.3, HEAVY_MODULES),
+    "EBSDImageGenerator": (0.4, HEAVY_MODULES),
+    "lrs_grid": (0.3, HEAVY_MODULES),
+    "exporters": (0.3, HEAVY_MODULES),
+    "warp_engine": (0.3, HEAVY_MODULES),
+    "spectral_cube": (0.3, HEAVY_MODULES),
+    "registration_core": (0.4, HEAVY_MODULES),
+    "batch_register": (0.4, HEAVY_MODULES),
+    "CorrelativeMicroscopyTool": (1.2, GUI_HEAVY),
+}
+
+
+# ----------------------------------------------------------------------
+# Synthetic inputs
+# ----------------------------------------------------------------------
+def write_synthetic_ang(path, nrows, ncols, seed=0, hexagonal=False):
+    """
+    Writes a square-grid (or hex-grid: odd rows one point shorter and
+    shifted by half a step) .ang file with random values in the usual 10
+    TSL columns.
+    """
+    rng = np.random.default_rng(seed)
+    step = 0.5
+    ystep = step * np.sqrt(3) / 2 if hexagonal else step
+    lengths = np.where(np.arange(nrows) % 2 == 1, ncols - 1, ncols) if hexagonal else np.full(nrows, ncols)
+    row = np.repeat(np.arange(nrows), lengths)
+    col = np.arange(len(row)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    n = len(row)
+    table = np.column_stack([
+        rng.uniform(0, 2 * np.pi, (n, 3)),              # phi1, PHI, phi2
+        (col + 0.5 * (row % 2 if hexagonal else 0)) * step, row * ystep,  # x, y
+        rng.uniform(0, 5000, n),                        # IQ
+        rng.uniform(-1, 1, n),                          # CI
+        rng.integers(0, 2, n),                          # phase
+        rng.uniform(0, 2000, n),                        # detector intensity
+        rng.uniform(0, 3, n),                           # fit
+    ])
+    with open(path, 'w') as f:
+        f.write("# TEM_PIXperUM          1.000000\n")
+        f.write(f"# GRID: {'HexGrid' if hexagonal else 'SqrGrid'}\n")
+        f.write(f"# XSTEP: {step:.6f}\n# YSTEP: {ystep:.6f}\n")
+        f.write(f"# NCOLS_ODD: {ncols}\n# NCOLS_EVEN: {ncols - 1 if hexagonal else ncols}\n# NROWS: {nrows}\n#\n")
+        np.savetxt(f, table, fmt=["%9.5f"] * 3 + ["%12.5f"] * 2 + ["%.1f", "%6.3f", "%2d", "%6d", "%6.3f"])
+    return path
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _ang_input(args, folder):
+    if args.ang:
+        return args.ang
+    path = os.path.join(folder, "synthetic.ang")
+    print(f"Writing synthetic scan {args.rows} x {args.cols} to {path}")
+    return write_synthetic_ang(path, args.rows, args.cols)
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+def bench_ang_parsers(args):
+    from ang_parser import read_ang
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = _ang_input(args, folder)
+        size_mb = os.path.getsize(path) / 1e6
+        results = {}
+        for engine in ("pandas", "numpy"):
+            seconds, (_, data) = _time(lambda: read_ang(path, columns=(6,), engine=engine), args.repeat)
+            results[engine] = data[6]
+            print(f"{engine:>8}: {seconds:8.3f} s  {size_mb / seconds:8.1f} MB/s")
+        same = np.array_equal(results["numpy"], results["pandas"])
+        print(f"Identical output: {same}")
+
+
+def bench_ang_parallel(args):
+    from ang_parser import read_ang
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = _ang_input(args, folder)
+        size_mb = os.path.getsize(path) / 1e6
+        serial_seconds, (serial_header, serial) = _time(lambda: read_ang(path, columns=(6,)), args.repeat)
+        print(f"  serial: {serial_seconds:8.3f} s  {size_mb / serial_seconds:8.1f} MB/s")
+        for workers in args.workers:
+            seconds, (header, data) = _time(
+                lambda: read_ang(path, columns=(6,), workers=workers, parallel_min_bytes=0), args.repeat
+            )
+            same = header == serial_header and np.array_equal(data[6], serial[6])
+            print(f"{workers:>3} workers: {seconds:8.3f} s  speedup {serial_seconds / seconds:5.2f}x  identical: {same}")
+
+
+def bench_ang_maps(args):
+    import ebsd_maps
+    from ang_parser import read_ang
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = _ang_input(args, folder)
+        names = ebsd_maps.MAP_NAMES
+
+        def per_map():
+            # One parse per map, as separate generator runs would do.
+            for name in names:
+                header, data = read_ang(path, columns=ebsd_maps.required_columns([name]))
+                shape = (int(header["NROWS"]), int(header["NCOLS_ODD"]))
+                ebsd_maps.generate_maps(data, header, [name], shape)
+
+        def one_pass():
+            header, data = read_ang(path, columns=ebsd_maps.required_columns(names))
+            shape = (int(header["NROWS"]), int(header["NCOLS_ODD"]))
+            return data, header, shape, ebsd_maps.generate_maps(data, header, names, shape)
+
+        separate, _ = _time(per_map, args.repeat)
+        combined, (data, header, shape, maps) = _time(one_pass, args.repeat)
+        ipf, _ = _time(lambda: ebsd_maps.generate_maps(data, header, ["ipf"], shape), args.repeat)
+        pixels = shape[0] * shape[1]
+        print(f"maps {', '.join(maps.names)} ({maps.stack.shape[0]} channels, {maps.stack.nbytes / 1e6:.0f} MB)")
+        print(f"  one parse per map: {separate:8.3f} s")
+        print(f"  single pass:       {combined:8.3f} s  speedup {separate / combined:5.2f}x")
+        print(f"  IPF colouring:     {ipf:8.3f} s  {pixels / ipf / 1e6:8.1f} Mpixel/s")
+
+
+def bench_ang_hex(args):
+    import ebsd_maps
+    import hex_grid
+    from ang_parser import read_ang
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "synthetic_hex.ang")
+        print(f"Writing synthetic hex scan {args.rows} x {args.cols} to {path}")
+        write_synthetic_ang(path, args.rows, args.cols, hexagonal=True)
+        header, data = read_ang(path, columns=ebsd_maps.required_columns(ebsd_maps.MAP_NAMES))
+        geom = hex_grid.geometry(header)
+        cache = hex_grid.PlanCache()
+        first, (square, _) = _time(lambda: hex_grid.to_square_grid(header, data, cache=cache), 1)
+        cached, _ = _time(lambda: hex_grid.to_square_grid(header, data, cache=cache), args.repeat)
+        plan = cache.get(geom)
+        gather, _ = _time(lambda: plan.resample(data[6]), args.repeat)
+        print(f"{len(data)} columns, {hex_grid.point_count(geom)} points -> "
+              f"{int(square['NROWS'])} x {int(square['NCOLS_ODD'])} square pixels "
+              f"(plan {plan.nbytes() / 1e6:.0f} MB)")
+        print(f"  first load (plan + gather): {first * 1000:8.1f} ms")
+        print(f"  cached plan (gather only):  {cached * 1000:8.1f} ms  speedup {first / cached:5.2f}x")
+        print(f"  one linear column:          {gather * 1000:8.1f} ms")
+
+
+def _example_transform():
+    from skimage.transform import AffineTransform
+
+    return AffineTransform(scale=(6.1, 5.9), rotation=0.2, translation=(5, -3))
+
+
+def bench_warp(args):
+    from skimage.transform import warp
+    import warp_engine
+
+    rng = np.random.default_rng(0)
+    channels = [rng.random((args.size // 6, args.size // 6)) for _ in range(args.channels)]
+    transform = _example_transform()
+    shape = (args.size, args.size)
+
+    seconds, reference = _time(
+        lambda: [warp(c, transform.inverse, output_shape=shape) for c in channels], args.repeat
+    )
+    print(f"skimage warp x{args.channels}: {seconds:8.3f} s")
+    warp_engine.warp_channels(channels, transform, shape)  # backend selection happens once
+    seconds, batched = _time(lambda: warp_engine.warp_channels(channels, transform, shape), args.repeat)
+    print(f"   warp_channels: {seconds:8.3f} s")
+    cache = warp_engine.CoordinateCache()
+    warp_engine.warp_channels(channels, transform, shape, cache=cache)
+    seconds, _ = _time(lambda: warp_engine.warp_channels(channels, transform, shape, cache=cache), args.repeat)
+    print(f"  (cached table): {seconds:8.3f} s")
+    error = max(float(np.max(np.abs(b - r))) for b, r in zip(batched, reference))
+    print(f"Max abs difference: {error:.2e}")
+
+
+def bench_warp_backends(args):
+    import warp_engine
+
+    rng = np.random.default_rng(0)
+    transform = _example_transform()
+    shape = (args.size, args.size)
+    for dtype in (np.float32, np.float64):
+        channels = [rng.random((args.size // 6, args.size // 6)).astype(dtype) for _ in range(args.channels)]
+        print(f"{np.dtype(dtype).name}, {args.channels} channel(s), {args.size} x {args.size}, order {args.order}:")
+        for name in warp_engine.available_backends():
+            backend = warp_engine.BACKENDS[name]
+            if not backend.supports(args.order, channels[0].shape):
+                continue
+            warp_engine.warp_channels(channels, transform, shape, order=args.order, backend=name)
+            seconds, _ = _time(
+                lambda: warp_engine.warp_channels(channels, transform, shape, order=args.order, backend=name),
+                args.repeat
+            )
+            error = warp_engine.check_backend(name, order=args.order)
+            print(f"  {name:>8}: {seconds:8.3f} s   max diff vs skimage {error:.1e} of range")
+        selected = warp_engine.select_backend(shape, dtype, args.channels, args.order, channels[0].shape)
+        print(f"  auto selects: {selected}")
+
+
+def bench_warp_tiled(args):
+    import tracemalloc
+    import warp_engine
+
+    rng = np.random.default_rng(0)
+    channels = [rng.random((args.size // 6, args.size // 6)).astype(np.float32) for _ in range(args.channels)]
+    transform = _example_transform()
+    shape = (args.size, args.size)
+    warp_engine.warp_channels(channels, transform, (64, 64))  # backend selection outside the measurement
+
+    with tempfile.TemporaryDirectory() as folder:
+        for label, run in (
+            ("in-memory", lambda: warp_engine.warp_channels(channels, transform, shape)),
+            ("tiled", lambda: warp_engine.warp_tiled(
+                channels, transform, shape, out=os.path.join(folder, "out.npy"),
+                memory_budget=args.budget_mb * 1024 ** 2)),
+        ):
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = run()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del result
+            print(f"{label:>10}: {seconds:8.3f} s   peak traced memory {peak / 1024 ** 2:8.1f} MB")
+
+
+def bench_cube_warp(args):
+    import tracemalloc
+    import spectral_cube
+
+    transform = _example_transform()
+    edge = args.lrs_size
+    with tempfile.TemporaryDirectory() as folder:
+        # Synthetic converted cube: smooth spectra on an edge x edge LRS grid.
+        cube_folder = os.path.join(folder, "synthetic.cube")
+        os.makedirs(cube_folder)
+        cube = np.lib.format.open_memmap(os.path.join(cube_folder, spectral_cube.CUBE_FILE), mode='w+',
+                                         dtype=np.float32, shape=(edge, edge, args.bands))
+        bands = np.linspace(0, 1, args.bands, dtype=np.float32)
+        for row in range(edge):
+            cube[row] = np.sin(6 * bands[None, :] + row / edge + np.arange(edge)[:, None] / edge)
+        cube.flush()
+        del cube
+        np.savez(os.path.join(cube_folder, spectral_cube.AXES_FILE), wavenumbers=np.linspace(100, 3200, args.bands),
+                 x=np.arange(edge, dtype=np.float64), y=np.arange(edge, dtype=np.float64),
+                 measured=np.ones((edge, edge), dtype=bool))
+        cube = spectral_cube.SpectralCube(cube_folder)
+
+        budget = args.budget_mb * 1024 ** 2
+        tracemalloc.start()
+        start = time.perf_counter()
+        out = spectral_cube.warp_cube(cube, transform, (args.size, args.size), os.path.join(folder, "out.npy"),
+                                      memory_budget=budget)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        block = spectral_cube.block_bands_for_budget(cube.shape[:2], cube.bands, budget)
+        print(f"{args.bands} bands, {edge} x {edge} -> {args.size} x {args.size} "
+              f"(cube {cube.cube.nbytes / 1024 ** 2:.0f} MB, result {out.nbytes / 1024 ** 2:.0f} MB), "
+              f"{block} bands per block")
+        print(f"  {seconds:8.3f} s   {cube.bands / seconds:8.1f} bands/s   "
+              f"peak traced memory {peak / 1024 ** 2:8.1f} MB (budget {args.budget_mb} MB)")
+        del out
+
+
+def _folder_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_export(args):
+    import exporters
+
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:args.size, 0:args.size].astype(np.float32)
+    # Smooth maps with noise, like registered LRS channels.
+    channels = {
+        "intensity": (np.sin(xx / 50) * np.cos(yy / 70) * 20 + 30 + rng.normal(0, 1, xx.shape)).astype(np.float32),
+        "waveNumber": (520 + np.sin(yy / 90) * 5 + rng.normal(0, 0.5, xx.shape)).astype(np.float32),
+        "shift": (np.cos(xx / 40) * 10 + 25 + rng.normal(0, 1, xx.shape)).astype(np.float32),
+    }
+    raw_mb = sum(array.nbytes for array in channels.values()) / 1e6
+    transform = np.eye(3)
+    points = rng.random((10, 2)) * args.size
+
+    print(f"{len(channels)} channels, {args.size} x {args.size} float32 ({raw_mb:.1f} MB raw)")
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt in exporters.available_formats():
+            base = os.path.join(folder, fmt)
+            os.makedirs(base)
+            seconds, written = _time(
+                lambda: exporters.export_registration(
+                    os.path.join(base, "registeredLRS"), channels, transform, points, points, fmt=fmt),
+                args.repeat
+            )
+            size_mb = sum(_folder_size(path) for path in written) / 1e6
+            print(f"{fmt:>6}: {seconds:8.3f} s  {raw_mb / seconds:8.1f} MB/s   {size_mb:8.1f} MB on disk")
+
+
+def bench_display(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from display_pyramid import PyramidDisplay
+
+    rng = np.random.default_rng(0)
+    image = rng.random((args.size, args.size), dtype=np.float32)
+    # Full view, then zoomed in 4x and 32x around the centre.
+    views = [(args.size / 2, args.size / 2 / zoom) for zoom in (1, 4, 32)]
+
+    for label, use_pyramid in (("imshow", False), ("pyramid", True)):
+        fig, ax = plt.subplots(figsize=(8, 8), dpi=100)
+        start = time.perf_counter()
+        if use_pyramid:
+            PyramidDisplay().show(ax, image, cmap="gray")
+        else:
+            ax.imshow(image, cmap="gray")
+        setup = time.perf_counter() - start
+        timings = []
+        for centre, half in views:
+            ax.set_xlim(centre - half, centre + half)
+            ax.set_ylim(centre + half, centre - half)
+            seconds, _ = _time(fig.canvas.draw, args.repeat)
+            timings.append(seconds)
+        plt.close(fig)
+        print(f"{label:>8}: setup {setup:6.3f} s   redraw full/4x/32x: "
+              + "  ".join(f"{seconds * 1000:7.1f} ms" for seconds in timings))
+
+
+def bench_markers(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from display_pyramid import PyramidDisplay
+    from marker_overlay import MarkerOverlay
+
+    rng = np.random.default_rng(0)
+    image = rng.random((args.size, args.size), dtype=np.float32)
+    points = rng.random((args.points, 2)) * args.size
+
+    for label in ("scatter+draw", "overlay"):
+        fig, axs = plt.subplots(1, 4, figsize=(16, 5))
+        display = PyramidDisplay()
+        for ax in axs:
+            display.show(ax, image, cmap="gray")
+        overlay = MarkerOverlay(fig.canvas, axs[0], "red") if label == "overlay" else None
+        fig.canvas.draw()
+        timings = []
+        for x, y in points:
+            start = time.perf_counter()
+            if overlay is None:
+                axs[0].scatter(x, y, color="red", zorder=5)
+                fig.canvas.draw()
+            else:
+                overlay.add((x, y))
+            timings.append(time.perf_counter() - start)
+        plt.close(fig)
+        print(f"{label:>13}: point 1 {timings[0] * 1000:6.1f} ms   point {args.points} {timings[-1] * 1000:6.1f} ms"
+              f"   mean {np.mean(timings) * 1000:6.1f} ms")
+
+
+def bench_contrast(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from contrast import ContrastEngine
+    from display_pyramid import PyramidDisplay
+
+    rng = np.random.default_rng(0)
+    image = rng.random((args.size, args.size), dtype=np.float32) * 5000
+    factors = np.linspace(1.0, 5.0, 10)
+
+    def legacy(ax, factor):
+        # Previous slider path: renormalise, scale, clip, new imshow artist
+        # (which used to pile up on the axes; dropped here to bound memory).
+        for old in list(ax.images):
+            old.remove()
+        im_min, im_max = image.min(), image.max()
+        scaled = ((image - im_min) / (im_max - im_min)).astype(np.float32) * factor
+        ax.imshow(np.clip(scaled, 0, 1), cmap="gray")
+
+    for label in ("legacy", "set_clim"):
+        fig, ax = plt.subplots(figsize=(8, 8), dpi=100)
+        display = PyramidDisplay()
+        display.show(ax, image, cmap="gray")
+        engine = ContrastEngine(None, display, fig.canvas)
+        fig.canvas.draw()
+        start = time.perf_counter()
+        for factor in factors:
+            if label == "legacy":
+                legacy(ax, factor)
+            else:
+                engine.apply(ax, factor)
+            fig.canvas.draw()
+        seconds = (time.perf_counter() - start) / len(factors)
+        plt.close(fig)
+        print(f"{label:>9}: {seconds * 1000:8.1f} ms per slider tick (incl. redraw)")
+
+
+def bench_ransac(args):
+    import warnings
+    from skimage.measure import ransac
+    from skimage.transform import AffineTransform
+    from ransac_engine import ransac_affine
+
+    rng = np.random.default_rng(0)
+    truth = _example_transform()
+    for n in args.points:
+        src = rng.random((n, 2)) * 100
+        dst = truth(src) + rng.normal(0, 0.5, (n, 2))
+        outliers = rng.random(n) < args.outliers
+        dst[outliers] = rng.random((outliers.sum(), 2)) * 600
+
+        print(f"{n} points, {outliers.mean():.0%} outliers, {args.trials} trials:")
+        runs = (
+            ("skimage", lambda: ransac((src, dst), AffineTransform, min_samples=3, residual_threshold=2,
+                                       max_trials=args.trials, rng=0)),
+            ("batched", lambda: ransac_affine(src, dst, max_trials=args.trials, stop_probability=1, rng=0)),
+            ("batched+early stop", lambda: ransac_affine(src, dst, max_trials=args.trials, rng=0)),
+        )
+        for label, run in runs:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                seconds, (model, inliers) = _time(run, args.repeat)
+            error = np.abs(model.params - truth.params).max()
+            print(f"  {label:>18}: {seconds * 1000:8.1f} ms   inliers {inliers.sum():6d}   "
+                  f"max param error {error:.3f}")
+
+
+def bench_prealign(args):
+    from scipy import ndimage as ndi
+    from skimage.transform import AffineTransform, warp
+    import prealign
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        # Smooth random texture as the EBSD image; the LRS map sees it
+        # rotated, ~6x coarser and shifted.
+        fixed = ndi.gaussian_filter(rng.normal(size=(size, size)), size / 150) \
+            + 0.3 * ndi.gaussian_filter(rng.normal(size=(size, size)), size / 40)
+        pixel = size / 100
+        truth = AffineTransform(scale=pixel, rotation=np.radians(args.rotation))
+        center = truth(np.array([[49.5, 49.5]]))[0]
+        truth = AffineTransform(matrix=AffineTransform(translation=(size / 2 - center[0] + 3.3 * pixel,
+                                                                    size / 2 - center[1] - 2.1 * pixel)).params
+                                @ truth.params)
+        moving = warp(fixed, truth, output_shape=(100, 100))
+        seconds, (estimate, score) = _time(lambda: prealign.prealign(fixed, moving), args.repeat)
+        corners = np.array([[0, 0], [99, 0], [0, 99], [99, 99]])
+        error = np.abs(estimate(corners) - truth(corners)).max() / pixel
+        print(f"{size:>6} x {size}: {seconds * 1000:8.1f} ms   max corner error {error:.2f} LRS px   "
+              f"correlation {score:.3f}")
+
+
+_IMPORT_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module({name!r})
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, sorted(m for m in {heavy!r} if m in sys.modules)]))
+"""
+
+
+def _import_once(name, heavy, importtime=False):
+    """Imports ``name`` in a fresh interpreter: (seconds, heavy modules loaded, -X importtime log)."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    command += ["-c", _IMPORT_PROBE.format(name=name, heavy=tuple(heavy))]
+    result = subprocess.run(command, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, loaded, result.stderr
+
+
+def _slowest_imports(log, count):
+    """The ``count`` largest cumulative entries of a ``-X importtime`` log."""
+    entries = []
+    for line in log.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            entries.append((int(parts[1]), parts[2].strip()))
+    return sorted(entries, reverse=True)[:count]
+
+
+def bench_imports(args):
+    failures = []
+    for name in args.modules or IMPORT_BUDGETS:
+        budget, heavy = IMPORT_BUDGETS.get(name, (None, HEAVY_MODULES))
+        best, loaded = float("inf"), []
+        for _ in range(args.repeat):
+            seconds, loaded, _ = _import_once(name, heavy)
+            best = min(best, seconds)
+        limit = None if budget is None else budget * args.scale
+        status = "ok"
+        if loaded:
+            status = f"loads {', '.join(loaded)}"
+        elif limit is not None and best > limit:
+            status = f"over budget ({limit * 1000:.0f} ms)"
+        if status != "ok":
+            failures.append(name)
+        print(f"{name:>26}: {best * 1000:7.1f} ms   {status}")
+        if args.importtime:
+            _, _, log = _import_once(name, heavy, importtime=True)
+            for micros, module in _slowest_imports(log, args.top):
+                print(f"{'':>28}{micros / 1000:7.1f} ms  {module}")
+    if failures:
+        print(f"Import-time regression in: {', '.join(failures)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    ang = sub.add_parser("ang-parsers", help="compare the numpy and pandas .ang readers")
+    ang.add_argument("--ang", help="existing .ang file (default: synthetic)")
+    ang.add_argument("--rows", type=int, default=1000)
+    ang.add_argument("--cols", type=int, default=1000)
+    ang.add_argument("--repeat", type=int, default=3)
+    ang.set_defaults(func=bench_ang_parsers)
+
+    par = sub.add_parser("ang-parallel", help="speedup of the process-pool .ang reader")
+    par.add_argument("--ang", help="existing .ang file (default: synthetic)")
+    par.add_argument("--rows", type=int, default=2000)
+    par.add_argument("--cols", type=int, default=2000)
+    par.add_argument("--repeat", type=int, default=1)
+    par.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    par.set_defaults(func=bench_ang_parallel)
+
+    amp = sub.add_parser("ang-maps", help="all EBSD maps from one parse vs one parse per map")
+    amp.add_argument("--ang", help="existing .ang file (default: synthetic)")
+    amp.add_argument("--rows", type=int, default=1000)
+    amp.add_argument("--cols", type=int, default=1000)
+    amp.add_argument("--repeat", type=int, default=1)
+    amp.set_defaults(func=bench_ang_maps)
+
+    hxg = sub.add_parser("ang-hex", help="hex-grid resampling with and without a cached plan")
+    hxg.add_argument("--rows", type=int, default=1000)
+    hxg.add_argument("--cols", type=int, default=1000)
+    hxg.add_argument("--repeat", type=int, default=3)
+    hxg.set_defaults(func=bench_ang_hex)
+
+    wrp = sub.add_parser("warp", help="per-channel skimage warp vs batched warp_channels")
+    wrp.add_argument("--size", type=int, default=3000, help="output edge length")
+    wrp.add_argument("--channels", type=int, default=4)
+    wrp.add_argument("--repeat", type=int, default=3)
+    wrp.set_defaults(func=bench_warp)
+
+    bck = sub.add_parser("warp-backends", help="time and check every warp backend")
+    bck.add_argument("--size", type=int, default=3000, help="output edge length")
+    bck.add_argument("--channels", type=int, default=3)
+    bck.add_argument("--order", type=int, default=1)
+    bck.add_argument("--repeat", type=int, default=3)
+    bck.set_defaults(func=bench_warp_backends)
+
+    til = sub.add_parser("warp-tiled", help="peak memory of the tiled, memory-mapped warp")
+    til.add_argument("--size", type=int, default=6000, help="output edge length")
+    til.add_argument("--channels", type=int, default=3)
+    til.add_argument("--budget-mb", type=int, default=64)
+    til.set_defaults(func=bench_warp_tiled)
+
+    cwp = sub.add_parser("cube-warp", help="streaming per-band warp of a memory-mapped spectral cube")
+    cwp.add_argument("--size", type=int, default=1000, help="output edge length")
+    cwp.add_argument("--bands", type=int, default=500)
+    cwp.add_argument("--lrs-size", type=int, default=160, help="LRS grid edge length")
+    cwp.add_argument("--budget-mb", type=int, default=64)
+    cwp.set_defaults(func=bench_cube_warp)
+
+    exp = sub.add_parser("export", help="export throughput of every registered-channel format")
+    exp.add_argument("--size", type=int, default=3000, help="channel edge length")
+    exp.add_argument("--repeat", type=int, default=1)
+    exp.set_defaults(func=bench_export)
+
+    dsp = sub.add_parser("display", help="redraw time of plain imshow vs the display pyramid")
+    dsp.add_argument("--size", type=int, default=8000, help="image edge length")
+    dsp.add_argument("--repeat", type=int, default=3)
+    dsp.set_defaults(func=bench_display)
+
+    mrk = sub.add_parser("markers", help="cost of placing control points: scatter+draw vs blitted overlay")
+    mrk.add_argument("--size", type=int, default=4000, help="image edge length")
+    mrk.add_argument("--points", type=int, default=50)
+    mrk.set_defaults(func=bench_markers)
+
+    con = sub.add_parser("contrast", help="cost of a contrast slider tick: legacy renormalise vs set_clim")
+    con.add_argument("--size", type=int, default=4000, help="image edge length")
+    con.set_defaults(func=bench_contrast)
+
+    rsc = sub.add_parser("ransac", help="skimage ransac vs the batched RANSAC engine")
+    rsc.add_argument("--points", type=int, nargs="+", default=[20, 200, 2000, 10000])
+    rsc.add_argument("--outliers", type=float, default=0.3, help="fraction of corrupted correspondences")
+    rsc.add_argument("--trials", type=int, default=1000)
+    rsc.add_argument("--repeat", type=int, default=3)
+    rsc.set_defaults(func=bench_ransac)
+
+    pre = sub.add_parser("prealign", help="time and accuracy of automatic FFT pre-alignment")
+    pre.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000], help="EBSD edge lengths")
+    pre.add_argument("--rotation", type=float, default=23.0, help="LRS rotation in degrees")
+    pre.add_argument("--repeat", type=int, default=1)
+    pre.set_defaults(func=bench_prealign)
+
+    imp = sub.add_parser("imports", help="import time of the core modules in fresh interpreters (exit 1 on regression)")
+    imp.add_argument("--modules", nargs="+", help="modules to time (default: all with a budget)")
+    imp.add_argument("--scale", type=float, default=1.0, help="multiplier for the time budgets (slow machines)")
+    imp.add_argument("--importtime", action="store_true", help="list the slowest imports (-X importtime)")
+    imp.add_argument("--top", type=int, default=8, help="entries listed with --importtime")
+    imp.add_argument("--repeat", type=int, default=3)
+    imp.set_defaults(func=bench_imports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
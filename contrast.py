@@ -0,0 +1,69 @@
+"""
+Slider-driven contrast for displayed maps.
+
+The old slider path renormalised the whole image, allocated several
+full-size temporaries and created a new ``imshow`` artist on every tick.
+Contrast here is just a colour limit on the existing artist: the image's
+min/max are computed once (cached by the display pyramid) and each tick only
+calls ``set_clim``.  No image data is touched, so a tick costs the same for
+any map size.  Ticks arriving while the slider is dragged are coalesced into
+one update per ``delay_ms``.
+"""
+
+# Milliseconds to collect slider ticks before applying the latest one.
+DEFAULT_DELAY_MS = 30
+
+
+def contrast_limits(vmin, vmax, factor):
+    """
+    Colour limits that stretch [vmin, vmax] by ``factor``.
+
+    The displayed value is clip((v - vmin) / (vmax - vmin) * factor, 0, 1),
+    i.e. the top 1 - 1/factor of the range saturates.  Factors below 1 show
+    the plain range: the previous renormalising code autoscaled the reduced
+    range back to full contrast, so they have always looked like 1.
+    """
+    factor = max(float(factor), 1.0)
+    return vmin, vmin + (vmax - vmin) / factor
+
+
+class ContrastEngine:
+    def __init__(self, root, display, canvas, delay_ms=DEFAULT_DELAY_MS):
+        """
+        Parameters:
+            root: Tk root (anything with ``after``) used to coalesce ticks.
+            display (PyramidDisplay): Display holding the image artists.
+            canvas: Matplotlib canvas to redraw.
+            delay_ms (int): Coalescing window for slider ticks.
+        """
+        self.root = root
+        self.display = display
+        self.canvas = canvas
+        self.delay_ms = delay_ms
+        self._pending = {}   # axes -> latest requested factor
+        self._scheduled = False
+
+    def request(self, ax, factor):
+        """Queues ``factor`` for the image in ``ax``; only the latest one is applied."""
+        self._pending[ax] = factor
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after(self.delay_ms, self.flush)
+
+    def flush(self):
+        """Applies the queued factors and schedules one redraw."""
+        self._scheduled = False
+        pending, self._pending = self._pending, {}
+        changed = False
+        for ax, factor in pending.items():
+            changed |= self.apply(ax, factor)
+        if changed:
+            self.canvas.draw_idle()
+
+    def apply(self, ax, factor):
+        """Sets the contrast of the image in ``ax`` now; False if it shows none."""
+        value_range = self.display.value_range(ax)
+        if value_range is None:
+            return False
+        self.display.set_clim(ax, *contrast_limits(*value_range, factor))
+        return True
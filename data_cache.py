@@ -0,0 +1,200 @@
+"""
+Persistent on-disk cache for parsed input files.
+
+Parsing a multi-GB .ang scan or LRS CSV from text takes far longer than
+reading the same numbers back in binary form.  ``ParsedDataCache`` stores the
+arrays produced by a parser as ``.npy`` files in a cache directory and hands
+them back memory-mapped, so reopening an unchanged file only costs a few
+``open`` calls.
+
+Every entry is keyed on the absolute path, size, modification time and a
+content hash of the source file plus a ``variant`` string describing what was
+parsed (e.g. which columns).  The cache is bounded in size and evicts the
+least recently used entries first.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "imageRegistrator")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+# Bytes hashed at the start, middle and end of the source file.
+HASH_SAMPLE_BYTES = 1024 * 1024
+
+ENTRY_FILE = "entry.json"
+
+
+def file_fingerprint(path, sample_bytes=HASH_SAMPLE_BYTES):
+    """
+    Returns a dictionary identifying the current contents of ``path``.
+
+    The content hash covers three ``sample_bytes`` blocks (start, middle and
+    end of the file) rather than the whole file, so fingerprinting stays cheap
+    for multi-GB scans while still catching in-place edits that keep the size
+    and modification time.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        if stat.st_size <= 3 * sample_bytes:
+            digest.update(f.read())
+        else:
+            for offset in (0, (stat.st_size - sample_bytes) // 2, stat.st_size - sample_bytes):
+                f.seek(offset)
+                digest.update(f.read(sample_bytes))
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": digest.hexdigest(),
+    }
+
+
+class ParsedDataCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ----------------------------------------------------------------------
+    # Keys
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def entry_key(fingerprint, variant):
+        text = json.dumps([fingerprint, variant], sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    # ----------------------------------------------------------------------
+    # Lookup / store
+    # ----------------------------------------------------------------------
+    def get(self, path, variant):
+        """
+        Looks up the parsed arrays for ``path``.
+
+        Returns:
+            tuple or None: ({name: read-only memmap}, meta dict) on a hit,
+            None on a miss.
+        """
+        key = self.entry_key(file_fingerprint(path), variant)
+        entry_dir = self._entry_dir(key)
+        entry_path = os.path.join(entry_dir, ENTRY_FILE)
+        try:
+            with open(entry_path, 'r') as f:
+                entry = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r')
+                for name in entry["arrays"]
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # The entry file's mtime doubles as the LRU access time.
+        now = time.time()
+        os.utime(entry_path, (now, now))
+        return arrays, entry["meta"]
+
+    def put(self, path, variant, arrays, meta=None):
+        """
+        Stores ``arrays`` ({name: np.ndarray}) for ``path`` and evicts old
+        entries if the cache grew beyond ``max_bytes``.
+
+        Returns:
+            dict: The stored arrays, memory-mapped from the cache.
+        """
+        fingerprint = file_fingerprint(path)
+        key = self.entry_key(fingerprint, variant)
+        entry_dir = self._entry_dir(key)
+
+        staging = tempfile.mkdtemp(prefix=f".{key}.", dir=self.cache_dir)
+        try:
+            nbytes = 0
+            for name, array in arrays.items():
+                array = np.asarray(array)
+                np.save(os.path.join(staging, f"{name}.npy"), array)
+                nbytes += array.nbytes
+            entry = {
+                "source": fingerprint,
+                "variant": variant,
+                "arrays": list(arrays),
+                "nbytes": nbytes,
+                "meta": meta or {},
+            }
+            with open(os.path.join(staging, ENTRY_FILE), 'w') as f:
+                json.dump(entry, f)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+        self._drop_stale(fingerprint["path"], variant, keep=key)
+        self.evict(keep=key)
+        return {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r') for name in arrays}
+
+    # ----------------------------------------------------------------------
+    # Eviction / invalidation
+    # ----------------------------------------------------------------------
+    def entries(self):
+        """Returns a list of (key, entry dict, last access time), oldest first."""
+        found = []
+        for key in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self._entry_dir(key), ENTRY_FILE)
+            try:
+                with open(entry_path, 'r') as f:
+                    entry = json.load(f)
+                found.append((key, entry, os.path.getmtime(entry_path)))
+            except (OSError, ValueError):
+                continue
+        found.sort(key=lambda item: item[2])
+        return found
+
+    def size(self):
+        return sum(entry["nbytes"] for _, entry, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in ``max_bytes``."""
+        entries = self.entries()
+        total = sum(entry["nbytes"] for _, entry, _ in entries)
+        for key, entry, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            total -= entry["nbytes"]
+
+    def invalidate(self, path=None):
+        """
+        Removes the cached entries of ``path`` (all variants), or every entry
+        when ``path`` is None.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        source = os.path.abspath(path) if path is not None else None
+        removed = 0
+        for key, entry, _ in self.entries():
+            if source is None or entry["source"]["path"] == source:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def _drop_stale(self, source, variant, keep):
+        # Entries of an older version of the same file can never hit again.
+        for key, entry, _ in self.entries():
+            if key != keep and entry["source"]["path"] == source and entry["variant"] == variant:
+                self._remove(key)
+
+    def _remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
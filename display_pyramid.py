@@ -0,0 +1,206 @@
+"""
+Multi-resolution display of large maps.
+
+Matplotlib resamples the whole array behind an ``imshow`` on every redraw,
+so zooming or panning an 8k x 8k EBSD map costs time proportional to the
+map, not the screen.  ``ImagePyramid`` builds 2x downsampled levels once
+when an image is loaded; ``PyramidDisplay`` shows, per axes, only the level
+and viewport crop needed for the current limits, so a redraw touches
+roughly as many pixels as the axes have on screen.
+
+The image artist keeps full-resolution data coordinates (via its extent),
+so clicks, limits and overlays work exactly as with a plain ``imshow``.
+"""
+import math
+
+import numpy as np
+
+# Levels are built until the coarsest one fits in this edge length.
+MIN_LEVEL_EDGE = 256
+
+# Extra level pixels shown around the viewport so small pans do not need a
+# new crop straight away.
+CROP_MARGIN = 8
+
+
+class ImagePyramid:
+    def __init__(self, image, min_edge=MIN_LEVEL_EDGE):
+        """
+        Parameters:
+            image (np.ndarray): 2-D (or H x W x 3/4 colour) image; level 0 is
+                the image itself (not copied).
+            min_edge (int): Stop once a level's longer edge is <= min_edge.
+        """
+        self.levels = [image]
+        self._range = None
+        level = image
+        while max(level.shape[:2]) > min_edge and min(level.shape[:2]) >= 2:
+            level = self._downsample(level)
+            self.levels.append(level)
+
+    @staticmethod
+    def _downsample(level):
+        # OpenCV is imported on the first image shown, not with the GUI.
+        import cv2
+
+        # cv2 has no kernels for bool/int64; area averaging wants floats anyway.
+        if level.dtype not in (np.uint8, np.uint16, np.float32):
+            level = level.astype(np.float32)
+        rows, cols = level.shape[0] // 2, level.shape[1] // 2
+        return cv2.resize(level[:rows * 2, :cols * 2], (cols, rows), interpolation=cv2.INTER_AREA)
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def value_range(self):
+        """(min, max) of the full-resolution image, ignoring NaN (computed once)."""
+        if self._range is None:
+            image = self.levels[0]
+            self._range = (float(np.nanmin(image)), float(np.nanmax(image)))
+        return self._range
+
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def level_for(self, data_per_pixel):
+        """Coarsest level that still has at least one pixel per screen pixel."""
+        if data_per_pixel <= 1:
+            return 0
+        return min(int(math.floor(math.log2(data_per_pixel))), len(self.levels) - 1)
+
+    def view(self, xlim, ylim, screen_size):
+        """
+        Picks the level and crop for a viewport.
+
+        Parameters:
+            xlim, ylim (tuple): Axes limits in full-resolution data coordinates.
+            screen_size (tuple): (width, height) of the axes in screen pixels.
+
+        Returns:
+            tuple: (level index, (row0, row1, col0, col1) crop in level pixels)
+        """
+        x0, x1 = sorted(xlim)
+        y0, y1 = sorted(ylim)
+        width, height = max(screen_size[0], 1), max(screen_size[1], 1)
+        level = self.level_for(max((x1 - x0) / width, (y1 - y0) / height))
+        factor = 2 ** level
+        rows, cols = self.levels[level].shape[:2]
+        # Pixel centres are at integer coordinates, so pixel j spans j +- 0.5.
+        col0 = max(int(math.floor((x0 + 0.5) / factor)) - CROP_MARGIN, 0)
+        col1 = min(int(math.ceil((x1 + 0.5) / factor)) + CROP_MARGIN, cols)
+        row0 = max(int(math.floor((y0 + 0.5) / factor)) - CROP_MARGIN, 0)
+        row1 = min(int(math.ceil((y1 + 0.5) / factor)) + CROP_MARGIN, rows)
+        return level, (row0, max(row1, row0 + 1), col0, max(col1, col0 + 1))
+
+    def crop(self, level, window):
+        """Returns the level crop and its imshow extent in full-resolution coordinates."""
+        row0, row1, col0, col1 = window
+        factor = 2 ** level
+        extent = (col0 * factor - 0.5, col1 * factor - 0.5, row1 * factor - 0.5, row0 * factor - 0.5)
+        return self.levels[level][row0:row1, col0:col1], extent
+
+
+class PyramidDisplay:
+    """Level-of-detail ``imshow`` for a set of axes."""
+
+    def __init__(self, min_edge=MIN_LEVEL_EDGE):
+        self.min_edge = min_edge
+        self._pyramids = {}   # axes -> ImagePyramid
+        self._artists = {}    # axes -> AxesImage
+        self._views = {}      # axes -> (level, window) currently shown
+        self._callbacks = {}  # axes -> callback registry we are connected to
+
+    def show(self, ax, image, **imshow_kwargs):
+        """
+        Replaces the image shown in ``ax`` (keeping the current limits if the
+        axes already showed an image of the same shape).
+
+        Returns:
+            AxesImage: The image artist.
+        """
+        previous = self._pyramids.get(ax)
+        keep_limits = previous is not None and previous.shape[:2] == image.shape[:2] and self._artists[ax].axes is ax
+        limits = (ax.get_xlim(), ax.get_ylim())
+        self.remove(ax)
+
+        # Re-showing the same array (e.g. after ax.clear()) reuses its levels.
+        if previous is not None and previous.levels[0] is image:
+            pyramid = previous
+        else:
+            pyramid = ImagePyramid(image, self.min_edge)
+        if image.ndim == 2 and "norm" not in imshow_kwargs:
+            # Levels are averages, so the colour scale comes from the full
+            # resolution data once instead of from whichever crop is shown.
+            vmin, vmax = pyramid.value_range()
+            imshow_kwargs.setdefault("vmin", vmin)
+            imshow_kwargs.setdefault("vmax", vmax)
+        level = len(pyramid.levels) - 1
+        data, extent = pyramid.crop(level, (0, pyramid.levels[level].shape[0], 0, pyramid.levels[level].shape[1]))
+        artist = ax.imshow(data, extent=extent, **imshow_kwargs)
+
+        rows, cols = image.shape[:2]
+        if keep_limits:
+            ax.set_xlim(limits[0])
+            ax.set_ylim(limits[1])
+        else:
+            ax.set_xlim(-0.5, cols - 0.5)
+            ax.set_ylim(rows - 0.5, -0.5)
+        ax.set_autoscale_on(False)
+
+        self._pyramids[ax] = pyramid
+        self._artists[ax] = artist
+        self._views[ax] = (level, None)
+        self._connect(ax)
+        self.refresh(ax)
+        return artist
+
+    def remove(self, ax):
+        artist = self._artists.pop(ax, None)
+        self._pyramids.pop(ax, None)
+        self._views.pop(ax, None)
+        if artist is not None and artist.axes is ax:
+            artist.remove()
+
+    def image(self, ax):
+        """Full-resolution image shown in ``ax`` (None if there is none)."""
+        pyramid = self._pyramids.get(ax)
+        return None if pyramid is None else pyramid.levels[0]
+
+    def value_range(self, ax):
+        """(min, max) of the full-resolution image in ``ax`` (None if there is none)."""
+        pyramid = self._pyramids.get(ax)
+        return None if pyramid is None else pyramid.value_range()
+
+    def set_clim(self, ax, vmin, vmax):
+        """Changes the colour limits of the image in ``ax`` without touching its data."""
+        artist = self._artists.get(ax)
+        if artist is not None and artist.axes is ax:
+            artist.set_clim(vmin, vmax)
+
+    def refresh(self, ax):
+        """Swaps in the level and crop for the current limits of ``ax``."""
+        pyramid = self._pyramids.get(ax)
+        artist = self._artists.get(ax)
+        if pyramid is None or artist.axes is not ax:
+            return
+        bbox = ax.bbox
+        view = pyramid.view(ax.get_xlim(), ax.get_ylim(), (bbox.width, bbox.height))
+        if view == self._views.get(ax):
+            return
+        data, extent = pyramid.crop(*view)
+        artist.set_data(data)
+        artist.set_extent(extent)
+        self._views[ax] = view
+
+    def refresh_all(self):
+        for ax in list(self._pyramids):
+            self.refresh(ax)
+
+    def _connect(self, ax):
+        # ax.clear() replaces the callback registry, so connect again if needed.
+        if self._callbacks.get(ax) is ax.callbacks:
+            return
+        ax.callbacks.connect("xlim_changed", self.refresh)
+        ax.callbacks.connect("ylim_changed", self.refresh)
+        self._callbacks[ax] = ax.callbacks
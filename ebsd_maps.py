@@ -0,0 +1,318 @@
+"""
+Multi-channel EBSD maps from the parsed .ang columns.
+
+``generate_maps`` builds every requested map from one parse of the file:
+the scalar columns (IQ, CI, phase, fit) are reshaped to the scan grid and
+the IPF colour map is computed from the Euler angles.  All maps go into one
+float32 stack of shape (channels, rows, cols); ``EBSDMaps`` knows which
+channels belong to which map and hands out 2-D images (or channels-last RGB
+for the IPF map) that any panel can show.  ``LazyMaps`` offers the same
+interface over the parsed columns but builds each map only when it is first
+asked for, so a viewer pays for the map it shows, not for all of them.
+
+IPF colouring is vectorised over all pixels, in chunks to bound the
+temporaries: the Bunge rotation matrices g(phi1, PHI, phi2) of a chunk are
+built in one batch, the sample direction is rotated into the crystal frame
+(v = g d), and v is folded into the standard triangle of the phase's Laue
+group.  Folding applies the whole symmetry group at once (absolute values
+and sorting / a modulo of the azimuth) instead of testing every operator.
+The colour is red, green and blue at the triangle corners, mixed by the
+position of v inside it and scaled so the largest component is 1.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ang_parser import SYMMETRY_KEY
+
+# Zero-based .ang data columns of the scalar maps (TSL/EDAX layout).
+SCALAR_COLUMNS = OrderedDict([("iq", 5), ("ci", 6), ("phase", 7), ("fit", 9)])
+
+# Euler angle (phi1, PHI, phi2) columns, in radians.
+EULER_COLUMNS = (0, 1, 2)
+
+# Map names in display order; "ipf" is the 3-channel IPF colour map.
+MAP_NAMES = tuple(SCALAR_COLUMNS) + ("ipf",)
+
+# TSL symmetry codes with an IPF colour key: m-3m, 6/mmm, 4/mmm and mmm.
+CUBIC, HEXAGONAL, TETRAGONAL, ORTHORHOMBIC = 43, 62, 42, 22
+
+# Used when the header lists no symmetry.
+DEFAULT_SYMMETRY = CUBIC
+
+# Sample direction coloured by the IPF map (the scan normal, ND).
+DEFAULT_DIRECTION = (0.0, 0.0, 1.0)
+
+# Pixels coloured per vectorised batch.
+CHUNK_PIXELS = 1 << 18
+
+
+# ----------------------------------------------------------------------
+# Orientations
+# ----------------------------------------------------------------------
+def rotation_matrices(phi1, Phi, phi2):
+    """
+    Bunge rotation matrices g (sample -> crystal frame).
+
+    Parameters:
+        phi1, Phi, phi2 (np.ndarray): Euler angles in radians, shape (n,).
+
+    Returns:
+        np.ndarray: (n, 3, 3) float64 matrices.
+    """
+    c1, s1 = np.cos(phi1, dtype=np.float64), np.sin(phi1, dtype=np.float64)
+    c, s = np.cos(Phi, dtype=np.float64), np.sin(Phi, dtype=np.float64)
+    c2, s2 = np.cos(phi2, dtype=np.float64), np.sin(phi2, dtype=np.float64)
+    g = np.empty(np.shape(c1) + (3, 3))
+    g[..., 0, 0] = c1 * c2 - s1 * s2 * c
+    g[..., 0, 1] = s1 * c2 + c1 * s2 * c
+    g[..., 0, 2] = s2 * s
+    g[..., 1, 0] = -c1 * s2 - s1 * c2 * c
+    g[..., 1, 1] = -s1 * s2 + c1 * c2 * c
+    g[..., 1, 2] = c2 * s
+    g[..., 2, 0] = s1 * s
+    g[..., 2, 1] = -c1 * s
+    g[..., 2, 2] = c
+    return g
+
+
+def _fold_cubic(v):
+    """m-3m: |v| sorted ascending lies in the [001]-[101]-[111] triangle."""
+    a = np.abs(v)
+    x, z = a.min(axis=1), a.max(axis=1)
+    y = a.sum(axis=1) - x - z
+    return np.column_stack([z - y, math.sqrt(2.0) * (y - x), math.sqrt(3.0) * x])
+
+
+def _fold_hexagonal(v):
+    """6/mmm (crystal x along a1): [0001]-[2-1-10]-[10-10] sector."""
+    azimuth = np.mod(np.arctan2(v[:, 1], v[:, 0]), math.pi / 3)
+    azimuth = np.minimum(azimuth, math.pi / 3 - azimuth)
+    radius = np.hypot(v[:, 0], v[:, 1])
+    x, y = radius * np.cos(azimuth), radius * np.sin(azimuth)
+    return np.column_stack([np.abs(v[:, 2]), x - math.sqrt(3.0) * y, 2.0 * y])
+
+
+def _fold_tetragonal(v):
+    """4/mmm: [001]-[100]-[110] triangle."""
+    a = np.abs(v)
+    x, y = np.maximum(a[:, 0], a[:, 1]), np.minimum(a[:, 0], a[:, 1])
+    return np.column_stack([a[:, 2], x - y, math.sqrt(2.0) * y])
+
+
+def _fold_orthorhombic(v):
+    """mmm: [001]-[100]-[010] octant."""
+    a = np.abs(v)
+    return np.column_stack([a[:, 2], a[:, 0], a[:, 1]])
+
+
+# Symmetry code -> fold of crystal directions into (red, green, blue) weights.
+IPF_KEYS = {
+    CUBIC: _fold_cubic,
+    HEXAGONAL: _fold_hexagonal,
+    TETRAGONAL: _fold_tetragonal,
+    ORTHORHOMBIC: _fold_orthorhombic,
+}
+
+
+def phase_symmetries(header):
+    """Symmetry codes of the header's phases, in phase order."""
+    return list(header.get(SYMMETRY_KEY) or [DEFAULT_SYMMETRY])
+
+
+def ipf_colors(phi1, Phi, phi2, phase=None, symmetries=(DEFAULT_SYMMETRY,), direction=DEFAULT_DIRECTION,
+               out=None):
+    """
+    IPF colours of orientations.
+
+    Parameters:
+        phi1, Phi, phi2 (np.ndarray): Euler angles in radians, shape (n,).
+        phase (np.ndarray or None): .ang phase index per point (0 or 1 is
+            the first phase); None for single-phase data.
+        symmetries (sequence): TSL symmetry code of each phase.
+        direction (tuple): Sample direction coloured (default ND).
+        out (np.ndarray or None): (n, 3) float32 result array.
+
+    Returns:
+        np.ndarray: (n, 3) float32 RGB in [0, 1].
+    """
+    unsupported = sorted(set(symmetries) - set(IPF_KEYS))
+    if unsupported:
+        raise ValueError(f"No IPF colour key for symmetry {unsupported} (supported: {sorted(IPF_KEYS)})")
+    n = len(phi1)
+    out = np.empty((n, 3), dtype=np.float32) if out is None else out
+    d = np.asarray(direction, dtype=np.float64)
+    d = d / np.linalg.norm(d)
+    for start in range(0, n, CHUNK_PIXELS):
+        chunk = slice(start, min(start + CHUNK_PIXELS, n))
+        g = rotation_matrices(phi1[chunk], Phi[chunk], phi2[chunk])
+        v = np.einsum('nij,j->ni', g, d)                                      # (m, 3) crystal directions
+        if len(symmetries) == 1 or phase is None:
+            weights = IPF_KEYS[symmetries[0]](v)
+        else:
+            index = np.clip(np.asarray(phase[chunk]).astype(np.intp) - 1, 0, len(symmetries) - 1)
+            weights = np.empty_like(v)
+            for i, symmetry in enumerate(symmetries):
+                mask = index == i
+                if mask.any():
+                    weights[mask] = IPF_KEYS[symmetry](v[mask])
+        np.maximum(weights, 0.0, out=weights)
+        peak = weights.max(axis=1, keepdims=True)
+        np.divide(weights, np.where(peak > 0, peak, 1.0), out=out[chunk], casting='same_kind')
+    return out
+
+
+# ----------------------------------------------------------------------
+# Map stack
+# ----------------------------------------------------------------------
+class EBSDMaps:
+    def __init__(self, stack, layout):
+        """
+        Parameters:
+            stack (np.ndarray): (channels, rows, cols) float32 maps.
+            layout (OrderedDict): Map name -> slice of its channels.
+        """
+        self.stack = stack
+        self.layout = layout
+
+    @property
+    def names(self):
+        return tuple(self.layout)
+
+    @property
+    def shape(self):
+        return self.stack.shape[1:]
+
+    def __contains__(self, name):
+        return name in self.layout
+
+    def image(self, name):
+        """Map ``name`` for display: (rows, cols), or (rows, cols, 3) RGB."""
+        channels = self.stack[self.layout[name]]
+        if len(channels) == 1:
+            return channels[0]
+        return np.ascontiguousarray(np.moveaxis(channels, 0, -1))
+
+    def gray(self, name):
+        """Map ``name`` as one (rows, cols) image (RGB maps: mean of the channels)."""
+        channels = self.stack[self.layout[name]]
+        return channels[0] if len(channels) == 1 else channels.mean(axis=0)
+
+
+class LazyMaps:
+    def __init__(self, data, header, names, shape, direction=DEFAULT_DIRECTION):
+        """
+        Maps ``names`` over parsed .ang columns, each built on first use.
+
+        Parameters:
+            data (dict): Column index -> 1-D array, holding at least
+                required_columns(names); kept until every map is built.
+            header (dict): Parsed .ang header (phase symmetries).
+            names (sequence): Maps that can be asked for.
+            shape (tuple): (rows, cols) of the scan grid.
+            direction (tuple): Sample direction of the IPF map.
+        """
+        self.data = data
+        self.header = header
+        self.direction = direction
+        self._names = tuple(names)
+        self._shape = tuple(shape)
+        self._maps = {}  # name -> EBSDMaps holding just that map
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def built(self):
+        """Names of the maps built so far."""
+        return tuple(name for name in self._names if name in self._maps)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def build(self, name):
+        """Builds map ``name`` (once; safe to call from worker threads)."""
+        with self._lock:
+            maps = self._maps.get(name)
+            if maps is None:
+                maps = self._maps[name] = generate_maps(self.data, self.header, [name], self._shape,
+                                                        direction=self.direction)
+                if len(self._maps) == len(self._names):
+                    self.data = None
+            return maps
+
+    def image(self, name):
+        """Map ``name`` for display: (rows, cols), or (rows, cols, 3) RGB."""
+        return self.build(name).image(name)
+
+    def gray(self, name):
+        """Map ``name`` as one (rows, cols) image (RGB maps: mean of the channels)."""
+        return self.build(name).gray(name)
+
+
+def required_columns(names):
+    """Sorted .ang columns needed for maps ``names``."""
+    columns = set()
+    for name in names:
+        if name == "ipf":
+            columns.update(EULER_COLUMNS)
+            columns.add(SCALAR_COLUMNS["phase"])
+        elif name in SCALAR_COLUMNS:
+            columns.add(SCALAR_COLUMNS[name])
+        else:
+            raise ValueError(f"Unknown EBSD map: {name!r} (expected one of {MAP_NAMES})")
+    return tuple(sorted(columns))
+
+
+def available_maps(header, ncolumns=None):
+    """Map names that can be built for a file (IPF needs a known symmetry)."""
+    names = [name for name in MAP_NAMES if ncolumns is None or max(required_columns([name])) < ncolumns]
+    if "ipf" in names and not set(phase_symmetries(header)) <= set(IPF_KEYS):
+        names.remove("ipf")
+    return tuple(names)
+
+
+def generate_maps(data, header, names, shape, direction=DEFAULT_DIRECTION):
+    """
+    Builds maps ``names`` from parsed .ang columns in one pass.
+
+    Parameters:
+        data (dict): Column index -> 1-D array (see ang_parser.read_ang),
+            holding at least required_columns(names).
+        header (dict): Parsed .ang header (phase symmetries).
+        names (sequence): Maps to build, e.g. ("ci", "ipf").
+        shape (tuple): (rows, cols) of the scan grid.
+        direction (tuple): Sample direction of the IPF map.
+
+    Returns:
+        EBSDMaps: The stacked maps.
+    """
+    rows, cols = shape
+    size = rows * cols
+    missing = [c for c in required_columns(names) if c not in data]
+    if missing:
+        raise ValueError(f"Columns {missing} not parsed; needed for maps {tuple(names)}")
+    layout = OrderedDict()
+    for name in names:
+        start = sum(s.stop - s.start for s in layout.values())
+        layout[name] = slice(start, start + (3 if name == "ipf" else 1))
+    stack = np.empty((sum(s.stop - s.start for s in layout.values()), rows, cols), dtype=np.float32)
+
+    for name, channels in layout.items():
+        if name != "ipf":
+            stack[channels][0] = np.asarray(data[SCALAR_COLUMNS[name]][:size]).reshape(rows, cols)
+            continue
+        euler = [np.asarray(data[c][:size]) for c in EULER_COLUMNS]
+        phase = np.asarray(data[SCALAR_COLUMNS["phase"]][:size])
+        # Colours are written straight into the stack through an (n, 3) view.
+        ipf_colors(*euler, phase=phase, symmetries=phase_symmetries(header), direction=direction,
+                   out=stack[channels].reshape(3, size).T)
+    return EBSDMaps(stack, layout)
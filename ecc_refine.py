@@ -0,0 +1,164 @@
+"""
+Intensity-based refinement of an affine registration (ECC).
+
+A transform fitted to a handful of clicked (or pre-aligned) control points
+is only as good as the points.  ``refine_affine`` polishes it against the
+image content: it maximises the enhanced correlation coefficient (ECC, a
+zero-mean normalised cross-correlation) between the EBSD image and the
+warped LRS map with ``cv2.findTransformECC``, coarse-to-fine over Gaussian
+pyramids of both.  Unmeasured (NaN) LRS pixels are masked out, as are EBSD
+pixels the LRS map does not cover.
+
+The EBSD image is only used down to about half the LRS pixel size (finer
+EBSD detail has no counterpart in the coarse LRS grid), so each iteration
+costs O(LRS pixels) whatever the EBSD size.
+"""
+import math
+import time
+
+import cv2
+import numpy as np
+from skimage.transform import AffineTransform
+
+import prealign
+
+# Pyramid levels refined, finest (EBSD pixel ~ half an LRS pixel) first.
+DEFAULT_LEVELS = 3
+
+# ECC iterations per level at most.
+MAX_ITERATIONS = 50
+
+# A level stops once an iteration raises the correlation by less than this.
+EPSILON = 1e-5
+
+# Gaussian pre-filter size used by findTransformECC on every level.
+GAUSS_FILTER_SIZE = 5
+
+# Smallest LRS level edge worth refining on.
+MIN_LEVEL_EDGE = 16
+
+
+def _scaling(factor):
+    return np.diag([factor, factor, 1.0])
+
+
+def _level_matrix(matrix, fixed_level, moving_level):
+    """Full-resolution fixed -> moving mapping between two pyramid levels."""
+    return _scaling(1.0 / 2 ** moving_level) @ matrix @ _scaling(2 ** fixed_level)
+
+
+def _mask_pyramid(valid, count):
+    """
+    Validity masks matching prealign.pyramid levels.  NaN pixels are filled
+    with the mean before reduction, so a coarse pixel counts as valid when
+    most of its source pixels were measured.
+    """
+    levels = prealign.pyramid(valid.astype(np.float64), coarse_edge=0)[:count]
+    return [valid] + [level > 0.5 for level in levels[1:]]
+
+
+def overlap_correlation(fixed, moving, valid, matrix):
+    """
+    Correlation coefficient of ``fixed`` and ``moving`` warped onto it.
+
+    Parameters:
+        matrix (np.ndarray): 3x3 fixed -> moving pixel mapping (the ECC warp).
+
+    Returns:
+        float: Correlation over the valid overlap (-1 if it is empty).
+    """
+    flags = cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+    size = (fixed.shape[1], fixed.shape[0])
+    warped = cv2.warpAffine(moving, matrix[:2], size, flags=flags)
+    inside = cv2.warpAffine(valid.astype(np.float32), matrix[:2], size, flags=flags) > 0.99
+    return prealign.overlap_ncc(fixed, warped, inside.astype(np.float32))
+
+
+def refine_affine(fixed, moving, transform, levels=DEFAULT_LEVELS, max_iterations=MAX_ITERATIONS,
+                  epsilon=EPSILON, progress=None):
+    """
+    Refines a moving (LRS) -> fixed (EBSD) affine transform on image content.
+
+    Parameters:
+        fixed (np.ndarray): EBSD image.
+        moving (np.ndarray): LRS map (NaN = unmeasured).
+        transform (AffineTransform): Starting estimate, e.g. the point fit.
+        levels (int): Pyramid levels refined.
+        max_iterations (int): ECC iterations per level at most.
+        epsilon (float): Minimum correlation gain per iteration.
+        progress (callable or None): ``progress(done, total)`` after each
+            level; an exception raised by it stops the refinement.
+
+    Returns:
+        tuple: (AffineTransform, report dict with "iterations" (per level,
+        coarsest first), "seconds", "metric_before" and "metric_after").
+        If the correlation did not improve the input transform is returned.
+    """
+    start = time.perf_counter()
+    valid = np.isfinite(moving)
+    # findTransformECC wants both images in the same float type.
+    fixed_levels = [level.astype(np.float32) for level in prealign.pyramid(prealign.normalize(fixed), coarse_edge=0)]
+    moving_levels = [level.astype(np.float32) for level in prealign.pyramid(prealign.normalize(moving), coarse_edge=0)]
+
+    # Finest level: EBSD pixels no larger than half an LRS pixel, so the
+    # interpolated LRS map is still sampled below its own pixel size.
+    pixel = math.sqrt(abs(np.linalg.det(transform.params[:2, :2])))
+    finest = min(max(int(math.floor(math.log2(max(pixel, 1.0)))) - 1, 0), len(fixed_levels) - 1)
+    pairs = [
+        (finest + level, level) for level in range(levels)
+        if finest + level < len(fixed_levels) and level < len(moving_levels)
+        and min(moving_levels[level].shape) >= MIN_LEVEL_EDGE
+    ] or [(finest, 0)]
+    mask_levels = _mask_pyramid(valid, max(level for _, level in pairs) + 1)
+
+    # ECC warps template (EBSD) pixels into the input (LRS) image: the inverse.
+    matrix = np.linalg.inv(transform.params)
+    fixed_finest, moving_finest = pairs[0]
+    before = overlap_correlation(fixed_levels[fixed_finest], moving_levels[moving_finest],
+                                 mask_levels[moving_finest], _level_matrix(matrix, *pairs[0]))
+
+    criteria = (cv2.TERM_CRITERIA_COUNT, 1, -1.0)
+    iterations = []
+    for done, (fixed_level, moving_level) in enumerate(reversed(pairs), start=1):
+        template = fixed_levels[fixed_level]
+        image = moving_levels[moving_level]
+        mask = mask_levels[moving_level].astype(np.uint8)
+        warp = _level_matrix(matrix, fixed_level, moving_level)[:2].astype(np.float32)
+        # One ECC step per call, so the iterations can be counted and the
+        # gain checked here (findTransformECC does not report either).
+        count, last = 0, -np.inf
+        while count < max_iterations:
+            try:
+                rho, updated = cv2.findTransformECC(template, image, warp.copy(), cv2.MOTION_AFFINE,
+                                                    criteria, mask, GAUSS_FILTER_SIZE)
+            except cv2.error:
+                break   # singular update: keep the last good warp
+            if rho - last < epsilon:
+                break
+            count += 1
+            warp, last = updated, rho
+        iterations.append(count)
+        level_matrix = np.vstack([warp.astype(np.float64), [0.0, 0.0, 1.0]])
+        matrix = _scaling(2 ** moving_level) @ level_matrix @ _scaling(1.0 / 2 ** fixed_level)
+        if progress is not None:
+            progress(done, len(pairs))
+
+    after = overlap_correlation(fixed_levels[fixed_finest], moving_levels[moving_finest],
+                                mask_levels[moving_finest], _level_matrix(matrix, *pairs[0]))
+    refined = AffineTransform(matrix=np.linalg.inv(matrix))
+    if not after > before:
+        refined, after = transform, before
+    report = {
+        "iterations": iterations,
+        "seconds": time.perf_counter() - start,
+        "metric_before": before,
+        "metric_after": after,
+    }
+    return refined, report
+
+
+def format_report(report):
+    """One log line summarising a refinement report."""
+    return (f"ECC refinement: {sum(report['iterations'])} iterations "
+            f"({'/'.join(map(str, report['iterations']))} per level), {report['seconds']:.2f} s, "
+            f"correlation {report['metric_before']:.3f} -> {report['metric_after']:.3f}")
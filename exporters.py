@@ -0,0 +1,187 @@
+"""
+Writers for registered LRS channels.
+
+Every binary exporter puts all registered channels, the 3x3 transform matrix
+and the fixed/moving control points into a single container:
+
+    npz   ``np.savez`` archive (optionally zip-compressed)
+    hdf5  chunked, gzip-compressed HDF5 file (needs h5py)
+    zarr  chunked, compressed Zarr store (needs zarr)
+    csv   legacy text export: one ``np.savetxt`` file per channel
+
+Large (e.g. memory-mapped) channels are written in row blocks so exporting
+never needs a second full-size copy in memory.
+"""
+import os
+
+import numpy as np
+
+# Rows written per block and chunk edge of the chunked formats.
+CHUNK_EDGE = 512
+
+# File names of the legacy CSV export, per channel.
+LEGACY_CSV_NAMES = {
+    "intensity": "registeredLrsIntensity.csv",
+    "waveNumber": "RegistredLrs_waveNumber.csv",
+    "shift": "Registred_registeredLrsShift.csv",
+}
+
+
+def _row_blocks(rows, block=CHUNK_EDGE):
+    for start in range(0, rows, block):
+        yield start, min(start + block, rows)
+
+
+def _metadata(transform, fixed_points, moving_points):
+    return {
+        "transform": np.asarray(transform, dtype=np.float64).reshape(3, 3),
+        "fixed_points": np.asarray(fixed_points, dtype=np.float64).reshape(-1, 2),
+        "moving_points": np.asarray(moving_points, dtype=np.float64).reshape(-1, 2),
+    }
+
+
+class Exporter:
+    name = None
+    extension = None
+
+    def available(self):
+        return True
+
+    def write(self, path, channels, transform, fixed_points=(), moving_points=()):
+        """
+        Writes ``channels`` ({name: 2-D array}) plus registration metadata.
+
+        Returns:
+            list: Paths of the written files.
+        """
+        raise NotImplementedError
+
+
+class NpzExporter(Exporter):
+    name = "npz"
+    extension = ".npz"
+
+    def __init__(self, compress=False):
+        self.compress = compress
+
+    def write(self, path, channels, transform, fixed_points=(), moving_points=()):
+        save = np.savez_compressed if self.compress else np.savez
+        arrays = dict(channels)
+        arrays.update(_metadata(transform, fixed_points, moving_points))
+        save(path, **arrays)
+        return [path]
+
+
+class HDF5Exporter(Exporter):
+    name = "hdf5"
+    extension = ".h5"
+
+    def __init__(self, compression="gzip", level=1):
+        self.compression = compression
+        self.level = level
+
+    def available(self):
+        try:
+            import h5py  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def write(self, path, channels, transform, fixed_points=(), moving_points=()):
+        import h5py
+
+        with h5py.File(path, "w") as f:
+            group = f.create_group("channels")
+            for name, array in channels.items():
+                rows, cols = array.shape
+                dataset = group.create_dataset(
+                    name, shape=array.shape, dtype=array.dtype,
+                    chunks=(min(rows, CHUNK_EDGE), min(cols, CHUNK_EDGE)),
+                    compression=self.compression, compression_opts=self.level, shuffle=True
+                )
+                for start, stop in _row_blocks(rows):
+                    dataset[start:stop] = array[start:stop]
+            for name, value in _metadata(transform, fixed_points, moving_points).items():
+                f.create_dataset(name, data=value)
+        return [path]
+
+
+class ZarrExporter(Exporter):
+    name = "zarr"
+    extension = ".zarr"
+
+    def available(self):
+        try:
+            import zarr  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def write(self, path, channels, transform, fixed_points=(), moving_points=()):
+        import zarr
+
+        root = zarr.open_group(path, mode="w")
+        group = root.create_group("channels")
+        # zarr 3 renamed create_dataset to create_array.
+        create = getattr(group, "create_array", None) or group.create_dataset
+        for name, array in channels.items():
+            rows, cols = array.shape
+            target = create(name, shape=array.shape, dtype=array.dtype,
+                            chunks=(min(rows, CHUNK_EDGE), min(cols, CHUNK_EDGE)))
+            for start, stop in _row_blocks(rows):
+                target[start:stop] = np.asarray(array[start:stop])
+        for name, value in _metadata(transform, fixed_points, moving_points).items():
+            root.attrs[name] = value.tolist()
+        return [path]
+
+
+class CsvExporter(Exporter):
+    """Legacy export: one ``%.2f`` CSV per channel, named as the GUI always did."""
+    name = "csv"
+    extension = ""
+
+    def write(self, path, channels, transform, fixed_points=(), moving_points=()):
+        folder = os.path.dirname(path)
+        written = []
+        for name, array in channels.items():
+            csv_path = os.path.join(folder, LEGACY_CSV_NAMES.get(name, f"registeredLrs_{name}.csv"))
+            np.savetxt(
+                csv_path,
+                array,
+                delimiter=",",
+                header=f"{array.shape[0]},{array.shape[1]}",
+                comments="",
+                fmt="%.2f"
+            )
+            written.append(csv_path)
+        return written
+
+
+EXPORTERS = {exporter.name: exporter for exporter in (NpzExporter(), HDF5Exporter(), ZarrExporter(), CsvExporter())}
+
+
+def available_formats():
+    return [name for name, exporter in EXPORTERS.items() if exporter.available()]
+
+
+def export_registration(path_base, channels, transform, fixed_points=(), moving_points=(), fmt="npz"):
+    """
+    Exports registered channels in format ``fmt``.
+
+    Parameters:
+        path_base (str): Output path without extension (for "csv" only the
+            folder is used).
+        channels (dict): {name: 2-D array} of registered channels.
+        transform (array-like): 3x3 transform matrix.
+        fixed_points, moving_points (array-like): (N, 2) control points.
+        fmt (str): One of EXPORTERS.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected one of {list(EXPORTERS)})")
+    exporter = EXPORTERS[fmt]
+    if not exporter.available():
+        raise ImportError(f"Export format {fmt!r} needs an optional dependency that is not installed")
+    return exporter.write(path_base + exporter.extension, channels, transform, fixed_points, moving_points)
@@ -3,9 +3,12 @@ from tkinter import filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 from skimage.io import imread
-from skimage.transform import AffineTransform, warp
 import numpy as np
 from datetime import datetime
+import registration_core
+import warp_engine
+from display_pyramid import PyramidDisplay
+from marker_overlay import MarkerOverlay
 
 
 class ImageRegistrationTool:
@@ -25,6 +28,9 @@ class ImageRegistrationTool:
         self.pan_start = None
         self.current_ax = None
 
+        # Downsampled display levels; zoom only redraws the visible crop
+        self.display = PyramidDisplay()
+
         # Layout
         self.setup_ui()
 
@@ -42,6 +48,10 @@ class ImageRegistrationTool:
         self.canvas = FigureCanvasTkAgg(self.fig, self.image_frame)
         self.canvas.get_tk_widget().pack()
 
+        # Numbered control points, blitted over the cached image panels
+        self.original_markers = MarkerOverlay(self.canvas, self.axs[0], 'red', markersize=5.5)
+        self.transformed_markers = MarkerOverlay(self.canvas, self.axs[1], 'blue', markersize=5.5)
+
         # Register click, zoom, and pan events
         self.cid_original = self.fig.canvas.mpl_connect('button_press_event', self.on_click)
         self.cid_zoom = self.fig.canvas.mpl_connect('scroll_event', self.on_zoom)
@@ -84,7 +94,7 @@ class ImageRegistrationTool:
         file_path = filedialog.askopenfilename()
         if file_path:
             self.original_image = imread(file_path, as_gray=True)
-            self.axs[0].imshow(self.original_image, cmap='gray')
+            self.display.show(self.axs[0], self.original_image, cmap='gray')
             self.axs[0].set_aspect('equal', adjustable='box')
             self.axs[0].set_title("Original Image")
             self.canvas.draw()
@@ -93,7 +103,7 @@ class ImageRegistrationTool:
         file_path = filedialog.askopenfilename()
         if file_path:
             self.transformed_image = imread(file_path, as_gray=True)
-            self.axs[1].imshow(self.transformed_image, cmap='gray')
+            self.display.show(self.axs[1], self.transformed_image, cmap='gray')
             self.axs[1].set_aspect('equal', adjustable='box')
             self.axs[1].set_title("Transformed Image")
             self.canvas.draw()
@@ -114,28 +124,28 @@ class ImageRegistrationTool:
         moving_points = np.array(self.moving_points)
 
         # Estimate the affine transformation
-        transform = AffineTransform()
-        if not transform.estimate(moving_points, fixed_points):
+        transform = registration_core.estimate_affine(moving_points, fixed_points)
+        if transform is None:
             self.log("Affine transformation estimation failed.")
             return
 
         # Apply the affine transformation to register the transformed image
-        self.registered_image = warp(
-            self.transformed_image,
-            transform.inverse,
-            output_shape=self.original_image.shape,
-            order=0,  # Use nearest-neighbor interpolation for sharpness
-            preserve_range=True  # Preserve original pixel values
-        ).astype(self.original_image.dtype)
+        # (fastest warp backend for this size; values are never rescaled)
+        self.registered_image = warp_engine.warp_channels(
+            [self.transformed_image],
+            transform,
+            self.original_image.shape,
+            order=0  # Use nearest-neighbor interpolation for sharpness
+        )[0].astype(self.original_image.dtype)
 
         # Display the registered image in the third panel
-        self.axs[2].imshow(self.registered_image, cmap='gray')
+        self.display.show(self.axs[2], self.registered_image, cmap='gray')
         self.axs[2].set_title("Registered Image")
 
         # Blend the original image and the registered image with 50% weightage for each
         blended_image = 0.5 * self.original_image + 0.5 * self.registered_image
         blended_image = np.clip(blended_image, 0, 1)  # Ensure pixel values are in the valid range [0, 1]
-        self.axs[3].imshow(blended_image, cmap='gray')
+        self.display.show(self.axs[3], blended_image, cmap='gray')
         self.axs[3].set_title("Superimposed Image")
         self.canvas.draw()
 
@@ -157,17 +167,14 @@ class ImageRegistrationTool:
             x, y = event.xdata, event.ydata
             self.fixed_points.append((x, y))
             self.original_points_listbox.insert(tk.END, f"({x:.1f}, {y:.1f})")
-            self.axs[0].scatter(x, y, color='red', s=30)
-            self.axs[0].text(x + 5, y, f"{len(self.fixed_points)}", color='red', fontsize=10)
+            self.original_markers.add((x, y))
             self.log(f"Point marked on Original Image: ({x:.1f}, {y:.1f})")
         elif event.inaxes == self.axs[1] and self.transformed_image is not None:
             x, y = event.xdata, event.ydata
             self.moving_points.append((x, y))
             self.transformed_points_listbox.insert(tk.END, f"({x:.1f}, {y:.1f})")
-            self.axs[1].scatter(x, y, color='blue', s=30)
-            self.axs[1].text(x + 5, y, f"{len(self.moving_points)}", color='blue', fontsize=10)
+            self.transformed_markers.add((x, y))
             self.log(f"Point marked on Transformed Image: ({x:.1f}, {y:.1f})")
-        self.canvas.draw()
 
     def on_zoom(self, event):
         """
@@ -197,7 +204,8 @@ class ImageRegistrationTool:
                 y_mouse - (y_mouse - y_min) * zoom_factor,
                 y_mouse + (y_max - y_mouse) * zoom_factor
             )
-            self.canvas.draw()
+            # The display pyramid has already swapped in the matching level.
+            self.canvas.draw_idle()
 
     # def on_pan_press(self, event):
     #     """
@@ -251,37 +259,9 @@ class ImageRegistrationTool:
             self.redraw_points()
 
     def redraw_points(self):
-        # Store current zoom/pan limits
-        xlim0 = self.axs[0].get_xlim()
-        ylim0 = self.axs[0].get_ylim()
-        xlim1 = self.axs[1].get_xlim()
-        ylim1 = self.axs[1].get_ylim()
-
-        # Redraw ax[0]
-        self.axs[0].clear()
-        self.axs[0].imshow(self.original_image, cmap='gray')
-        self.axs[0].set_title("Original Image")
-        # Restore old limits
-        self.axs[0].set_xlim(xlim0)
-        self.axs[0].set_ylim(ylim0)
-
-        # Redraw ax[1]
-        self.axs[1].clear()
-        self.axs[1].imshow(self.transformed_image, cmap='gray')
-        self.axs[1].set_title("Transformed Image")
-        # Restore old limits
-        self.axs[1].set_xlim(xlim1)
-        self.axs[1].set_ylim(ylim1)
-
-        # Re-plot your scatter points
-        for i, (x, y) in enumerate(self.fixed_points):
-            self.axs[0].scatter(x, y, color='red', s=30)
-            self.axs[0].text(x + 5, y, f"{i + 1}", color='red', fontsize=10)
-        for i, (x, y) in enumerate(self.moving_points):
-            self.axs[1].scatter(x, y, color='blue', s=30)
-            self.axs[1].text(x + 5, y, f"{i + 1}", color='blue', fontsize=10)
-
-        self.canvas.draw()
+        # Markers are renumbered and blitted in place; the images are untouched.
+        self.original_markers.set_points(self.fixed_points)
+        self.transformed_markers.set_points(self.moving_points)
 
     def log(self, message):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,195 @@
+"""
+Hexagonal-grid .ang scans resampled to a square pixel grid.
+
+A TSL/EDAX ``HexGrid`` scan stores its rows one after another: rows 0, 2, 4,
+... hold NCOLS_ODD points at x = j * XSTEP, rows 1, 3, ... hold NCOLS_EVEN
+points shifted by half a step, and rows are YSTEP (= XSTEP * sqrt(3) / 2)
+apart.  Reshaping that to NROWS x NCOLS_ODD fails or shears the map.
+
+``to_square_grid`` resamples every parsed column onto square XSTEP x XSTEP
+pixels covering the same area, so pixel (r, c) lies at the physical
+position (c * XSTEP, r * XSTEP) and the rest of the pipeline (images, maps,
+physical sampling) works unchanged.  Continuous columns (IQ, CI, fit, ...)
+are interpolated linearly along the two scan rows bracketing the pixel and
+then between them.  Orientations and phase cannot be averaged, so they take
+the value of the nearest scan point.
+
+The gather indices and weights depend only on the grid geometry.  A
+``ResamplingPlan`` is built once per geometry and kept in a small LRU cache,
+so converting each column (and loading further scans of the same geometry)
+is one gather.
+"""
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+HEX_GRID = "HexGrid"
+SQUARE_GRID = "SqrGrid"
+
+# Columns taken from the nearest scan point: Euler angles and phase.
+NEAREST_COLUMNS = (0, 1, 2, 7)
+
+HexGeometry = namedtuple("HexGeometry", "nrows ncols_odd ncols_even xstep ystep")
+
+
+def is_hex(header):
+    return str(header.get("GRID", SQUARE_GRID)).strip().lower() == HEX_GRID.lower()
+
+
+def geometry(header):
+    """Hex geometry of a parsed .ang header."""
+    ncols_odd = int(header.get("NCOLS_ODD", 0))
+    ncols_even = int(header.get("NCOLS_EVEN", ncols_odd - 1))
+    xstep = float(header.get("XSTEP", 1.0))
+    ystep = float(header.get("YSTEP", xstep * math.sqrt(3.0) / 2.0))
+    return HexGeometry(int(header.get("NROWS", 0)), ncols_odd, ncols_even, xstep, ystep)
+
+
+def point_count(geom, nrows=None):
+    """Scan points in the first ``nrows`` rows (default: all)."""
+    nrows = geom.nrows if nrows is None else nrows
+    return (nrows + 1) // 2 * geom.ncols_odd + nrows // 2 * geom.ncols_even
+
+
+def square_shape(geom):
+    """(rows, cols) of the square grid covering the scan."""
+    rows = int(math.floor((geom.nrows - 1) * geom.ystep / geom.xstep + 1e-9)) + 1
+    return rows, geom.ncols_odd
+
+
+# ----------------------------------------------------------------------
+# Resampling plan
+# ----------------------------------------------------------------------
+class ResamplingPlan:
+    def __init__(self, geom):
+        """
+        Precomputes the gather of square-grid pixels from the scan points of
+        ``geom``.
+
+        Attributes:
+            indices (np.ndarray): (4, pixels) scan points blended per pixel
+                (two in each bracketing row).
+            weights (np.ndarray): (4, pixels) float32 linear weights.
+            nearest (np.ndarray): (pixels,) nearest scan point per pixel.
+        """
+        self.geometry = geom
+        self.shape = square_shape(geom)
+        rows, cols = self.shape
+        dtype = np.int32 if point_count(geom) < 2 ** 31 else np.int64
+
+        y = np.arange(rows, dtype=np.float64) * geom.xstep
+        x = np.arange(cols, dtype=np.float64) * geom.xstep
+        row_pos = y / geom.ystep
+        r0 = np.clip(np.floor(row_pos).astype(np.int64), 0, geom.nrows - 1)
+        r1 = np.minimum(r0 + 1, geom.nrows - 1)
+        wy = np.where(r1 > r0, row_pos - r0, 0.0)[:, None]
+
+        indices, weights, candidates = [], [], []
+        for r, w_row in ((r0, 1.0 - wy), (r1, wy)):
+            odd = r % 2 == 1                       # shifted rows (NCOLS_EVEN points)
+            start = point_count(geom, r)[:, None]
+            length = np.where(odd, geom.ncols_even, geom.ncols_odd)[:, None]
+            u = x[None, :] / geom.xstep - np.where(odd, 0.5, 0.0)[:, None]
+            j0 = np.clip(np.floor(u).astype(np.int64), 0, length - 1)
+            j1 = np.minimum(j0 + 1, length - 1)
+            wx = np.where(j1 > j0, np.clip(u - j0, 0.0, 1.0), 0.0)
+            indices += [start + j0, start + j1]
+            weights += [w_row * (1.0 - wx), w_row * wx]
+            # Squared distances of both row points to the pixel centre.
+            for j in (j0, j1):
+                dx = (j + np.where(odd, 0.5, 0.0)[:, None]) * geom.xstep - x[None, :]
+                dy = r[:, None] * geom.ystep - y[:, None]
+                candidates.append(dx * dx + dy * dy)
+
+        self.indices = np.stack([index.ravel() for index in indices]).astype(dtype)
+        self.weights = np.stack([w.ravel() for w in weights]).astype(np.float32)
+        closest = np.argmin(np.stack([d.ravel() for d in candidates]), axis=0)
+        self.nearest = self.indices[closest, np.arange(rows * cols)]
+
+    def nbytes(self):
+        return self.indices.nbytes + self.weights.nbytes + self.nearest.nbytes
+
+    def resample(self, column, nearest=False):
+        """
+        One scan column on the square grid.
+
+        Parameters:
+            column (np.ndarray): (points,) values in .ang order.
+            nearest (bool): Take the nearest scan point instead of blending.
+
+        Returns:
+            np.ndarray: (rows * cols,) values in the column's dtype.
+        """
+        column = np.asarray(column)
+        if nearest:
+            return column[self.nearest]
+        out = np.zeros(self.indices.shape[1], dtype=np.float32)
+        for index, weight in zip(self.indices, self.weights):
+            out += weight * column[index]
+        return out.astype(column.dtype, copy=False)
+
+
+class PlanCache:
+    """Small LRU cache of resampling plans, keyed on the grid geometry."""
+
+    def __init__(self, max_entries=2):
+        self.max_entries = max_entries
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, geom):
+        with self._lock:
+            plan = self._plans.get(geom)
+            if plan is not None:
+                self._plans.move_to_end(geom)
+                return plan
+        plan = ResamplingPlan(geom)
+        with self._lock:
+            self._plans[geom] = plan
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+# Plans shared by every load in this process.
+PLANS = PlanCache()
+
+
+def to_square_grid(header, data, cache=PLANS):
+    """
+    Resamples the columns of a hex-grid scan onto a square grid.
+
+    Parameters:
+        header (dict): Parsed .ang header (GRID, NROWS, NCOLS_ODD/EVEN,
+            XSTEP, YSTEP).
+        data (dict): Column index -> (points,) array (see ang_parser.read_ang).
+        cache (PlanCache or None): Plans reused across loads.
+
+    Returns:
+        tuple: (square-grid header: NROWS/NCOLS_ODD/NCOLS_EVEN of the new
+        grid, YSTEP = XSTEP, GRID = SqrGrid; {column: (rows * cols,) array})
+    """
+    geom = geometry(header)
+    available = min((len(column) for column in data.values()), default=0)
+    nrows = geom.nrows
+    if point_count(geom) > available:
+        # An interrupted scan stops inside a row; keep the complete ones.
+        while nrows > 0 and point_count(geom, nrows) > available:
+            nrows -= 1
+        print(f"warning!!! hex grid has {available} of {point_count(geom)} points; keeping {nrows} complete rows")
+        geom = geom._replace(nrows=nrows)
+    if geom.nrows < 1 or geom.ncols_odd < 1:
+        raise ValueError(f"Hex grid without complete rows: {dict(header)}")
+
+    plan = cache.get(geom) if cache is not None else ResamplingPlan(geom)
+    columns = {c: plan.resample(column, nearest=c in NEAREST_COLUMNS) for c, column in data.items()}
+    rows, cols = plan.shape
+    square = dict(header, GRID=SQUARE_GRID, NROWS=float(rows), NCOLS_ODD=float(cols), NCOLS_EVEN=float(cols),
+                  YSTEP=geom.xstep)
+    return square, columns
@@ -0,0 +1,212 @@
+"""
+Background jobs for the Tk GUIs.
+
+Long stages (loading, registration, export) run on a small thread pool so the
+Tk main loop keeps handling events.  Workers never touch Tk: they post
+progress and results to a queue which the scheduler drains on the UI thread
+via ``root.after``, so every callback runs on the main thread.
+
+Jobs are grouped by key ("register", "export", ...):
+
+* at most one job per key runs at a time; submitting while one is running
+  cancels it and queues the new job, which starts once the old one has
+  stopped (later submissions replace a queued job that has not started);
+* submitting a job whose ``token`` equals the running or queued job of that
+  key returns the existing job, so a double click does the work once.
+
+Cancellation is cooperative: the job function receives its :class:`Job` and
+calls ``job.check()`` / ``job.progress()`` between steps, which raise
+:class:`JobCancelled` once the job has been cancelled.  A cancelled job's
+result is never delivered.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL_MS = 50
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been cancelled."""
+
+
+class Job:
+    def __init__(self, key, token=None, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.key = key
+        self.token = token
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.future = None
+        self.finished = False
+        self._call = None
+        self._cancel = threading.Event()
+        self._events = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        """Raises JobCancelled if the job has been cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+
+    def progress(self, fraction, message=None):
+        """Reports progress (0..1) to the UI thread; also a cancellation point."""
+        self.check()
+        self._events.put((self, "progress", (fraction, message)))
+
+
+class JobScheduler:
+    def __init__(self, root, max_workers=None, poll_interval=POLL_INTERVAL_MS):
+        """
+        Parameters:
+            root: Tk root (anything with ``after``) used to run callbacks.
+            max_workers (int or None): Worker threads (default: up to 4).
+            poll_interval (int): Milliseconds between queue drains while
+                jobs are active.
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1), thread_name_prefix="job"
+        )
+        self._events = queue.SimpleQueue()
+        self._running = {}   # key -> Job submitted to the pool
+        self._queued = {}    # key -> Job waiting for the running one to stop
+        self._polling = False
+
+    # ----------------------------------------------------------------------
+    # Submitting and cancelling
+    # ----------------------------------------------------------------------
+    def submit(self, key, fn, *args, token=None, on_done=None, on_error=None, on_progress=None,
+               on_cancel=None, **kwargs):
+        """
+        Runs ``fn(job, *args, **kwargs)`` on a worker thread.
+
+        Parameters:
+            key (str): Job group; a new job supersedes the previous one.
+            fn (callable): Work function; receives the Job first.
+            token (hashable or None): Identity of the work; an active job of
+                the same key and token is returned instead of a new one.
+            on_done (callable): ``on_done(result)`` on the UI thread.
+            on_error (callable): ``on_error(exception)`` on the UI thread.
+            on_progress (callable): ``on_progress(fraction, message)`` on the
+                UI thread; only the latest report per drain is delivered.
+            on_cancel (callable): ``on_cancel()`` once a cancelled job stops.
+
+        Returns:
+            Job: The new (or the equivalent existing) job.
+        """
+        running = self._running.get(key)
+        queued = self._queued.get(key)
+        if token is not None:
+            for active in (queued, running):
+                if active is not None and not active.cancelled and active.token == token:
+                    return active
+
+        job = Job(key, token, on_done, on_error, on_progress, on_cancel)
+        job._events = self._events
+        job._call = (fn, args, kwargs)
+        if queued is not None:
+            queued.cancel()
+            self._finish(queued, "cancelled", None)
+        if running is not None:
+            running.cancel()
+            self._queued[key] = job
+        else:
+            self._start(job)
+        return job
+
+    def cancel(self, key=None):
+        """Cancels the jobs of ``key`` (all jobs if None)."""
+        for jobs in (self._queued, self._running):
+            for job_key, job in list(jobs.items()):
+                if key is None or job_key == key:
+                    job.cancel()
+        for job_key, job in list(self._queued.items()):
+            if key is None or job_key == key:
+                self._finish(job, "cancelled", None)
+
+    def busy(self, key=None):
+        if key is None:
+            return bool(self._running or self._queued)
+        return key in self._running or key in self._queued
+
+    def shutdown(self):
+        """Cancels everything and stops the pool without waiting."""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ----------------------------------------------------------------------
+    # Worker side
+    # ----------------------------------------------------------------------
+    def _start(self, job):
+        self._running[job.key] = job
+        job.future = self._executor.submit(self._run, job, *job._call)
+        self._schedule_poll()
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.check()
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._events.put((job, "cancelled", None))
+        except Exception as e:
+            self._events.put((job, "cancelled" if job.cancelled else "error", e))
+        else:
+            self._events.put((job, "cancelled" if job.cancelled else "done", result))
+
+    # ----------------------------------------------------------------------
+    # UI side
+    # ----------------------------------------------------------------------
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._drain)
+
+    def _drain(self):
+        self._polling = False
+        progress = {}
+        while True:
+            try:
+                job, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress[job] = payload
+            else:
+                progress.pop(job, None)
+                self._finish(job, kind, payload)
+
+        for job, (fraction, message) in progress.items():
+            if job.on_progress is not None and not job.cancelled:
+                job.on_progress(fraction, message)
+
+        if self._running or self._queued:
+            self._schedule_poll()
+
+    def _finish(self, job, kind, payload):
+        if job.finished:
+            return
+        job.finished = True
+        if self._running.get(job.key) is job:
+            del self._running[job.key]
+            queued = self._queued.pop(job.key, None)
+            if queued is not None:
+                self._start(queued)
+        elif self._queued.get(job.key) is job:
+            del self._queued[job.key]
+
+        if kind == "done" and job.on_done is not None:
+            job.on_done(payload)
+        elif kind == "error" and job.on_error is not None:
+            job.on_error(payload)
+        elif kind == "cancelled" and job.on_cancel is not None:
+            job.on_cancel()
@@ -0,0 +1,132 @@
+"""
+Live least-squares affine fit of the control points.
+
+``LiveAffineFit`` keeps the normal equations of the moving -> fixed affine
+fit, i.e. the sums of [x, y, 1]^T [x, y, 1] and [x, y, 1]^T [x', y'] over
+the point pairs, plus the sum of squared fixed coordinates.  Adding or
+removing a pair is a rank-one update of these sums, so an edit costs O(1)
+instead of a refit over every point.  Solving the 3x3 system gives the
+transform and the sums give the RMS error directly; per-point residuals are
+one vectorised pass over the pairs.
+
+Pairs are formed by index (the i-th EBSD point with the i-th LRS point),
+exactly as the registration uses them.  ``sync`` diffs the pair list against
+the one the sums were built from and only updates the pairs that changed:
+appending a point touches one pair, deleting one shifts the pairs after it.
+"""
+import numpy as np
+
+MIN_PAIRS = 3
+
+# Normal matrices worse conditioned than this (collinear points) have no fit.
+MAX_CONDITION = 1e12
+
+
+class LiveAffineFit:
+    def __init__(self):
+        self.pairs = []                    # [(fixed (x, y), moving (x, y)), ...]
+        self._mtm = np.zeros((3, 3))       # sum of h h^T, h = [mx, my, 1]
+        self._mtf = np.zeros((3, 2))       # sum of h f^T
+        self._ftf = 0.0                    # sum of |f|^2
+        self._solution = None
+        self._solved = False
+
+    def __len__(self):
+        return len(self.pairs)
+
+    # ----------------------------------------------------------------------
+    # Rank-one updates
+    # ----------------------------------------------------------------------
+    def _update(self, fixed, moving, sign):
+        h = np.array([moving[0], moving[1], 1.0])
+        f = np.array([fixed[0], fixed[1]], dtype=np.float64)
+        self._mtm += sign * np.outer(h, h)
+        self._mtf += sign * np.outer(h, f)
+        self._ftf += sign * float(f @ f)
+        self._solved = False
+
+    def add(self, fixed, moving):
+        """Appends the pair (fixed, moving)."""
+        pair = (tuple(fixed), tuple(moving))
+        self.pairs.append(pair)
+        self._update(*pair, 1.0)
+
+    def remove(self, index):
+        """Removes pair ``index`` (later pairs move up)."""
+        pair = self.pairs.pop(index)
+        if self.pairs:
+            self._update(*pair, -1.0)
+        else:
+            # Start exactly from zero again instead of accumulating round-off.
+            self.clear()
+
+    def clear(self):
+        self.pairs = []
+        self._mtm[...] = 0.0
+        self._mtf[...] = 0.0
+        self._ftf = 0.0
+        self._solved = False
+
+    def sync(self, fixed_points, moving_points):
+        """
+        Updates the fit to the pairs of ``fixed_points`` and ``moving_points``.
+
+        Only pairs that differ from the current ones are updated (the common
+        prefix is kept).
+
+        Returns:
+            int: Number of rank-one updates made.
+        """
+        new = [(tuple(f), tuple(m)) for f, m in zip(fixed_points, moving_points)]
+        keep = 0
+        limit = min(len(new), len(self.pairs))
+        while keep < limit and new[keep] == self.pairs[keep]:
+            keep += 1
+        updates = 0
+        while len(self.pairs) > keep:
+            self.remove(len(self.pairs) - 1)
+            updates += 1
+        for fixed, moving in new[keep:]:
+            self.add(fixed, moving)
+            updates += 1
+        return updates
+
+    # ----------------------------------------------------------------------
+    # Results
+    # ----------------------------------------------------------------------
+    def _solve(self):
+        if not self._solved:
+            self._solved = True
+            self._solution = None
+            if len(self.pairs) >= MIN_PAIRS and np.linalg.cond(self._mtm) < MAX_CONDITION:
+                self._solution = np.linalg.solve(self._mtm, self._mtf)     # (3, 2)
+        return self._solution
+
+    def transform(self):
+        """Current moving -> fixed AffineTransform, or None (too few / collinear points)."""
+        from skimage.transform import AffineTransform
+
+        solution = self._solve()
+        if solution is None:
+            return None
+        params = np.eye(3)
+        params[:2] = solution.T
+        return AffineTransform(matrix=params)
+
+    def rms(self):
+        """RMS residual in fixed (EBSD) pixels from the sums alone, or None."""
+        solution = self._solve()
+        if solution is None:
+            return None
+        # sum |P^T h - f|^2 = sum |f|^2 - 2 tr(P^T M^T F) + tr(P^T M^T M P)
+        sse = self._ftf - 2.0 * np.sum(solution * self._mtf) + np.sum(solution * (self._mtm @ solution))
+        return float(np.sqrt(max(sse, 0.0) / len(self.pairs)))
+
+    def residuals(self):
+        """(n,) distances between each mapped LRS point and its EBSD point, or None."""
+        solution = self._solve()
+        if solution is None:
+            return None
+        pairs = np.array(self.pairs, dtype=np.float64)            # (n, 2, 2)
+        h = np.column_stack([pairs[:, 1], np.ones(len(pairs))])
+        return np.hypot(*(h @ solution - pairs[:, 0]).T)
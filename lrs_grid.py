@@ -0,0 +1,84 @@
+"""
+Gridding of point-wise LRS (laser Raman) CSV exports.
+
+An LRS export has one row per measured point with X, Y and a few value
+columns.  ``grid_columns`` works out the X/Y -> column/row mapping once and
+scatters every value column into a single (channels, H, W) float32 stack,
+which replaces one ``DataFrame.pivot`` per column and keeps memory at one
+float32 copy per channel even for maps with tens of millions of points.
+Pixels that were not measured are NaN.
+"""
+import numpy as np
+
+DEFAULT_VALUE_COLUMNS = ("WaveNumber", "shift")
+
+
+def grid_index(coords, step=None):
+    """
+    Maps coordinates to integer grid indices.
+
+    Parameters:
+        coords (np.ndarray): 1-D X or Y coordinates.
+        step (float or None): Grid spacing.  When given the index is taken
+            straight from the spacing (no sort); otherwise from the sorted
+            unique coordinate values, like ``DataFrame.pivot``.
+
+    Returns:
+        tuple: (index array, coordinate value of every grid line)
+    """
+    if step is None:
+        values, index = np.unique(coords, return_inverse=True)
+        return index.reshape(-1), values
+    origin = coords.min()
+    index = np.rint((coords - origin) / step).astype(np.intp)
+    return index, origin + step * np.arange(index.max() + 1)
+
+
+def grid_columns(x, y, values, step=None):
+    """
+    Scatters point values onto the regular X/Y grid.
+
+    Parameters:
+        x, y (np.ndarray): 1-D point coordinates.
+        values (sequence of np.ndarray): One 1-D array per channel.
+        step (float, tuple or None): Grid spacing (shared or (x_step, y_step));
+            None derives the grid from the unique coordinates.
+
+    Returns:
+        tuple: (stack of shape (channels, H, W) float32, x grid values, y grid values)
+    """
+    x_step, y_step = step if isinstance(step, (tuple, list)) else (step, step)
+    col, x_values = grid_index(np.asarray(x), x_step)
+    row, y_values = grid_index(np.asarray(y), y_step)
+    height, width = len(y_values), len(x_values)
+
+    flat = row * width + col
+    seen = np.zeros(height * width, dtype=bool)
+    seen[flat] = True
+    if np.count_nonzero(seen) != flat.size:
+        raise ValueError("Index contains duplicate entries, cannot grid LRS data")
+
+    stack = np.full((len(values), height * width), np.nan, dtype=np.float32)
+    for channel, column in zip(stack, values):
+        channel[flat] = column
+    return stack.reshape(len(values), height, width), x_values, y_values
+
+
+def read_lrs_csv(csv_file, value_columns=DEFAULT_VALUE_COLUMNS, step=None):
+    """
+    Reads an LRS CSV export (columns X, Y and ``value_columns``) into a grid.
+
+    Returns:
+        tuple: (stack (channels, H, W) float32, x grid values, y grid values)
+    """
+    import pandas as pd
+
+    dtypes = {name: np.float32 for name in value_columns}
+    dtypes.update({"X": np.float64, "Y": np.float64})
+    frame = pd.read_csv(csv_file, delimiter=",", usecols=["X", "Y", *value_columns], dtype=dtypes)
+    return grid_columns(
+        frame["X"].to_numpy(),
+        frame["Y"].to_numpy(),
+        [frame[name].to_numpy() for name in value_columns],
+        step=step,
+    )
@@ -0,0 +1,131 @@
+"""
+Blitted control-point markers.
+
+Adding a ``scatter`` per click and calling ``canvas.draw()`` re-renders all
+four image panels for every point.  A ``MarkerOverlay`` keeps one animated
+marker line and one label per point for a single axes.  It caches the
+rendered axes (images included) after each full draw and, on edits, restores
+that background and draws only the markers.  It also caches the frame with
+the markers on it, so adding a point draws just that one marker and label:
+placing the 50th point costs the same as placing the first.
+"""
+from matplotlib.transforms import offset_copy
+
+# Label offset from its marker, in points.
+LABEL_OFFSET = 5
+
+
+class MarkerOverlay:
+    def __init__(self, canvas, ax, color, markersize=6, labels=True, fontsize=10):
+        """
+        Parameters:
+            canvas: Matplotlib canvas the axes is drawn on.
+            ax: Axes the markers belong to.
+            color: Marker and label colour.
+            markersize (float): Marker size in points.
+            labels (bool): Number the markers 1, 2, ...
+            fontsize (int): Label font size.
+        """
+        self.canvas = canvas
+        self.ax = ax
+        self.color = color
+        self.labels = labels
+        self.fontsize = fontsize
+        self.points = []
+        self._background = None   # axes without markers
+        self._composite = None    # axes with the current markers
+        style = dict(linestyle="none", marker="o", markersize=markersize, color=color, zorder=5, animated=True)
+        self._line, = ax.plot([], [], **style)
+        self._new, = ax.plot([], [], **style)   # only the point being added
+        self._texts = []
+        self._label_transform = offset_copy(ax.transData, fig=ax.figure, x=LABEL_OFFSET, y=0, units="points")
+        self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    # ----------------------------------------------------------------------
+    # Editing
+    # ----------------------------------------------------------------------
+    def set_points(self, points):
+        """Shows exactly ``points`` ([(x, y), ...])."""
+        self.points = [tuple(point) for point in points]
+        self._sync()
+        self.blit()
+
+    def add(self, point):
+        self.points.append(tuple(point))
+        self._sync()
+        if self._composite is None:
+            self.blit()
+            return
+        # Earlier markers are already in the cached frame: draw the new one only.
+        self.canvas.restore_region(self._composite)
+        self._new.set_data([point[0]], [point[1]])
+        self.ax.draw_artist(self._new)
+        if self.labels:
+            self.ax.draw_artist(self._texts[-1])
+        self._show()
+
+    def remove(self, index):
+        del self.points[index]
+        self._sync()
+        self.blit()
+
+    def move(self, index, point):
+        self.points[index] = tuple(point)
+        self._sync()
+        self.blit()
+
+    def _sync(self):
+        xs = [x for x, _ in self.points]
+        ys = [y for _, y in self.points]
+        self._line.set_data(xs, ys)
+        if not self.labels:
+            return
+        while len(self._texts) < len(self.points):
+            self._texts.append(self.ax.text(
+                0, 0, "", color=self.color, fontsize=self.fontsize, va="center",
+                transform=self._label_transform, animated=True, clip_on=True
+            ))
+        while len(self._texts) > len(self.points):
+            self._texts.pop().remove()
+        for number, (text, (x, y)) in enumerate(zip(self._texts, self.points), start=1):
+            text.set_position((x, y))
+            text.set_text(str(number))
+
+    # ----------------------------------------------------------------------
+    # Drawing
+    # ----------------------------------------------------------------------
+    def _artists(self):
+        return [self._line] + self._texts
+
+    def _draw_artists(self):
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+
+    def _on_draw(self, event):
+        # Animated artists are skipped by full draws: cache the axes without
+        # them, then put them on top of the fresh frame.
+        if self.ax.figure.canvas is not self.canvas:
+            return
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_artists()
+        self._composite = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def blit(self):
+        """Redraws only the markers over the cached axes background."""
+        if self._background is None:
+            # Nothing cached yet; the next full draw picks the markers up.
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self._show()
+
+    def _show(self):
+        self._composite = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.canvas.blit(self.ax.bbox)
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self._cid)
+        for artist in self._artists() + [self._new]:
+            artist.remove()
+        self._texts = []
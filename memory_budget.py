@@ -0,0 +1,90 @@
+"""
+Memory accounting for large registrations.
+
+``BufferPool`` hands out named float32 work arrays and gives the same array
+back while the requested shape stays the same, so re-registering or
+re-blending a map of the same size writes into the existing buffers instead
+of allocating a new full-size set each time.
+
+``StagePeaks`` records the peak traced memory of each pipeline stage with
+``tracemalloc`` (NumPy reports its array buffers to it).  Tracing slows
+Python allocations down, so it only runs while switched on.
+"""
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class BufferPool:
+    def __init__(self):
+        self._buffers = {}
+
+    def take(self, name, shape, dtype=np.float32):
+        """Buffer ``name`` of ``shape``; reused if the shape and dtype match."""
+        shape = tuple(int(n) for n in shape)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != np.dtype(dtype):
+            # Drop the old buffer before allocating so both never coexist.
+            self._buffers.pop(name, None)
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def release(self, name=None):
+        """Forgets buffer ``name`` (or all); it is freed once nothing uses it."""
+        if name is None:
+            self._buffers.clear()
+        else:
+            self._buffers.pop(name, None)
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+class StagePeaks:
+    def __init__(self):
+        self.peaks = {}       # stage -> (peak bytes above the stage start, traced bytes at the peak)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return tracemalloc.is_tracing()
+
+    def enable(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.peaks.clear()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Records the peak memory of the enclosed block as stage ``name``.
+
+        The peak is process-wide: stages running at the same time (e.g. an
+        export during the next registration) are counted in each other.
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        with self._lock:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            if tracemalloc.is_tracing():
+                _, peak = tracemalloc.get_traced_memory()
+                with self._lock:
+                    self.peaks[name] = (max(peak - start, 0), peak)
+
+    def format(self, name):
+        """Log line for stage ``name``, or None if it was not traced."""
+        if name not in self.peaks:
+            return None
+        above, total = self.peaks[name]
+        return f"Peak memory of {name}: +{above / 1024 ** 2:.1f} MB (traced total {total / 1024 ** 2:.1f} MB)"
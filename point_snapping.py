@@ -0,0 +1,163 @@
+"""
+Sub-pixel snapping of LRS control points by local cross-correlation.
+
+A clicked LRS position is only as accurate as the mouse at the current zoom.
+``snap_points`` refines every moving (LRS) point in one batch: the current
+affine fit predicts where each EBSD point lies on the LRS map; an EBSD patch
+around the point is resampled onto the LRS grid there (box-averaged over
+each LRS pixel); and normalised cross-correlation over a small search window
+locates it in the LRS map.  A parabola through the correlation peak and its
+neighbours gives the sub-pixel offset.
+
+All patches are sampled with one ``map_coordinates`` call per image and all
+correlation surfaces are computed in one vectorised pass; there is no loop
+over the points.
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import ndimage as ndi
+
+import ransac_engine
+
+# Template half-size in LRS pixels.
+PATCH_RADIUS = 5
+
+# Search half-size in LRS pixels around the predicted position.
+SEARCH_RADIUS = 3
+
+# Peaks below this correlation leave the point where it was.
+MIN_SCORE = 0.5
+
+# Cap on EBSD samples per LRS pixel edge for the box average.
+MAX_SUPERSAMPLE = 8
+
+
+def _fill_nan(image):
+    """Float copy with NaN (unmeasured) pixels set to the mean of the rest."""
+    image = np.asarray(image, dtype=np.float64)
+    finite = np.isfinite(image)
+    if finite.all():
+        return image
+    return np.where(finite, image, image[finite].mean() if finite.any() else 0.0)
+
+
+def _sample(image, points):
+    """Bilinear samples of ``image`` at (..., 2) (x, y) ``points``."""
+    coords = np.stack([points[..., 1].ravel(), points[..., 0].ravel()])
+    return ndi.map_coordinates(image, coords, order=1, mode='nearest').reshape(points.shape[:-1])
+
+
+def _templates(fixed, transform, centers, radius):
+    """
+    EBSD patches resampled onto the LRS grid around ``centers`` (LRS pixels).
+
+    Every LRS pixel of a patch is the mean of ``k x k`` EBSD samples spread
+    over its footprint, which approximates the area the LRS spot integrates.
+
+    Returns:
+        np.ndarray: (n, 2 * radius + 1, 2 * radius + 1) patches.
+    """
+    scale = math.sqrt(abs(np.linalg.det(transform.params[:2, :2])))
+    k = int(min(max(math.ceil(scale), 1), MAX_SUPERSAMPLE))
+    sub = (np.arange(k) + 0.5) / k - 0.5
+    offsets = np.arange(-radius, radius + 1, dtype=np.float64)
+    size = offsets.size
+    # (n, rows, cols, k, k, 2) LRS coordinates of the sub-samples.
+    along = offsets[:, None] + sub[None, :]                         # (cols, k)
+    grid = np.empty((len(centers), size, size, k, k, 2))
+    grid[..., 0] = centers[:, 0, None, None, None, None] + along[None, None, :, None, :]
+    grid[..., 1] = centers[:, 1, None, None, None, None] + along[None, :, None, :, None]
+    mapped = transform(grid.reshape(-1, 2)).reshape(grid.shape)
+    return _sample(fixed, mapped).mean(axis=(3, 4))
+
+
+def ncc_surfaces(templates, windows):
+    """
+    Normalised cross-correlation of each template at every shift.
+
+    Parameters:
+        templates (np.ndarray): (n, p, p) patches.
+        windows (np.ndarray): (n, p + 2s, p + 2s) search areas.
+
+    Returns:
+        np.ndarray: (n, 2s + 1, 2s + 1) correlations in [-1, 1] (0 where
+        either patch is flat).
+    """
+    p = templates.shape[-1]
+    t = templates - templates.mean(axis=(1, 2), keepdims=True)
+    t_norm = np.sqrt((t * t).sum(axis=(1, 2)))
+    views = sliding_window_view(windows, (p, p), axis=(1, 2))     # (n, 2s+1, 2s+1, p, p)
+    # t is zero-mean, so the window mean drops out of the numerator.
+    numerator = np.einsum('nabij,nij->nab', views, t)
+    sums = views.sum(axis=(3, 4))
+    squares = np.einsum('nabij,nabij->nab', views, views)
+    w_norm = np.sqrt(np.maximum(squares - sums * sums / (p * p), 0.0))
+    denominator = w_norm * t_norm[:, None, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 1e-12, numerator / denominator, 0.0)
+
+
+def _parabola(minus, center, plus):
+    """Vertex offset of the parabola through three equally spaced samples."""
+    curvature = minus - 2.0 * center + plus
+    with np.errstate(invalid='ignore', divide='ignore'):
+        offset = np.where(curvature < 0, 0.5 * (minus - plus) / curvature, 0.0)
+    return np.clip(offset, -0.5, 0.5)
+
+
+def snap_points(fixed_image, moving_image, fixed_points, moving_points, transform=None,
+                patch_radius=PATCH_RADIUS, search_radius=SEARCH_RADIUS, min_score=MIN_SCORE):
+    """
+    Refines all moving (LRS) control points to sub-pixel accuracy.
+
+    Parameters:
+        fixed_image, moving_image (np.ndarray): EBSD image and LRS map.
+        fixed_points, moving_points (list): Picked (x, y) pairs, at least 3.
+        transform (AffineTransform or None): Moving -> fixed transform used
+            to predict the LRS positions; default: the affine fit of the
+            pairs.
+        patch_radius (int): Template half-size in LRS pixels.
+        search_radius (int): Search half-size in LRS pixels.
+        min_score (float): Minimum peak correlation for a point to move.
+
+    Returns:
+        tuple: (snapped moving points as a list of (x, y), (n,) peak
+        correlations, (n,) bool mask of the points that were moved).
+        Points with a weak or border peak keep their clicked position.
+    """
+    fixed = np.asarray(fixed_points, dtype=np.float64).reshape(-1, 2)
+    moving = np.asarray(moving_points, dtype=np.float64).reshape(-1, 2)
+    if len(fixed) != len(moving):
+        raise ValueError(f"Point count mismatch: {len(fixed)} EBSD vs {len(moving)} LRS points")
+    if len(fixed) < 3:
+        raise ValueError("At least 3 point pairs are required to snap points.")
+    if transform is None:
+        transform = ransac_engine.fit_affine(moving, fixed)
+
+    predicted = transform.inverse(fixed)
+    templates = _templates(_fill_nan(fixed_image), transform, predicted, patch_radius)
+    reach = patch_radius + search_radius
+    offsets = np.arange(-reach, reach + 1, dtype=np.float64)
+    grid = np.empty((len(predicted), offsets.size, offsets.size, 2))
+    grid[..., 0] = predicted[:, 0, None, None] + offsets[None, None, :]
+    grid[..., 1] = predicted[:, 1, None, None] + offsets[None, :, None]
+    windows = _sample(_fill_nan(moving_image), grid)
+
+    surfaces = ncc_surfaces(templates, windows)
+    n, size = len(surfaces), surfaces.shape[-1]
+    peak = surfaces.reshape(n, -1).argmax(axis=1)
+    rows, cols = np.divmod(peak, size)
+    scores = surfaces[np.arange(n), rows, cols]
+    # Peaks on the search border may be cut off: no reliable estimate.
+    inside = (rows > 0) & (rows < size - 1) & (cols > 0) & (cols < size - 1)
+    moved = inside & (scores >= min_score)
+
+    r, c = np.clip(rows, 1, size - 2), np.clip(cols, 1, size - 2)
+    index = np.arange(n)
+    dy = _parabola(surfaces[index, r - 1, c], surfaces[index, r, c], surfaces[index, r + 1, c])
+    dx = _parabola(surfaces[index, r, c - 1], surfaces[index, r, c], surfaces[index, r, c + 1])
+    snapped = predicted + np.column_stack([cols - search_radius + dx, rows - search_radius + dy])
+    result = np.where(moved[:, None], snapped, moving)
+    return [tuple(point) for point in result.tolist()], scores, moved
@@ -0,0 +1,277 @@
+"""
+Automatic coarse-to-fine pre-alignment of the LRS map onto the EBSD image.
+
+Rotation and scale come from phase correlation of the log-polar resampled
+FFT magnitudes (translation-invariant, so they are found before any shift),
+translation from phase correlation of the images themselves.  The estimate
+starts on the coarsest level of Gaussian pyramids of both images and is
+refined level by level up to ``finest_edge``, re-estimating the residual
+rotation/scale and shift on each level.  As in ecc_refine, levels finer than
+about half the LRS pixel size are skipped: they add no information the LRS
+map has, only interpolation.  Every step is a few FFTs of the
+current level, so the cost stays O(N log N) in the pixel count.
+
+The result is a moving (LRS) -> fixed (EBSD) ``AffineTransform``, the same
+kind of transform the GUI fits from clicked points.
+"""
+import math
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy import ndimage as ndi
+from skimage.registration import phase_cross_correlation
+from skimage.transform import AffineTransform, SimilarityTransform, pyramid_reduce, warp_polar
+
+import warp_engine
+
+# Edge length the coarsest pyramid levels are reduced to.
+COARSE_EDGE = 128
+
+# Refinement stops at the level whose longer edge first drops to this size.
+FINEST_EDGE = 1024
+
+# Angular rows of the log-polar spectra (over 360 degrees).
+POLAR_ANGLES = 720
+
+# Sub-pixel precision of the phase correlation peaks (1 / factor pixels).
+UPSAMPLE_FACTOR = 20
+
+
+# ----------------------------------------------------------------------
+# Preparation
+# ----------------------------------------------------------------------
+def normalize(image):
+    """Zero-mean, unit-variance float64 copy; NaN (unmeasured) pixels become 0."""
+    image = np.asarray(image, dtype=np.float64)
+    finite = np.isfinite(image)
+    values = image[finite]
+    if not values.size:
+        return np.zeros(image.shape)
+    std = values.std()
+    out = np.where(finite, image - values.mean(), 0.0)
+    return out / std if std > 0 else out
+
+
+def pyramid(image, coarse_edge=COARSE_EDGE):
+    """Gaussian pyramid [full, 1/2, 1/4, ...] down to ``coarse_edge``."""
+    levels = [image]
+    while max(levels[-1].shape) > coarse_edge and min(levels[-1].shape) >= 16:
+        levels.append(pyramid_reduce(levels[-1], downscale=2, preserve_range=True))
+    return levels
+
+
+def _scaling(factor):
+    return np.diag([factor, factor, 1.0])
+
+
+def _about(center, matrix):
+    """``matrix`` applied about ``center`` (x, y) instead of the origin."""
+    shift = np.eye(3)
+    shift[:2, 2] = center
+    back = np.eye(3)
+    back[:2, 2] = -np.asarray(center)
+    return shift @ matrix @ back
+
+
+# ----------------------------------------------------------------------
+# Phase correlation steps
+# ----------------------------------------------------------------------
+def _magnitude_spectrum(image, size):
+    """Windowed, zero-padded, high-pass filtered FFT magnitude on a size x size canvas."""
+    rows, cols = image.shape
+    window = np.outer(np.hanning(rows), np.hanning(cols))
+    canvas = np.zeros((size, size))
+    row0, col0 = (size - rows) // 2, (size - cols) // 2
+    canvas[row0:row0 + rows, col0:col0 + cols] = image * window
+    magnitude = np.abs(sp_fft.fftshift(sp_fft.fft2(canvas)))
+    # Reddy & Chatterji high-pass: suppresses the low frequencies that carry
+    # little rotation/scale information and dominate the magnitude.
+    freq = np.cos(np.pi * (np.arange(size) / size - 0.5))
+    x = np.outer(freq, freq)
+    return magnitude * (1.0 - x) * (2.0 - x)
+
+
+def estimate_rotation_scale(fixed, moving, upsample_factor=UPSAMPLE_FACTOR):
+    """
+    Rotation (degrees, counter-clockwise in image coordinates) and scale of
+    ``moving`` relative to ``fixed`` from log-polar phase correlation.
+
+    Both are returned modulo the 180 degree ambiguity of FFT magnitudes.
+
+    Returns:
+        tuple: (rotation, scale) such that fixed ~ moving rotated by
+        ``rotation`` and scaled by ``scale``.
+    """
+    size = sp_fft.next_fast_len(2 * max(fixed.shape + moving.shape))
+    radius = size // 2
+    fixed_polar = warp_polar(_magnitude_spectrum(fixed, size), radius=radius,
+                             output_shape=(POLAR_ANGLES, radius), scaling='log', order=1)
+    moving_polar = warp_polar(_magnitude_spectrum(moving, size), radius=radius,
+                              output_shape=(POLAR_ANGLES, radius), scaling='log', order=1)
+    half = POLAR_ANGLES // 2
+    shift, _, _ = phase_cross_correlation(fixed_polar[:half], moving_polar[:half],
+                                          upsample_factor=upsample_factor, normalization=None)
+    rotation = shift[0] * 360.0 / POLAR_ANGLES
+    # The spectrum of an image enlarged by s shrinks by s.
+    scale = math.exp(-shift[1] * math.log(radius) / radius)
+    return rotation, scale
+
+
+def estimate_translation(fixed, moving_in_fixed, upsample_factor=UPSAMPLE_FACTOR):
+    """Shift (dx, dy) that moves ``moving_in_fixed`` onto ``fixed``."""
+    shift, _, _ = phase_cross_correlation(fixed, moving_in_fixed, upsample_factor=upsample_factor)
+    return shift[1], shift[0]
+
+
+def overlap_ncc(fixed, warped, coverage):
+    """Normalised cross-correlation of two images over the covered pixels."""
+    inside = coverage > 0.99
+    if inside.sum() < 16:
+        return -1.0
+    a = fixed[inside] - fixed[inside].mean()
+    b = warped[inside] - warped[inside].mean()
+    denominator = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denominator) if denominator > 0 else -1.0
+
+
+def _similarity(rotation, scale):
+    return SimilarityTransform(rotation=np.radians(rotation), scale=scale).params
+
+
+def _warp(moving, matrix, shape):
+    """Moving image in the fixed frame and its coverage (1 inside, 0 outside)."""
+    warped, coverage = warp_engine.warp_channels(
+        [moving, np.ones(moving.shape, dtype=np.float32)], AffineTransform(matrix=matrix), shape
+    )
+    return warped, coverage
+
+
+def _taper(coverage):
+    """Soft-edged coverage mask, so the overlap border adds no FFT ringing."""
+    return ndi.gaussian_filter(coverage, 2.0)
+
+
+def _refine(fixed, moving, matrix, global_search):
+    """
+    One level: rotation/scale about the fixed centre, then shift.
+
+    ``matrix`` maps ``moving`` pixels to ``fixed`` pixels on this level.
+    The global search (coarsest level) correlates against the whole fixed
+    image and also tries the 180 degree alternative; refinement levels only
+    look at the area the current estimate overlaps.
+
+    The incoming ``matrix`` is scored too and kept unless a candidate
+    correlates better, so a level that cannot improve the estimate (e.g.
+    fixed pixels far below the LRS pixel size) never makes it worse.
+
+    Returns:
+        tuple: (refined matrix, normalised cross-correlation of the overlap)
+    """
+    center = ((fixed.shape[1] - 1) / 2.0, (fixed.shape[0] - 1) / 2.0)
+    warped, coverage = _warp(moving, matrix, fixed.shape)
+    best = (matrix, overlap_ncc(fixed, warped, coverage))
+    if global_search:
+        rotation, scale = estimate_rotation_scale(fixed, warped)
+        candidates = [rotation, rotation + 180.0]
+    else:
+        taper = _taper(coverage)
+        rotation, scale = estimate_rotation_scale(fixed * taper, warped * taper)
+        candidates = [rotation]
+
+    for angle in candidates:
+        angle = (angle + 180.0) % 360.0 - 180.0
+        candidate = _about(center, _similarity(angle, scale)) @ matrix
+        warped, coverage = _warp(moving, candidate, fixed.shape)
+        if global_search:
+            dx, dy = estimate_translation(fixed, warped)
+        else:
+            taper = _taper(coverage)
+            dx, dy = estimate_translation(fixed * taper, warped * taper)
+        shifted = np.eye(3)
+        shifted[:2, 2] = (dx, dy)
+        candidate = shifted @ candidate
+        score = overlap_ncc(fixed, *_warp(moving, candidate, fixed.shape))
+        if score > best[1]:
+            best = (candidate, score)
+    return best
+
+
+def _finest_level(pixel):
+    """Finest useful fixed pyramid level: fixed pixels of about half an LRS pixel."""
+    return max(int(math.floor(math.log2(max(pixel, 1.0)))) - 1, 0)
+
+
+# ----------------------------------------------------------------------
+# Public entry points
+# ----------------------------------------------------------------------
+def prealign(fixed, moving, initial=None, coarse_edge=COARSE_EDGE, finest_edge=FINEST_EDGE, progress=None):
+    """
+    Estimates the moving -> fixed transform without control points.
+
+    Parameters:
+        fixed (np.ndarray): EBSD IQ image.
+        moving (np.ndarray): LRS intensity grid (NaN = unmeasured).
+        initial (AffineTransform or None): Starting guess; default maps the
+            moving frame onto the fixed frame by size (same field of view).
+        coarse_edge (int): Longer edge of the coarsest level.
+        finest_edge (int): Longer edge up to which levels are refined.
+        progress (callable or None): ``progress(done, total)`` after each
+            level; an exception raised by it stops the pre-alignment.
+
+    Returns:
+        tuple: (AffineTransform, normalised cross-correlation of the overlap
+        on the finest level; near 1 for a good alignment)
+    """
+    fixed_levels = pyramid(normalize(fixed), coarse_edge)
+    moving_levels = pyramid(normalize(moving), coarse_edge)
+
+    if initial is None:
+        # Same field of view: stretch the moving frame over the fixed frame.
+        scale = math.sqrt((fixed.shape[0] * fixed.shape[1]) / float(moving.shape[0] * moving.shape[1]))
+        center_fixed = np.array([(fixed.shape[1] - 1) / 2.0, (fixed.shape[0] - 1) / 2.0])
+        center_moving = np.array([(moving.shape[1] - 1) / 2.0, (moving.shape[0] - 1) / 2.0])
+        matrix = _scaling(scale)
+        matrix[:2, 2] = center_fixed - scale * center_moving
+    else:
+        matrix = np.asarray(initial.params, dtype=np.float64)
+
+    # Coarsest level always; finer ones while they fit into finest_edge.
+    levels = [len(fixed_levels) - 1] + [
+        level for level in range(len(fixed_levels) - 2, -1, -1) if max(fixed_levels[level].shape) <= finest_edge
+    ]
+    score = None
+    for done, level in enumerate(levels, start=1):
+        # LRS pixel size in full-resolution fixed pixels, per the current estimate.
+        pixel = math.sqrt(abs(np.linalg.det(matrix[:2, :2])))
+        if done > 1 and level < _finest_level(pixel):
+            break
+        fixed_level = fixed_levels[level]
+        fixed_factor = 2 ** level
+        # Moving level with pixels no smaller than the fixed ones (no aliasing).
+        moving_level = min(max(int(math.floor(math.log2(max(fixed_factor / pixel, 1.0)))), 0),
+                           len(moving_levels) - 1)
+        moving_factor = 2 ** moving_level
+        # Full-resolution matrix expressed between the two pyramid levels.
+        level_matrix = _scaling(1.0 / fixed_factor) @ matrix @ _scaling(moving_factor)
+        level_matrix, score = _refine(fixed_level, moving_levels[moving_level], level_matrix, global_search=done == 1)
+        matrix = _scaling(fixed_factor) @ level_matrix @ _scaling(1.0 / moving_factor)
+        if progress is not None:
+            progress(done, len(levels))
+    if progress is not None and done < len(levels):
+        progress(len(levels), len(levels))
+    return AffineTransform(matrix=matrix), score
+
+
+def seed_control_points(transform, moving_shape, per_side=3, inset=0.15):
+    """
+    Control-point pairs implied by ``transform`` on a grid over the moving map.
+
+    Returns:
+        tuple: (fixed points, moving points) as lists of (x, y)
+    """
+    rows, cols = moving_shape[:2]
+    xs = np.linspace(inset * (cols - 1), (1 - inset) * (cols - 1), per_side)
+    ys = np.linspace(inset * (rows - 1), (1 - inset) * (rows - 1), per_side)
+    moving = np.array([(x, y) for y in ys for x in xs])
+    fixed = transform(moving)
+    return [tuple(point) for point in fixed.tolist()], [tuple(point) for point in moving.tolist()]
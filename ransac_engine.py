@@ -0,0 +1,162 @@
+"""
+Batched RANSAC for affine control-point registration.
+
+``skimage.measure.ransac`` fits and scores one hypothesis per Python loop
+iteration, which dominates registration time once hundreds or thousands of
+automatically detected correspondences are used.  ``ransac_affine`` draws a
+whole batch of minimal 3-point samples at once, solves every candidate
+affine with one batched ``np.linalg.solve``, and scores all of them against
+all points in one vectorised step.  It stops once enough trials have been
+run for the best inlier ratio found so far (the usual RANSAC trial bound),
+then refits the transform on the inliers by least squares.
+
+Inliers, ties and the final refit follow skimage's ransac, so on the same
+data both return the same model up to sampling.
+"""
+import math
+
+import numpy as np
+
+MIN_SAMPLES = 3
+
+# Hypotheses drawn and scored per batch.
+DEFAULT_BATCH_SIZE = 256
+
+# Cap on hypotheses x points residuals evaluated at once (memory bound).
+MAX_BATCH_ELEMENTS = 4_000_000
+
+
+def required_trials(inlier_ratio, stop_probability, min_samples=MIN_SAMPLES):
+    """Trials needed to draw one all-inlier sample with ``stop_probability``."""
+    if stop_probability >= 1 or inlier_ratio <= 0:
+        return math.inf
+    if inlier_ratio >= 1 or stop_probability <= 0:
+        return 0
+    return math.ceil(math.log(1 - stop_probability) / math.log(1 - inlier_ratio ** min_samples))
+
+
+def solve_affines(src, dst):
+    """
+    Solves one affine per minimal sample.
+
+    Parameters:
+        src, dst (np.ndarray): (batch, 3, 2) point triples.
+
+    Returns:
+        tuple: ((batch, 3, 2) matrices A with [x, y, 1] @ A = [x', y'],
+        (batch,) bool mask of non-degenerate samples)
+    """
+    batch = src.shape[0]
+    lhs = np.empty((batch, 3, 3))
+    lhs[:, :, :2] = src
+    lhs[:, :, 2] = 1.0
+    # Collinear triples have no unique affine; swap in the identity so the
+    # batched solve cannot fail and drop them afterwards.
+    det = np.linalg.det(lhs)
+    scale = np.abs(src).max(axis=(1, 2)) ** 2 + 1.0
+    valid = np.abs(det) > 1e-9 * scale
+    lhs[~valid] = np.eye(3)
+    return np.linalg.solve(lhs, dst), valid
+
+
+def squared_residuals(matrices, src_h, dst):
+    """
+    Squared residuals of every hypothesis on every point.
+
+    Two (n, 3) x (3, batch) products (BLAS) instead of a per-hypothesis
+    loop; the result is (n, batch) so each hypothesis is a column.
+    """
+    dx = src_h @ matrices[:, :, 0].T
+    dy = src_h @ matrices[:, :, 1].T
+    dx -= dst[:, :1]
+    dy -= dst[:, 1:]
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return dx
+
+
+def fit_affine(src, dst):
+    """Least-squares affine (as AffineTransform) mapping src -> dst."""
+    from skimage.transform import AffineTransform
+
+    src_h = np.column_stack([src, np.ones(len(src))])
+    solution, *_ = np.linalg.lstsq(src_h, dst, rcond=None)
+    params = np.eye(3)
+    params[:2] = solution.T
+    return AffineTransform(matrix=params)
+
+
+def ransac_affine(src, dst, residual_threshold=2.0, max_trials=1000, stop_probability=0.99,
+                  stop_inlier_ratio=1.0, batch_size=DEFAULT_BATCH_SIZE, rng=None):
+    """
+    Robustly fits the affine transform mapping ``src`` onto ``dst``.
+
+    Parameters:
+        src, dst (array-like): (N, 2) corresponding points, N >= 3.
+        residual_threshold (float): Max distance (pixels) of an inlier.
+        max_trials (int): Upper bound on hypotheses.
+        stop_probability (float): Stop once an all-inlier sample has been
+            drawn with this probability given the best inlier ratio so far.
+        stop_inlier_ratio (float): Also stop as soon as this fraction of the
+            points are inliers.
+        batch_size (int): Hypotheses drawn and scored per batch.
+        rng: Seed or np.random.Generator, for reproducible results.
+
+    Returns:
+        tuple: (AffineTransform refitted on the inliers or None, (N,) bool
+        inlier mask or None) -- None if no valid hypothesis was found.
+    """
+    src = np.asarray(src, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=np.float64).reshape(-1, 2)
+    n = len(src)
+    if n != len(dst):
+        raise ValueError(f"Point count mismatch: {n} source vs {len(dst)} destination points")
+    if n < MIN_SAMPLES:
+        raise ValueError(f"At least {MIN_SAMPLES} points are required for RANSAC registration.")
+    rng = np.random.default_rng(rng)
+    src_h = np.column_stack([src, np.ones(n)])
+    batch_size = max(1, min(batch_size, MAX_BATCH_ELEMENTS // n))
+
+    best_count, best_sum, best_mask = 0, math.inf, None
+    trials, limit = 0, max_trials
+    while trials < limit:
+        size = min(batch_size, limit - trials)
+        samples = rng.integers(0, n, (size, MIN_SAMPLES))
+        # Samples that repeat a point are degenerate (counted as trials, as
+        # skimage counts rejected samples).
+        distinct = (samples[:, 0] != samples[:, 1]) & (samples[:, 0] != samples[:, 2]) \
+            & (samples[:, 1] != samples[:, 2])
+        trials += size
+        samples = samples[distinct]
+        if not len(samples):
+            continue
+
+        matrices, valid = solve_affines(src[samples], dst[samples])
+        matrices = matrices[valid]
+        if not len(matrices):
+            continue
+        squared = squared_residuals(matrices, src_h, dst)
+        inliers = squared < residual_threshold ** 2
+        counts = inliers.sum(axis=0)
+
+        # Most inliers wins; ties go to the smaller inlier residual sum,
+        # which is only evaluated for the hypotheses tied at the top.
+        top = counts.max()
+        if top < best_count:
+            continue
+        tied = np.flatnonzero(counts == top)
+        sums = np.sqrt(np.where(inliers[:, tied], squared[:, tied], 0.0)).sum(axis=0)
+        best = tied[np.argmin(sums)]
+        best_batch_sum = float(sums.min())
+        if top > best_count or best_batch_sum < best_sum:
+            best_count, best_sum, best_mask = int(top), best_batch_sum, inliers[:, best]
+            ratio = best_count / n
+            if ratio >= stop_inlier_ratio:
+                break
+            # Early stop: total trials needed for the best inlier ratio so far.
+            limit = min(max_trials, required_trials(ratio, stop_probability))
+
+    if best_mask is None or best_count < MIN_SAMPLES:
+        return None, None
+    return fit_affine(src[best_mask], dst[best_mask]), best_mask
@@ -0,0 +1,428 @@
+"""
+GUI-free registration pipeline: parse -> estimate -> warp -> export.
+
+``ImageRegistrationTool`` and the batch CLI (batch_register.py) both go
+through these functions, so a registration run headless produces the same
+files as one run from the GUI with the same inputs and control points.
+
+Importing this module only loads NumPy and the light parse/export helpers.
+OpenCV, scikit-image and the pre-alignment, refinement and sampling modules
+are imported by the functions that use them (``benchmarks.py imports``
+guards this).
+"""
+import os
+import time
+
+import numpy as np
+
+import EBSDImageGenerator
+import ebsd_maps
+import exporters
+import lrs_grid
+import ransac_engine
+import warp_engine
+
+METHODS = ("affine", "ransac")
+
+# LRS CSV columns gridded into channels, in channel order.
+LRS_VALUE_COLUMNS = ("WaveNumber", "shift")
+
+# ``points`` value that places control points by automatic pre-alignment.
+AUTO_POINTS = "auto"
+
+# File name of the tiled warp result written next to the EBSD data.
+TILED_OUTPUT_NAME = "registeredLRSChannels.npy"
+
+# Registered spectral cube (bands, rows, cols) and its wavenumber axis.
+CUBE_OUTPUT_NAME = "registeredLRSCube.npy"
+CUBE_WAVENUMBERS_NAME = "registeredLRSCubeWavenumbers.npy"
+
+
+# ----------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------
+def load_ebsd_maps(file_path, names=ebsd_maps.MAP_NAMES, cache=None, workers=1, lazy=False):
+    """
+    Parses an .ang file once and builds the EBSD maps ``names`` from it
+    (see ebsd_maps.py; IPF is skipped for phases without a colour key).
+
+    Parameters:
+        lazy (bool): Parse the columns of all ``names`` but build each map
+            only when first used (ebsd_maps.LazyMaps).
+
+    Returns:
+        tuple: (ebsd_maps.EBSDMaps or LazyMaps, .ang header dict)
+    """
+    ebsd_gen = EBSDImageGenerator.EBSDImageGenerator(
+        file_path, os.path.dirname(file_path), cache=cache, workers=workers, maps=names, lazy_maps=lazy
+    )
+    return ebsd_gen.maps, dict(ebsd_gen.header)
+
+
+def load_fixed_data(file_path, cache=None, workers=1, map_name=None):
+    """
+    Loads the fixed (EBSD) image: the IQ map of a .ang file, or any image
+    file read as grayscale.
+
+    Parameters:
+        map_name (str or None): .ang map to register against instead (see
+            ebsd_maps.MAP_NAMES; the IPF map as the mean of its channels).
+
+    Returns:
+        tuple: (image, .ang header dict with XSTEP/YSTEP/...; empty for images)
+    """
+    if file_path.endswith('.ang') and map_name is not None:
+        maps, header = load_ebsd_maps(file_path, (map_name,), cache=cache, workers=workers)
+        if map_name not in maps:
+            raise ValueError(f"EBSD map {map_name!r} cannot be built for {file_path}")
+        return np.array(maps.gray(map_name)), header
+    if file_path.endswith('.ang'):
+        ebsd_gen = EBSDImageGenerator.EBSDImageGenerator(
+            file_path, os.path.dirname(file_path), cache=cache, workers=workers
+        )
+        return np.array(ebsd_gen.image), dict(ebsd_gen.header)
+    from skimage.io import imread
+
+    return np.array(imread(file_path, as_gray=True)), {}
+
+
+def load_fixed_image(file_path, cache=None, workers=1, map_name=None):
+    """Loads the fixed (EBSD) image; see load_fixed_data."""
+    return load_fixed_data(file_path, cache=cache, workers=workers, map_name=map_name)[0]
+
+
+def load_lrs(csv_file, cache=None):
+    """
+    Grids an LRS CSV export (or reuses the cached grid).
+
+    Returns:
+        tuple: ({"channels": (2, H, W), "x": ..., "y": ...} arrays, True if
+        read from the cache)
+    """
+    if cache is not None:
+        cached = cache.get(csv_file, "lrs-grid")
+        if cached is not None:
+            return cached[0], True
+    # One gridding pass for all channels instead of a pivot per column.
+    channels, x_values, y_values = lrs_grid.read_lrs_csv(csv_file, value_columns=LRS_VALUE_COLUMNS)
+    arrays = {"channels": channels, "x": x_values, "y": y_values}
+    if cache is not None:
+        arrays = cache.put(csv_file, "lrs-grid", arrays)
+    return arrays, False
+
+
+def read_control_points(file_path):
+    """
+    Reads control points as (fixed, moving) lists of (x, y) pairs.
+
+    Accepts a CSV/whitespace text file with one pair per line
+    (``fixed_x, fixed_y, moving_x, moving_y``; a header line and ``#``
+    comments are skipped) or an .npz written by the registration export,
+    which stores ``fixed_points`` and ``moving_points``.
+    """
+    if file_path.endswith('.npz'):
+        with np.load(file_path) as archive:
+            fixed, moving = archive["fixed_points"], archive["moving_points"]
+    else:
+        with open(file_path) as f:
+            lines = [line.split('#', 1)[0].strip() for line in f]
+        rows = []
+        for line in lines:
+            if not line:
+                continue
+            fields = line.replace(',', ' ').split()
+            try:
+                rows.append([float(value) for value in fields])
+            except ValueError:
+                if rows:
+                    raise ValueError(f"Invalid control point line in {file_path}: {line!r}")
+                continue  # header
+        table = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        fixed, moving = table[:, :2], table[:, 2:]
+    return [tuple(point) for point in fixed.tolist()], [tuple(point) for point in moving.tolist()]
+
+
+# ----------------------------------------------------------------------
+# Estimation and warping
+# ----------------------------------------------------------------------
+def prealign_points(fixed_image, moving_image, progress=None):
+    """
+    Seed control points from automatic pre-alignment (see prealign.py).
+
+    Returns:
+        tuple: (fixed points, moving points, overlap correlation of the
+        alignment; near 1 when the images match)
+    """
+    import prealign
+
+    transform, score = prealign.prealign(fixed_image, moving_image, progress=progress)
+    fixed_points, moving_points = prealign.seed_control_points(transform, moving_image.shape)
+    return fixed_points, moving_points, score
+
+
+def estimate_transform(method, fixed_points, moving_points, rng=None, residual_threshold=2.0):
+    """
+    Fits the moving -> fixed affine transform.
+
+    Parameters:
+        method (str): "affine" (least squares) or "ransac".
+        fixed_points, moving_points (list): Picked (x, y) pairs.
+        rng: Seed or Generator for RANSAC sampling (None: unseeded).
+        residual_threshold (float): RANSAC inlier distance in pixels.
+
+    Returns:
+        AffineTransform: The fitted transform.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown registration method: {method!r} (expected one of {METHODS})")
+    if len(fixed_points) < 3 or len(moving_points) < 3:
+        raise ValueError(f"At least 3 points are required for {method} registration.")
+    fixed_points_coords = np.array(fixed_points)
+    moving_points_coords = np.array(moving_points)
+    if method == "ransac":
+        # Batched hypotheses instead of skimage's one-at-a-time loop.
+        model, _ = ransac_engine.ransac_affine(
+            moving_points_coords,
+            fixed_points_coords,
+            residual_threshold=residual_threshold,
+            rng=rng
+        )
+        if model is None:
+            raise ValueError("RANSAC found no consistent set of control points.")
+        return model
+    transform = estimate_affine(moving_points_coords, fixed_points_coords)
+    if transform is None:
+        raise ValueError("Affine estimation failed; check the control points for degenerate (e.g. collinear) sets.")
+    return transform
+
+
+def estimate_affine(src, dst):
+    """
+    Least-squares affine transform mapping ``src`` to ``dst`` points.
+
+    Uses ``AffineTransform.from_estimate`` where available (skimage >= 0.26,
+    which deprecates ``estimate``) and ``estimate`` on older skimage.
+
+    Returns:
+        AffineTransform or None: The fit, or None if estimation failed.
+    """
+    from skimage.transform import AffineTransform
+
+    if hasattr(AffineTransform, "from_estimate"):
+        transform = AffineTransform.from_estimate(src, dst)
+        # A failed fit comes back as a falsy FailedEstimation.
+        return transform if transform else None
+    transform = AffineTransform()
+    return transform if transform.estimate(src, dst) else None
+
+
+def refine_transform(transform, fixed_image, moving_image, progress=None):
+    """
+    Refines a fitted transform on the image content (see ecc_refine.py).
+
+    Returns:
+        tuple: (AffineTransform, report with iterations, seconds and the
+        correlation before/after)
+    """
+    import ecc_refine
+
+    return ecc_refine.refine_affine(fixed_image, moving_image, transform, progress=progress)
+
+
+def make_sampler(arrays, transform, header=None):
+    """
+    Sampler of the registered LRS channels at EBSD positions, without
+    warping them (see lrs_sampler.py).
+
+    Parameters:
+        arrays (dict): Gridded LRS data as returned by load_lrs.
+        transform: Registration transform (LRS -> EBSD pixels).
+        header (dict or None): .ang header; its XSTEP/YSTEP enable
+            physical-coordinate queries.
+    """
+    import lrs_sampler
+
+    waveNumber_matrix, shift_matrix = arrays["channels"]
+    step = None
+    if header and header.get("XSTEP") and header.get("YSTEP"):
+        step = (header["XSTEP"], header["YSTEP"])
+    # Same channels as the registered export (intensity is the shift map).
+    channels = {"intensity": shift_matrix, "waveNumber": waveNumber_matrix, "shift": shift_matrix}
+    return lrs_sampler.LRSSampler(channels, transform, step=step)
+
+
+def transform_summary(transform):
+    """Returns (rotation in degrees, scale) of an affine transform."""
+    params = transform.params
+    rotation = np.degrees(np.arctan2(params[1, 0], params[0, 0]))
+    scale = np.sqrt(params[0, 0]**2 + params[1, 0]**2)
+    return rotation, scale
+
+
+def warp_registration(channels, transform, output_shape, memory_budget=warp_engine.DEFAULT_MEMORY_BUDGET,
+                      tiled_path=None, cache=None, progress=None, out=None, backend="auto"):
+    """
+    Warps the LRS image and channels onto the fixed image grid.
+
+    Registrations whose working set exceeds ``memory_budget`` are warped
+    tile by tile into ``tiled_path`` (a memory-mapped .npy); others into
+    ``out`` if given (a reused float32 (channels, rows, cols) buffer).
+    ``backend`` is as for warp_engine.warp_channels.
+
+    Returns:
+        tuple: ((channels, rows, cols) float32 result, tiled_path or None)
+    """
+    output_bytes = len(channels) * np.prod(output_shape) * 4
+    if tiled_path is not None and 3 * output_bytes > memory_budget:
+        registered = warp_engine.warp_tiled(
+            channels,
+            transform,
+            output_shape,
+            out=tiled_path,
+            memory_budget=memory_budget,
+            progress=progress,
+            backend=backend
+        )
+        return registered, tiled_path
+    return warp_engine.warp_channels(channels, transform, output_shape, cache=cache, out=out, backend=backend), None
+
+
+def registered_channels(registered):
+    """
+    Names the warped (shift, waveNumber) stack.  The intensity channel has
+    always been the shift map, so both names share one warped array.
+    """
+    return {"intensity": registered[0], "waveNumber": registered[1], "shift": registered[0]}
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def export_results(output_folder, channels, transform, fixed_points, moving_points, fmt="npz"):
+    """
+    Writes the registered channels (one container, see exporters) and the
+    registered intensity as registeredLRSImage.png.
+
+    Returns:
+        tuple: (list of container paths, PNG path)
+    """
+    # All channels, the transform and the control points go into one
+    # container (CSV remains available as the legacy format).
+    written = exporters.export_registration(
+        os.path.join(output_folder, "registeredLRS"),
+        channels,
+        transform,
+        fixed_points,
+        moving_points,
+        fmt=fmt
+    )
+    import cv2
+
+    output_path = os.path.join(output_folder, "registeredLRSImage.png")
+    cv2.imwrite(output_path, (channels["intensity"] * 255).astype(np.uint8))
+    return written, output_path
+
+
+# ----------------------------------------------------------------------
+# Whole pipeline
+# ----------------------------------------------------------------------
+def register(fixed_path, lrs_path, points, method="affine", output_folder=None, fmt="npz",
+             memory_budget=warp_engine.DEFAULT_MEMORY_BUDGET, cache=None, workers=1, rng=None, refine=False,
+             fixed_map=None, backend="auto"):
+    """
+    Runs parse -> estimate -> warp -> export for one EBSD/LRS pair.
+
+    Parameters:
+        fixed_path (str): EBSD .ang file or fixed image.
+        lrs_path (str): LRS CSV export.
+        points (str or tuple): Control-point file, (fixed, moving) lists, or
+            AUTO_POINTS to place them by automatic pre-alignment.
+        method (str): "affine" or "ransac".
+        output_folder (str or None): Defaults to the folder of ``fixed_path``,
+            where the GUI writes its exports.
+        fmt (str): Export format (see exporters.available_formats()).
+        memory_budget (int): Working-memory cap of the warp.
+        cache (ParsedDataCache or None): Cache of parsed inputs.
+        workers (int): Processes used to parse large .ang files.
+        rng: RANSAC seed.
+        refine (bool): Refine the fitted transform on the image content.
+        fixed_map (str or None): .ang map registered against (default: the
+            column-6 image of load_fixed_data).
+        backend (str): Warp backend, "auto" or one of warp_engine.BACKENDS.
+            Backends agree to warp_engine.EQUIVALENCE_RTOL of the value
+            range; "auto" picks the fastest by timing, so the choice can
+            differ between runs and from the GUI.
+
+    Returns:
+        dict: transform matrix, rotation, scale, warp backend used, written
+        files, per-stage timings in seconds and the refinement report (if
+        refined).
+    """
+    timings = {}
+    start = time.perf_counter()
+    fixed_image = load_fixed_image(fixed_path, cache=cache, workers=workers, map_name=fixed_map)
+    arrays, _ = load_lrs(lrs_path, cache=cache)
+    auto = isinstance(points, str) and points == AUTO_POINTS
+    if not auto:
+        fixed_points, moving_points = read_control_points(points) if isinstance(points, str) else points
+    timings["parse"] = time.perf_counter() - start
+    waveNumber_matrix, shift_matrix = arrays["channels"]
+
+    if auto:
+        start = time.perf_counter()
+        # The shift map is the LRS image the GUI shows and registers.
+        fixed_points, moving_points, _ = prealign_points(fixed_image, shift_matrix)
+        timings["prealign"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transform = estimate_transform(method, fixed_points, moving_points, rng=rng)
+    timings["estimate"] = time.perf_counter() - start
+
+    report = None
+    if refine:
+        start = time.perf_counter()
+        transform, report = refine_transform(transform, fixed_image, shift_matrix)
+        timings["refine"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output_folder = output_folder or os.path.dirname(os.path.abspath(fixed_path))
+    # The LRS image shown and registered by the GUI is the shift map; it
+    # is warped once and shared by the intensity and shift channels.  The
+    # backend is resolved once so the summary names the one that ran.
+    channels = [shift_matrix, waveNumber_matrix]
+    backend = warp_engine.resolve_backend(backend, fixed_image.shape[:2], np.asarray(shift_matrix).dtype,
+                                          len(channels), source_shape=np.shape(shift_matrix))
+    registered, tiled_path = warp_registration(
+        channels,
+        transform,
+        fixed_image.shape,
+        memory_budget=memory_budget,
+        tiled_path=os.path.join(output_folder, TILED_OUTPUT_NAME),
+        backend=backend
+    )
+    timings["warp"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    written, png_path = export_results(
+        output_folder,
+        registered_channels(registered),
+        transform.params,
+        fixed_points,
+        moving_points,
+        fmt=fmt
+    )
+    timings["export"] = time.perf_counter() - start
+
+    rotation, scale = transform_summary(transform)
+    files = written + [png_path] + ([tiled_path] if tiled_path else [])
+    summary = {
+        "transform": transform.params.tolist(),
+        "rotation": float(rotation),
+        "scale": float(scale),
+        "backend": backend,
+        "files": files,
+        "timings": timings,
+    }
+    if report is not None:
+        summary["refinement"] = report
+    return summary
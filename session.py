@@ -0,0 +1,234 @@
+"""
+Registration sessions saved next to the EBSD data.
+
+A session file (JSON) records what is needed to get back to where the user
+left off: the fingerprints of the EBSD and LRS inputs (see
+data_cache.file_fingerprint), the EBSD map registered against, the current
+control points and the last registration (method, the points it was fitted
+on, the fitted transform and the registered result on disk).
+
+Every derived value carries a key of what it was computed from:
+
+* ``transform_key``: method, control points, map and refinement flag, plus
+  the input fingerprints when the fit was refined on the image content;
+* ``warp_key``: transform, output shape and the LRS fingerprint.
+
+On reload ``fresh_transform`` and ``fresh_warp`` hand back the stored
+transform and the memory-mapped registered stack while their keys still
+match the inputs, so only the stale steps are recomputed.  The registered
+stack is kept in registeredLRSSession.npy (or the tiled warp result, which is
+already on disk); the stored fingerprint of that file catches it being
+overwritten by a later run.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from data_cache import file_fingerprint
+
+SESSION_VERSION = 1
+
+# File names written next to the EBSD data.
+SESSION_FILE_NAME = "registrationSession.json"
+SESSION_WARP_NAME = "registeredLRSSession.npy"
+
+INPUTS = ("ebsd", "lrs")
+
+
+def _digest(*parts):
+    text = json.dumps(parts, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _points(points):
+    return [[float(x), float(y)] for x, y in points]
+
+
+def _same_content(stored, current, fields=("size", "sha1")):
+    # Inputs match on content alone (a copied dataset keeps its session);
+    # stored warps also on mtime, as a rewrite keeps their size.
+    return stored is not None and current is not None and all(
+        stored.get(field) == current.get(field) for field in fields
+    )
+
+
+# ----------------------------------------------------------------------
+# Keys
+# ----------------------------------------------------------------------
+def transform_key(method, fixed_points, moving_points, refine, map_name, fingerprints):
+    """Key of a fitted transform; the inputs only matter for refined fits."""
+    content = [fingerprints.get(name, {}).get("sha1") for name in INPUTS] if refine else None
+    return _digest(method, _points(fixed_points), _points(moving_points), bool(refine), map_name, content)
+
+
+def warp_key(transform_params, output_shape, fingerprints):
+    """Key of a registered stack: the warped LRS data, transform and grid."""
+    params = np.asarray(transform_params, dtype=np.float64).reshape(3, 3).tolist()
+    return _digest(params, [int(n) for n in output_shape[:2]], fingerprints.get("lrs", {}).get("sha1"))
+
+
+def transform_from_params(params):
+    from skimage.transform import AffineTransform
+
+    return AffineTransform(matrix=np.asarray(params, dtype=np.float64).reshape(3, 3))
+
+
+# ----------------------------------------------------------------------
+# Saving
+# ----------------------------------------------------------------------
+def registration_record(method, refine, map_name, fixed_points, moving_points, transform, output_shape,
+                        fingerprints):
+    """
+    Describes a finished registration (without its result on disk).
+
+    Parameters:
+        method (str): "affine" or "ransac".
+        refine (bool): Whether the fit was refined on the image content.
+        map_name (str or None): EBSD map registered against.
+        fixed_points, moving_points: Control points the fit used.
+        transform: Fitted transform (anything with ``params``) or 3x3 matrix.
+        output_shape (tuple): (rows, cols) of the registered stack.
+        fingerprints (dict): "ebsd"/"lrs" -> fingerprint of the inputs.
+    """
+    params = np.asarray(getattr(transform, "params", transform), dtype=np.float64).reshape(3, 3)
+    return {
+        "method": method,
+        "refine": bool(refine),
+        "map_name": map_name,
+        "fixed_points": _points(fixed_points),
+        "moving_points": _points(moving_points),
+        "transform": params.tolist(),
+        "output_shape": [int(n) for n in output_shape[:2]],
+        "transform_key": transform_key(method, fixed_points, moving_points, refine, map_name, fingerprints),
+        "warp_key": warp_key(params, output_shape, fingerprints),
+        "warp": None,
+    }
+
+
+def store_warp(folder, registered):
+    """
+    Puts a registered (channels, rows, cols) stack on disk for later reuse.
+    A memory-mapped stack (the tiled warp result) is referenced where it is;
+    others are written to SESSION_WARP_NAME, replacing any older file
+    atomically so memory maps of it stay valid.
+
+    Returns:
+        dict: {"path", "fingerprint"} of the stored stack.
+    """
+    filename = getattr(registered, "filename", None)
+    if filename and os.path.isfile(filename):
+        registered.flush()
+        path = os.path.abspath(filename)
+    else:
+        path = os.path.abspath(os.path.join(folder, SESSION_WARP_NAME))
+        fd, staging = tempfile.mkstemp(prefix=".session.", suffix=".npy", dir=folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(registered, dtype=np.float32))
+            os.replace(staging, path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+    return {"path": path, "fingerprint": file_fingerprint(path)}
+
+
+def save_session(path, fingerprints, fixed_points, moving_points, map_name=None, registration=None):
+    """
+    Writes a session file (atomically).
+
+    Parameters:
+        path (str): Session file, usually SESSION_FILE_NAME next to the EBSD data.
+        fingerprints (dict): "ebsd"/"lrs" -> fingerprint of the loaded inputs.
+        fixed_points, moving_points: Current control points.
+        map_name (str or None): EBSD map shown.
+        registration (dict or None): registration_record of the last run,
+            with its "warp" entry filled by store_warp once written.
+    """
+    session = {
+        "version": SESSION_VERSION,
+        "inputs": {name: fingerprints.get(name) for name in INPUTS},
+        "map_name": map_name,
+        "fixed_points": _points(fixed_points),
+        "moving_points": _points(moving_points),
+        "registration": registration,
+    }
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, staging = tempfile.mkstemp(prefix=".session.", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(session, f, indent=1)
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    return session
+
+
+# ----------------------------------------------------------------------
+# Loading
+# ----------------------------------------------------------------------
+def load_session(path):
+    """Reads a session file; raises ValueError for other JSON or versions."""
+    with open(path, 'r') as f:
+        session = json.load(f)
+    if not isinstance(session, dict) or session.get("version") != SESSION_VERSION:
+        raise ValueError(f"Not a version {SESSION_VERSION} registration session: {path}")
+    for name in INPUTS:
+        if not ((session.get("inputs") or {}).get(name) or {}).get("path"):
+            raise ValueError(f"Session {path} has no {name.upper()} input")
+    return session
+
+
+def current_fingerprints(session):
+    """
+    Fingerprints of the session's inputs as they are on disk now.
+
+    Returns:
+        tuple: ({"ebsd"/"lrs": fingerprint}, names of the inputs whose
+        content changed since the session was saved)
+    """
+    current, changed = {}, []
+    for name in INPUTS:
+        stored = session["inputs"][name]
+        if not os.path.isfile(stored["path"]):
+            raise FileNotFoundError(f"{name.upper()} input of the session is missing: {stored['path']}")
+        current[name] = file_fingerprint(stored["path"])
+        if not _same_content(stored, current[name]):
+            changed.append(name)
+    return current, changed
+
+
+def fresh_transform(record, fingerprints):
+    """The stored transform matrix if it is still valid for ``fingerprints``, else None."""
+    if record is None:
+        return None
+    key = transform_key(record["method"], record["fixed_points"], record["moving_points"], record["refine"],
+                        record["map_name"], fingerprints)
+    if key != record["transform_key"]:
+        return None
+    return np.asarray(record["transform"], dtype=np.float64)
+
+
+def fresh_warp(record, transform_params, output_shape, fingerprints):
+    """
+    The stored registered stack (memory-mapped, read-only) if it was warped
+    with ``transform_params`` from the current LRS data onto
+    ``output_shape`` and its file is unchanged; else None.
+    """
+    if record is None or not record.get("warp"):
+        return None
+    if warp_key(transform_params, output_shape, fingerprints) != record["warp_key"]:
+        return None
+    stored = record["warp"]
+    try:
+        if not _same_content(stored["fingerprint"], file_fingerprint(stored["path"]), ("size", "mtime_ns", "sha1")):
+            return None
+        registered = np.load(stored["path"], mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if registered.ndim != 3 or registered.shape[1:] != tuple(output_shape[:2]):
+        return None
+    return registered
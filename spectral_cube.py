@@ -0,0 +1,254 @@
+"""
+Hyperspectral LRS data: full spectra on the LRS grid.
+
+``load_lrs`` reduces every Raman spectrum to a few scalars.  A
+``SpectralCube`` keeps the whole spectrum per pixel as a memory-mapped
+(H, W, bands) float32 ``cube.npy`` plus ``axes.npz`` (wavenumber axis, X/Y
+grid values and the mask of measured pixels) in one folder.  Exports are
+converted once, in chunks, so the text file is never held in memory:
+
+* long format: one line per point and band, ``X, Y, wavenumber, intensity``
+  (e.g. the Renishaw WiRE xyz text export, with or without a header);
+* wide format: one line per point, ``X, Y`` and one column per band, the
+  header naming the wavenumbers.
+
+The grid follows lrs_grid (sorted unique X/Y values, unmeasured pixels NaN),
+so a cube lines up with the scalar maps of the same export.  All spectra must
+share one wavenumber axis; a long export whose points have different numbers
+of bands, or whose band values differ between points, is rejected.
+
+``warp_cube`` applies a registration to every band.  A generator reads the
+cube band block by band block (a contiguous (block, H, W) copy each), and
+every block is warped tile by tile (warp_engine.warp_tiled) straight into a
+memory-mapped (bands, rows, cols) result.  Blocks are sized from the memory
+budget, so memory stays bounded whatever the number of bands.  The result is
+band-major so each block is one contiguous region of the output file.
+"""
+import os
+
+import numpy as np
+
+import warp_engine
+
+CUBE_FILE = "cube.npy"
+AXES_FILE = "axes.npz"
+
+# Values (lines x columns) parsed per chunk while converting a text export.
+CHUNK_VALUES = 8_000_000
+
+
+class SpectralCube:
+    def __init__(self, folder, mode='r'):
+        """
+        Opens a converted cube.
+
+        Parameters:
+            folder (str): Folder holding cube.npy and axes.npz.
+            mode (str): Memory-map mode of the cube ('r' or 'r+').
+        """
+        self.folder = folder
+        self.cube = np.load(os.path.join(folder, CUBE_FILE), mmap_mode=mode)
+        with np.load(os.path.join(folder, AXES_FILE)) as axes:
+            self.wavenumbers = axes["wavenumbers"]
+            self.x = axes["x"]
+            self.y = axes["y"]
+            self.measured = axes["measured"]
+
+    @property
+    def shape(self):
+        return self.cube.shape
+
+    @property
+    def bands(self):
+        return self.cube.shape[2]
+
+    def band(self, index):
+        """(H, W) image of band ``index`` (a strided view of the cube)."""
+        return self.cube[:, :, index]
+
+    def band_blocks(self, block_bands):
+        """
+        Yields (start, stop, (stop - start, H, W) float32 block) over all
+        bands; each block is a contiguous in-memory copy.
+        """
+        for start in range(0, self.bands, block_bands):
+            stop = min(start + block_bands, self.bands)
+            yield start, stop, np.ascontiguousarray(np.moveaxis(self.cube[:, :, start:stop], -1, 0))
+
+
+def is_cube(path):
+    """True for a converted cube folder (or its cube.npy)."""
+    folder = os.path.dirname(path) if os.path.basename(path) == CUBE_FILE else path
+    return os.path.isfile(os.path.join(folder, CUBE_FILE)) and os.path.isfile(os.path.join(folder, AXES_FILE))
+
+
+# ----------------------------------------------------------------------
+# Conversion from text exports
+# ----------------------------------------------------------------------
+def _is_number(token):
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def sniff_export(path):
+    """
+    Works out the layout of a text export from its first line.
+
+    Returns:
+        tuple: ("long" or "wide", delimiter for pandas, header row or None,
+        wavenumbers of a wide export or None)
+    """
+    with open(path) as f:
+        line = next((line for line in f if line.strip()), "")
+    sep = "," if "," in line else r"\s+"
+    tokens = [token.strip().lstrip("#") for token in (line.split(",") if sep == "," else line.split())]
+    header = None if all(_is_number(token) for token in tokens) else 0
+    if len(tokens) == 4:
+        return "long", sep, header, None
+    if header is not None and len(tokens) > 4 and all(_is_number(token) for token in tokens[2:]):
+        return "wide", sep, header, np.array([float(token) for token in tokens[2:]])
+    raise ValueError(f"Unrecognised LRS export layout in {path}: expected X, Y, wavenumber, intensity "
+                     f"per line or X, Y and one column per wavenumber")
+
+
+def _chunks(path, sep, header, columns, usecols=None, chunk_values=CHUNK_VALUES):
+    import pandas as pd
+
+    rows = max(1, chunk_values // (len(usecols) if usecols else columns))
+    reader = pd.read_csv(path, sep=sep, header=header, usecols=usecols, dtype=np.float64, chunksize=rows)
+    for frame in reader:
+        yield frame.to_numpy()
+
+
+def convert_export(path, folder, chunk_values=CHUNK_VALUES, progress=None):
+    """
+    Converts a text export into a cube folder (two streaming passes: grid
+    and band axis first, then the values).
+
+    Parameters:
+        path (str): Long- or wide-format export (see the module docstring).
+        folder (str): Output folder (created).
+        chunk_values (int): Values (lines x columns) parsed per chunk.
+        progress (callable or None): ``progress(done, total)`` per pass.
+
+    Returns:
+        SpectralCube: The converted cube.
+
+    Raises:
+        ValueError: If the points of a long export do not share one band axis.
+    """
+    layout, sep, header, wavenumbers = sniff_export(path)
+    columns = 4 if layout == "long" else 2 + len(wavenumbers)
+    usecols = [0, 1] if layout == "wide" else None
+
+    # Pass 1: grid lines (and the band axis of a long export, with the
+    # number of lines of every point to check that they all share it).
+    x_values = y_values = np.empty(0)
+    band_values = np.empty(0)
+    points, counts = np.empty(0, dtype=np.complex128), np.empty(0, dtype=np.int64)
+    for values in _chunks(path, sep, header, columns, usecols, chunk_values):
+        x_values = np.union1d(x_values, values[:, 0])
+        y_values = np.union1d(y_values, values[:, 1])
+        if layout == "long":
+            band_values = np.union1d(band_values, values[:, 2])
+            chunk_points, chunk_counts = np.unique(values[:, 0] + 1j * values[:, 1], return_counts=True)
+            points, index = np.unique(np.concatenate([points, chunk_points]), return_inverse=True)
+            counts = np.bincount(index, np.concatenate([counts, chunk_counts])).astype(np.int64)
+    if layout == "long" and len(points):
+        if counts.min() != counts.max():
+            raise ValueError(f"Points of {path} have between {counts.min()} and {counts.max()} bands; "
+                             f"every spectrum must have the same bands")
+        if counts[0] != len(band_values):
+            raise ValueError(f"Points of {path} have {counts[0]} bands each but {len(band_values)} different "
+                             f"wavenumbers overall; every spectrum must share one wavenumber axis")
+    if progress is not None:
+        progress(1, 2)
+    if layout == "wide":
+        order = np.argsort(wavenumbers)
+        band_values = wavenumbers[order]
+
+    shape = (len(y_values), len(x_values), len(band_values))
+    os.makedirs(folder, exist_ok=True)
+    cube = np.lib.format.open_memmap(os.path.join(folder, CUBE_FILE), mode='w+', dtype=np.float32, shape=shape)
+    measured = np.zeros(shape[:2], dtype=bool)
+
+    # Pass 2: scatter the values; spectra land in contiguous runs of the cube.
+    for values in _chunks(path, sep, header, columns, None, chunk_values):
+        col = np.searchsorted(x_values, values[:, 0])
+        row = np.searchsorted(y_values, values[:, 1])
+        measured[row, col] = True
+        if layout == "long":
+            cube[row, col, np.searchsorted(band_values, values[:, 2])] = values[:, 3]
+        else:
+            cube[row, col, :] = values[:, 2:][:, order]
+    if not measured.all():
+        cube[~measured] = np.nan
+    cube.flush()
+    del cube
+    np.savez(os.path.join(folder, AXES_FILE), wavenumbers=band_values, x=x_values, y=y_values, measured=measured)
+    if progress is not None:
+        progress(2, 2)
+    return SpectralCube(folder)
+
+
+def open_cube(path, progress=None):
+    """
+    Opens a cube folder (or its cube.npy), or converts a text export into
+    ``<export>.cube`` next to it; later calls reuse that folder while it is
+    newer than the export.
+    """
+    if is_cube(path):
+        return SpectralCube(os.path.dirname(path) if os.path.basename(path) == CUBE_FILE else path)
+    folder = os.path.splitext(path)[0] + ".cube"
+    if is_cube(folder) and os.path.getmtime(os.path.join(folder, AXES_FILE)) >= os.path.getmtime(path):
+        return SpectralCube(folder)
+    return convert_export(path, folder, progress=progress)
+
+
+# ----------------------------------------------------------------------
+# Streaming registration
+# ----------------------------------------------------------------------
+def block_bands_for_budget(spatial_shape, bands, memory_budget):
+    """Bands per block so one contiguous block uses a quarter of ``memory_budget``."""
+    per_band = 4 * int(np.prod(spatial_shape))
+    return int(np.clip(memory_budget // 4 // max(per_band, 1), 1, max(bands, 1)))
+
+
+def warp_cube(cube, transform, output_shape, out_path, memory_budget=warp_engine.DEFAULT_MEMORY_BUDGET,
+              order=1, cval=0.0, block_bands=None, workers=None, progress=None):
+    """
+    Registers every band of ``cube`` onto the fixed grid.
+
+    Parameters:
+        cube (SpectralCube): Source spectra on the LRS grid.
+        transform: Moving (LRS) -> fixed (EBSD) transform.
+        output_shape (tuple): (rows, cols) of the fixed image.
+        out_path (str): .npy file created as the memory-mapped
+            (bands, rows, cols) float32 result.
+        memory_budget (int): Peak working bytes: a quarter for the band
+            block, the rest for the tiled warp of it.
+        order, cval: As for warp_engine.warp_channels (unmeasured NaN
+            pixels stay NaN, as in the registered scalar channels).
+        block_bands (int or None): Bands per block; derived from the budget.
+        workers (int or None): Warp threads.
+        progress (callable or None): ``progress(done, total)`` bands after
+            every block; an exception raised by it stops the warp.
+
+    Returns:
+        np.memmap: The (bands, rows, cols) result.
+    """
+    output_shape = tuple(int(n) for n in output_shape[:2])
+    if block_bands is None:
+        block_bands = block_bands_for_budget(cube.shape[:2], cube.bands, memory_budget)
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=(cube.bands,) + output_shape)
+    for start, stop, block in cube.band_blocks(block_bands):
+        warp_engine.warp_tiled(block, transform, output_shape, out=out[start:stop], order=order, cval=cval,
+                               memory_budget=memory_budget - block.nbytes, workers=workers)
+        del block   # free it before the generator reads the next one
+        if progress is not None:
+            progress(stop, cube.bands)
+    out.flush()
+    return out
@@ -0,0 +1,58 @@
+"""
+Pre-alignment recovers a known LRS scale and rotation.
+
+The LRS map is simulated by rotating the EBSD image about its centre and
+block-averaging it 4x or 8x, the usual LRS/EBSD pixel ratio.  The recovered
+transform must match the rotation, scale and centre to within a fraction of
+an LRS pixel.
+
+Run with ``python -m pytest test_prealign.py``.
+"""
+import math
+
+import numpy as np
+import pytest
+
+data = pytest.importorskip("skimage.data")
+skimage_transform = pytest.importorskip("skimage.transform")
+prealign = pytest.importorskip("prealign")
+
+
+def _lrs_map(image, factor, rotation):
+    """``image`` rotated by ``rotation`` degrees and reduced ``factor`` times."""
+    rotated = skimage_transform.rotate(image, rotation, order=1, cval=np.nan, preserve_range=True)
+    # Corners rotated in from outside are unmeasured; fill them with the mean.
+    rotated = np.where(np.isnan(rotated), np.nanmean(rotated), rotated)
+    return skimage_transform.rescale(rotated, 1.0 / factor, anti_aliasing=True, preserve_range=True)
+
+
+@pytest.mark.parametrize("name", ["camera", "coins"])
+@pytest.mark.parametrize("factor", [4, 8])
+@pytest.mark.parametrize("rotation", [0.0, 10.0, -25.0])
+def test_recovers_scale_and_rotation(name, factor, rotation):
+    fixed = getattr(data, name)().astype(np.float64)
+    moving = _lrs_map(fixed, factor, rotation)
+
+    transform, score = prealign.prealign(fixed, moving)
+
+    assert score > 0.85
+    assert abs((math.degrees(transform.rotation) - rotation + 180.0) % 360.0 - 180.0) < 1.0
+    assert transform.scale == pytest.approx((factor, factor), rel=0.02)
+    center_moving = np.array([[(moving.shape[1] - 1) / 2.0, (moving.shape[0] - 1) / 2.0]])
+    center_fixed = np.array([(fixed.shape[1] - 1) / 2.0, (fixed.shape[0] - 1) / 2.0])
+    # Within half an LRS pixel of where the centre truly lands.
+    assert np.abs(transform(center_moving)[0] - center_fixed).max() < factor / 2.0
+
+
+def test_correct_initial_estimate_is_kept():
+    # The fine levels used to replace a correct estimate with a worse one.
+    fixed = data.camera().astype(np.float64)
+    moving = _lrs_map(fixed, 8, 0.0)
+    scale = fixed.shape[1] / moving.shape[1]
+    initial = skimage_transform.AffineTransform(scale=scale, translation=(scale / 2.0 - 0.5,) * 2)
+
+    transform, score = prealign.prealign(fixed, moving, initial=initial)
+
+    corners = np.array([[0.0, 0.0], [moving.shape[1] - 1.0, moving.shape[0] - 1.0]])
+    assert score > 0.85
+    assert np.abs(transform(corners) - initial(corners)).max() < scale / 2.0
@@ -0,0 +1,120 @@
+"""
+Numerical equivalence of the warp backends against the skimage reference.
+
+Every available backend must reproduce ``skimage.transform.warp`` within
+warp_engine.EQUIVALENCE_RTOL of the input value range, on step edges (where
+interpolation differences are largest), with NaN pixels propagating to the
+same output pixels, for float32 and float64 input and orders 0 and 1.
+Backends whose library is not installed are skipped.
+
+Run with ``python -m pytest test_warp_engine.py``.
+"""
+import numpy as np
+import pytest
+
+import warp_engine
+
+skimage_transform = pytest.importorskip("skimage.transform")
+
+BACKEND_NAMES = [name for name in warp_engine.BACKENDS if name != "skimage"]
+
+OUTPUT_SHAPE = (90, 85)
+
+
+def _transforms():
+    rng = np.random.default_rng(1)
+    for _ in range(6):
+        yield skimage_transform.AffineTransform(
+            scale=rng.uniform(0.5, 3.5, 2), rotation=rng.uniform(-3.0, 3.0), shear=rng.uniform(-0.2, 0.2),
+            translation=rng.uniform(-20.0, 20.0, 2)
+        )
+
+
+def _step_source(seed, nan_pixels=0):
+    """LRS-like values: 200 counts plus steps of 5000 and 2500 along both axes."""
+    rng = np.random.default_rng(seed)
+    image = np.zeros((40, 36))
+    image[:, rng.integers(5, 30):] = 1.0
+    image[rng.integers(5, 20):rng.integers(22, 35), :] += 0.5
+    image = image * 5000.0 + 200.0
+    if nan_pixels:
+        image[rng.integers(0, 40, nan_pixels), rng.integers(0, 36, nan_pixels)] = np.nan
+    return image
+
+
+def _require(name, order):
+    backend = warp_engine.BACKENDS[name]
+    if not backend.available():
+        pytest.skip(f"{name} backend is not installed")
+    if not backend.supports(order, (40, 36)):
+        pytest.skip(f"{name} backend does not support order {order}")
+
+
+def _assert_equivalent(result, reference, source):
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(reference))
+    span = np.nanmax(source) - np.nanmin(source)
+    error = np.nanmax(np.abs(result - reference)) / span
+    assert error <= warp_engine.EQUIVALENCE_RTOL, f"max difference {error:.2e} of the value range"
+
+
+@pytest.mark.parametrize("name", BACKEND_NAMES)
+@pytest.mark.parametrize("order", [0, 1])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_step_edges_match_skimage(name, order, dtype):
+    _require(name, order)
+    for seed, transform in enumerate(_transforms()):
+        source = _step_source(seed)
+        reference = warp_engine.warp_channels([source], transform, OUTPUT_SHAPE, order=order, backend="skimage")
+        result = warp_engine.warp_channels([source.astype(dtype)], transform, OUTPUT_SHAPE, order=order,
+                                           backend=name)
+        _assert_equivalent(result, reference, source)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_skimage_float32_input_matches_float64(dtype):
+    # The reference itself: float32 input stays within the tolerance too.
+    for seed, transform in enumerate(_transforms()):
+        source = _step_source(seed)
+        reference = warp_engine.warp_channels([source], transform, OUTPUT_SHAPE, backend="skimage")
+        result = warp_engine.warp_channels([source.astype(dtype)], transform, OUTPUT_SHAPE, backend="skimage")
+        _assert_equivalent(result, reference, source)
+
+
+@pytest.mark.parametrize("name", BACKEND_NAMES)
+@pytest.mark.parametrize("order", [0, 1])
+def test_nan_pixels_propagate_like_skimage(name, order):
+    _require(name, order)
+    nan_outputs = 0
+    for seed, transform in enumerate(_transforms()):
+        source = _step_source(seed, nan_pixels=5)
+        reference = warp_engine.warp_channels([source], transform, OUTPUT_SHAPE, order=order, backend="skimage")
+        result = warp_engine.warp_channels([source], transform, OUTPUT_SHAPE, order=order, backend=name)
+        _assert_equivalent(result, reference, source)
+        nan_outputs += int(np.isnan(reference).sum())
+    assert nan_outputs > 0
+
+
+@pytest.mark.parametrize("name", BACKEND_NAMES)
+@pytest.mark.parametrize("n_channels", [2, 5])
+def test_channel_stacks_match_skimage(name, n_channels):
+    # OpenCV warps channels in groups; a pair must not take the fixed-point path.
+    _require(name, 1)
+    transform = next(_transforms())
+    sources = [_step_source(seed) for seed in range(n_channels)]
+    reference = warp_engine.warp_channels(sources, transform, OUTPUT_SHAPE, backend="skimage")
+    result = warp_engine.warp_channels(sources, transform, OUTPUT_SHAPE, backend=name)
+    for source, warped, expected in zip(sources, result, reference):
+        _assert_equivalent(warped, expected, source)
+
+
+@pytest.mark.parametrize("name", BACKEND_NAMES)
+@pytest.mark.parametrize("order", [0, 1])
+def test_check_backend_within_tolerance(name, order):
+    _require(name, order)
+    assert warp_engine.check_backend(name, order=order) <= warp_engine.EQUIVALENCE_RTOL
+
+
+def test_select_backend_picks_an_equivalent_backend():
+    name = warp_engine.select_backend((64, 64), np.float32, 2, repeat=1)
+    assert name in warp_engine.available_backends()
+    assert warp_engine.check_backend(name) <= warp_engine.EQUIVALENCE_RTOL
@@ -0,0 +1,627 @@
+"""
+Batched resampling of image channels under a geometric transform.
+
+The LRS intensity, waveNumber and shift maps are always warped with the same
+transform onto the same EBSD grid.  Rather than calling
+``skimage.transform.warp`` once per channel, ``warp_channels`` hands all of
+them to one warp backend:
+
+    skimage  per-channel ``skimage.transform.warp`` (the reference)
+    opencv   float32 ``cv2.remap`` on channels-last stacks of up to four
+             channels, with the coordinate tables built once per transform
+             and output shape (optionally kept in a ``CoordinateCache``)
+    scipy    ``scipy.ndimage.affine_transform`` per channel
+    numba    parallel bilinear / nearest kernel (only if numba is installed)
+
+``backend="auto"`` times the available backends once per image size class,
+dtype and channel count and picks the fastest one that agrees with the
+skimage reference (see ``check_backend``).
+
+Results match ``warp(image, transform.inverse, output_shape=...)`` with the
+default ``mode='constant'`` and ``clip=True`` to float32 precision.
+For outputs that do not fit in memory ``warp_tiled`` processes the output in
+tiles on a thread pool (OpenCV and NumPy release the GIL).  Each tile only
+reads the source window it needs and is written into a memory-mapped result,
+so peak memory follows a configurable budget rather than the image size.
+"""
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# OpenCV and numba are imported by the backends on first use, so importing
+# this module (and the registration core) stays cheap.
+numba = None
+
+# cv2.remap interpolates one, three or four channels per pass with float
+# weights; two-channel and wider stacks fall back to a lower precision
+# fixed-point path (1/32 pixel weights), so pairs are padded to three.
+REMAP_MAX_CHANNELS = 4
+
+# cv2.remap source images must be smaller than SHRT_MAX in both dimensions.
+REMAP_MAX_SOURCE = 32767
+
+# Largest output edge used when timing backends for the auto selector.
+SELECTOR_MAX_EDGE = 1024
+
+# Maximum difference from the skimage reference a backend may show, as a
+# fraction of the input value range.  Float32 interpolation (OpenCV's remap,
+# skimage on float32 input) stays below 5e-6 of the range on step edges, e.g.
+# 0.02 on LRS intensities spanning 5000 counts (test_warp_engine.py pins it).
+EQUIVALENCE_RTOL = 1e-5
+
+# Default peak working memory of warp_tiled (all worker threads together).
+DEFAULT_MEMORY_BUDGET = 512 * 1024 ** 2
+
+# Tile edge limits of warp_tiled.
+MIN_TILE_EDGE = 64
+MAX_TILE_EDGE = 4096
+
+
+class CoordinateCache:
+    """Small LRU cache of remap tables, keyed on transform parameters and output shape."""
+
+    def __init__(self, max_entries=2):
+        self.max_entries = max_entries
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(transform, output_shape):
+        params = np.asarray(transform.params, dtype=np.float64)
+        return params.tobytes(), tuple(int(n) for n in output_shape)
+
+    def get(self, transform, output_shape):
+        key = self.key(transform, output_shape)
+        with self._lock:
+            maps = self._maps.get(key)
+            if maps is not None:
+                self._maps.move_to_end(key)
+                return maps
+        maps = remap_tables(transform, output_shape)
+        with self._lock:
+            self._maps[key] = maps
+            while len(self._maps) > self.max_entries:
+                self._maps.popitem(last=False)
+        return maps
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+# ----------------------------------------------------------------------
+# Coordinate helpers
+# ----------------------------------------------------------------------
+def inverse_matrix(transform):
+    return np.linalg.inv(np.asarray(transform.params, dtype=np.float64))
+
+
+def is_affine(matrix):
+    return np.allclose(matrix[2], (0.0, 0.0, 1.0))
+
+
+def coordinate_map(transform, output_shape):
+    """
+    Returns the (2, H, W) float64 array of input (row, col) coordinates sampled
+    by every output pixel, i.e. ``transform.inverse`` applied to the output grid.
+    """
+    rows, cols = int(output_shape[0]), int(output_shape[1])
+    inverse = inverse_matrix(transform)
+    out_rows, out_cols = np.mgrid[0:rows, 0:cols].astype(np.float64)
+    # (x, y) = (col, row) in skimage's transform convention.
+    denom = inverse[2, 0] * out_cols + inverse[2, 1] * out_rows + inverse[2, 2]
+    src_x = (inverse[0, 0] * out_cols + inverse[0, 1] * out_rows + inverse[0, 2]) / denom
+    src_y = (inverse[1, 0] * out_cols + inverse[1, 1] * out_rows + inverse[1, 2]) / denom
+    return np.stack([src_y, src_x])
+
+
+def remap_tables(transform, output_shape):
+    """Returns the (map_x, map_y) float32 tables ``cv2.remap`` expects."""
+    inverse = inverse_matrix(transform)
+    if not is_affine(inverse):
+        src_y, src_x = coordinate_map(transform, output_shape)
+        return src_x.astype(np.float32), src_y.astype(np.float32)
+
+    # Affine: every table is the outer sum of a row term and a column term,
+    # written straight into float32 without full-size float64 temporaries.
+    rows = np.arange(int(output_shape[0]), dtype=np.float64)
+    cols = np.arange(int(output_shape[1]), dtype=np.float64)
+    tables = []
+    for a, b, c in inverse[:2]:
+        table = np.empty((rows.size, cols.size), dtype=np.float32)
+        np.add((b * rows + c)[:, None], (a * cols)[None, :], out=table)
+        tables.append(table)
+    return tables[0], tables[1]
+
+
+def clip_range(input_min, input_max, output_min, output_max, cval=0.0):
+    """Returns the (low, high) range skimage's warp clips its output to."""
+    # Keep cval if it lies outside the input range but was written to the output.
+    if not input_min <= cval <= input_max and output_min <= cval <= output_max:
+        return min(input_min, cval), max(input_max, cval)
+    return input_min, input_max
+
+
+def clip_to_input_range(channel, output, cval=0.0):
+    """Clips ``output`` in place to the value range of ``channel`` (as skimage's warp does)."""
+    low, high = clip_range(np.nanmin(channel), np.nanmax(channel), np.nanmin(output), np.nanmax(output), cval)
+    np.clip(output, low, high, out=output)
+    return output
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+class WarpBackend:
+    """
+    Resamples a list of 2-D channels into a float32 (channels, rows, cols)
+    buffer.  Backends do not clip; ``warp_channels`` does that uniformly.
+    """
+    name = None
+    orders = (0, 1)
+
+    def available(self):
+        return True
+
+    def supports(self, order, source_shape):
+        return order in self.orders
+
+    def warp(self, channels, transform, output_shape, order, cval, cache, out):
+        raise NotImplementedError
+
+
+class SkimageBackend(WarpBackend):
+    name = "skimage"
+    orders = (0, 1, 2, 3, 4, 5)
+
+    def warp(self, channels, transform, output_shape, order, cval, cache, out):
+        from skimage.transform import warp
+
+        for channel, target in zip(channels, out):
+            # warp's Cython kernel rejects read-only (e.g. memory-mapped) input.
+            channel = np.require(channel, requirements='W')
+            target[...] = warp(channel, transform.inverse, output_shape=output_shape,
+                               order=order, cval=cval, clip=False)
+        return out
+
+
+class OpenCVBackend(WarpBackend):
+    name = "opencv"
+
+    def supports(self, order, source_shape):
+        return order in self.orders and max(source_shape) < REMAP_MAX_SOURCE
+
+    def warp(self, channels, transform, output_shape, order, cval, cache, out):
+        import cv2
+
+        interpolation = {0: cv2.INTER_NEAREST, 1: cv2.INTER_LINEAR}[order]
+        map_x, map_y = cache.get(transform, output_shape) if cache is not None else remap_tables(transform, output_shape)
+        for start in range(0, len(channels), REMAP_MAX_CHANNELS):
+            group = channels[start:start + REMAP_MAX_CHANNELS]
+            width = 3 if len(group) == 2 else len(group)
+            stacked = np.zeros(np.shape(group[0]) + (width,), dtype=np.float32)
+            for index, channel in enumerate(group):
+                stacked[..., index] = channel
+            warped = cv2.remap(
+                stacked, map_x, map_y, interpolation,
+                borderMode=cv2.BORDER_CONSTANT, borderValue=(cval,) * 4
+            )
+            warped = warped.reshape(map_x.shape + (width,))[..., :len(group)]
+            out[start:start + len(group)] = np.moveaxis(warped, -1, 0)
+        return out
+
+
+class ScipyBackend(WarpBackend):
+    name = "scipy"
+    orders = (0, 1, 2, 3, 4, 5)
+
+    def warp(self, channels, transform, output_shape, order, cval, cache, out):
+        from scipy import ndimage as ndi
+
+        inverse = inverse_matrix(transform)
+        coords = None if is_affine(inverse) else coordinate_map(transform, output_shape)
+        # ndimage works in (row, col); swap the (x, y) axes of the matrix.
+        matrix = inverse[[1, 0, 2]][:, [1, 0, 2]]
+        for channel, target in zip(channels, out):
+            channel = np.asarray(channel, dtype=np.float32)
+            # 'grid-constant' interpolates towards cval across the border like warp.
+            if coords is None:
+                ndi.affine_transform(channel, matrix, output_shape=tuple(output_shape), output=target,
+                                     order=order, mode='grid-constant', cval=cval, prefilter=order > 1)
+            else:
+                ndi.map_coordinates(channel, coords, output=target, order=order,
+                                    mode='grid-constant', cval=cval, prefilter=order > 1)
+        return out
+
+
+def _import_numba():
+    """Imports numba on first use (None if it is not installed)."""
+    global numba
+    if numba is None and importlib.util.find_spec("numba") is not None:
+        # Kernels are launched from worker threads (tiled warp, GUI jobs); a TBB
+        # pool first used off the main thread blocks interpreter exit, so prefer
+        # OpenMP unless the user picked a layer explicitly.
+        import numba as module
+        if "NUMBA_THREADING_LAYER" not in os.environ:
+            module.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+        numba = module
+    return numba
+
+
+_numba_kernel = None
+_numba_lock = threading.Lock()
+
+
+def _numba_warp_py(channels, inverse, out, order, cval):
+    n_channels, rows, cols = channels.shape
+    for r in numba.prange(out.shape[1]):
+        for c in range(out.shape[2]):
+            denom = inverse[2, 0] * c + inverse[2, 1] * r + inverse[2, 2]
+            x = (inverse[0, 0] * c + inverse[0, 1] * r + inverse[0, 2]) / denom
+            y = (inverse[1, 0] * c + inverse[1, 1] * r + inverse[1, 2]) / denom
+            if order == 0:
+                # Round half away from zero, like skimage's nearest neighbour.
+                i = int(np.floor(y + 0.5)) if y >= 0 else int(np.ceil(y - 0.5))
+                j = int(np.floor(x + 0.5)) if x >= 0 else int(np.ceil(x - 0.5))
+                inside = 0 <= i < rows and 0 <= j < cols
+                for k in range(n_channels):
+                    out[k, r, c] = channels[k, i, j] if inside else cval
+                continue
+            i0 = int(np.floor(y))
+            j0 = int(np.floor(x))
+            fy = y - i0
+            fx = x - j0
+            for k in range(n_channels):
+                total = 0.0
+                for di in range(2):
+                    i = i0 + di
+                    wy = fy if di else 1.0 - fy
+                    for dj in range(2):
+                        j = j0 + dj
+                        wx = fx if dj else 1.0 - fx
+                        if 0 <= i < rows and 0 <= j < cols:
+                            total += wy * wx * channels[k, i, j]
+                        else:
+                            total += wy * wx * cval
+                out[k, r, c] = total
+
+
+def _numba_warp(channels, inverse, out, order, cval):
+    """Runs the kernel, compiled (or loaded from numba's cache) on the first call."""
+    global _numba_kernel
+    with _numba_lock:
+        if _numba_kernel is None:
+            _numba_kernel = _import_numba().njit(parallel=True, cache=True)(_numba_warp_py)
+    _numba_kernel(channels, inverse, out, order, cval)
+
+
+class NumbaBackend(WarpBackend):
+    name = "numba"
+
+    def available(self):
+        return numba is not None or importlib.util.find_spec("numba") is not None
+
+    def warp(self, channels, transform, output_shape, order, cval, cache, out):
+        stacked = np.ascontiguousarray(np.stack(channels), dtype=np.float32)
+        _numba_warp(stacked, inverse_matrix(transform), out, order, float(cval))
+        return out
+
+
+BACKENDS = OrderedDict(
+    (backend.name, backend) for backend in (SkimageBackend(), OpenCVBackend(), ScipyBackend(), NumbaBackend())
+)
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+# ----------------------------------------------------------------------
+# Equivalence check and automatic selection
+# ----------------------------------------------------------------------
+def _example_problem(output_shape, channels=1, seed=0):
+    from skimage.filters import gaussian
+    from skimage.transform import AffineTransform
+
+    rng = np.random.default_rng(seed)
+    source_shape = (max(output_shape[0] // 3, 8), max(output_shape[1] // 3, 8))
+    images = [gaussian(rng.random(source_shape), sigma=1.5) for _ in range(channels)]
+    transform = AffineTransform(scale=(2.9, 3.1), rotation=0.3, shear=0.05,
+                                translation=(-0.1 * output_shape[1], 0.05 * output_shape[0]))
+    return images, transform
+
+
+def _step_image(source_shape, seed=0):
+    """Step edges along both axes plus a few NaN (unmeasured) pixels."""
+    rng = np.random.default_rng(seed)
+    rows, cols = source_shape
+    image = np.zeros(source_shape)
+    image[:, cols // 2:] = 1.0
+    image[rows // 3:2 * rows // 3, :] += 0.5
+    image[rng.integers(0, rows, 4), rng.integers(0, cols, 4)] = np.nan
+    return image
+
+
+def check_backend(name, output_shape=(96, 80), order=1):
+    """
+    Compares backend ``name`` against the skimage reference on a smooth
+    image and on one with step edges and NaN pixels.
+
+    Returns:
+        float: Maximum difference as a fraction of the input value range
+        (inf if the NaN pixels do not match).
+    """
+    images, transform = _example_problem(output_shape)
+    images.append(_step_image(images[0].shape))
+    reference = warp_channels(images, transform, output_shape, order=order, backend="skimage")
+    result = warp_channels(images, transform, output_shape, order=order, backend=name)
+    if not np.array_equal(np.isnan(result), np.isnan(reference)):
+        return float("inf")
+    error = 0.0
+    for image, warped, expected in zip(images, result, reference):
+        span = max(float(np.nanmax(image) - np.nanmin(image)), np.finfo(np.float32).tiny)
+        error = max(error, float(np.nanmax(np.abs(warped - expected))) / span)
+    return error
+
+
+_selected = {}
+
+
+def _size_class(output_shape):
+    return int(np.log2(max(int(output_shape[0]) * int(output_shape[1]), 1)))
+
+
+def select_backend(output_shape, dtype, n_channels, order=1, source_shape=(0, 0), repeat=2):
+    """
+    Returns the name of the fastest backend that passes :func:`check_backend`
+    for this size class, dtype and channel count.  Timings run once per key
+    on a problem of at most SELECTOR_MAX_EDGE pixels per side.
+    """
+    key = (_size_class(output_shape), np.dtype(dtype).str, min(n_channels, 8), order)
+    if key in _selected:
+        return _selected[key]
+
+    sample_shape = tuple(min(int(n), SELECTOR_MAX_EDGE) for n in output_shape)
+    images, transform = _example_problem(sample_shape, channels=n_channels)
+    images = [image.astype(dtype) for image in images]
+    timings = {}
+    for name in available_backends():
+        backend = BACKENDS[name]
+        if not backend.supports(order, source_shape):
+            continue
+        try:
+            if name != "skimage" and check_backend(name, order=order) > EQUIVALENCE_RTOL:
+                continue
+            warp_channels(images, transform, sample_shape, order=order, backend=name)  # warm-up / JIT
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                warp_channels(images, transform, sample_shape, order=order, backend=name)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        except Exception:
+            continue
+    _selected[key] = min(timings, key=timings.get) if timings else "skimage"
+    return _selected[key]
+
+
+def resolve_backend(backend, output_shape, dtype, n_channels, order=1, source_shape=(0, 0)):
+    """
+    Name of the backend :func:`warp_channels` runs for ``backend``: the
+    selected one for "auto", skimage for a backend that is not installed or
+    does not support ``order``/``source_shape``.
+    """
+    if backend == "auto":
+        backend = select_backend(output_shape, dtype, n_channels, order, source_shape)
+    engine = BACKENDS[backend]
+    if not engine.available() or not engine.supports(order, source_shape):
+        return "skimage"
+    return backend
+
+
+# ----------------------------------------------------------------------
+# Entry point
+# ----------------------------------------------------------------------
+def warp_channels(channels, transform, output_shape, order=1, cval=0.0, clip=True, cache=None, out=None,
+                  backend="auto"):
+    """
+    Warps several equally shaped 2-D channels with one shared transform.
+
+    Parameters:
+        channels (sequence of np.ndarray or np.ndarray): 2-D channels, or a
+            (channels, H, W) stack.
+        transform: skimage geometric transform mapping input -> output coords.
+        output_shape (tuple): (rows, cols) of the warped channels.
+        order (int): Interpolation order (1 = bilinear, warp's default).
+        cval (float): Value used outside the input image.
+        clip (bool): Clip every channel to its input value range.
+        cache (CoordinateCache or None): Reuses coordinate tables across calls.
+        out (np.ndarray or None): Optional float32 (channels, rows, cols) buffer.
+        backend (str): "auto" or one of BACKENDS.
+
+    Returns:
+        np.ndarray: float32 (channels, rows, cols) stack of warped channels.
+    """
+    output_shape = tuple(int(n) for n in output_shape[:2])
+    source_shape = np.shape(channels[0])
+    engine = BACKENDS[resolve_backend(backend, output_shape, np.asarray(channels[0]).dtype, len(channels), order,
+                                      source_shape)]
+    if out is None:
+        out = np.empty((len(channels),) + output_shape, dtype=np.float32)
+
+    engine.warp(channels, transform, output_shape, order, cval, cache, out)
+
+    if clip:
+        for channel, target in zip(channels, out):
+            clip_to_input_range(channel, target, cval)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Tiled, out-of-core warping
+# ----------------------------------------------------------------------
+def _translation(dx, dy):
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+
+
+class _MatrixTransform:
+    """Minimal stand-in for an skimage transform given by a 3x3 matrix."""
+
+    def __init__(self, params):
+        self.params = params
+
+    @property
+    def inverse(self):
+        from skimage.transform import ProjectiveTransform
+
+        return ProjectiveTransform(np.linalg.inv(self.params))
+
+
+def source_window(inverse, rows, cols, source_shape, margin=2):
+    """
+    Returns the (row0, row1, col0, col1) source window read by the output tile
+    rows[0]:rows[1], cols[0]:cols[1], or None if the tile maps outside the source.
+    """
+    xs = np.array([cols[0], cols[1] - 1, cols[0], cols[1] - 1], dtype=np.float64)
+    ys = np.array([rows[0], rows[0], rows[1] - 1, rows[1] - 1], dtype=np.float64)
+    denom = inverse[2, 0] * xs + inverse[2, 1] * ys + inverse[2, 2]
+    src_x = (inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]) / denom
+    src_y = (inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]) / denom
+    row0 = max(int(np.floor(src_y.min())) - margin, 0)
+    row1 = min(int(np.ceil(src_y.max())) + margin + 1, source_shape[0])
+    col0 = max(int(np.floor(src_x.min())) - margin, 0)
+    col1 = min(int(np.ceil(src_x.max())) + margin + 1, source_shape[1])
+    if row0 >= row1 or col0 >= col1:
+        return None
+    return row0, row1, col0, col1
+
+
+def tile_edge_for_budget(n_channels, scale, memory_budget, workers):
+    """
+    Picks a square tile edge whose working set, summed over all worker
+    threads, stays within ``memory_budget`` bytes.
+
+    Per output pixel a tile holds the float32 result, the remap tables, the
+    channels-last remap output and the float32 source window (which shrinks
+    with the transform's area scale).
+    """
+    bytes_per_pixel = 4 * (2 * n_channels + 2) + 4 * n_channels * (1.0 + 1.0 / max(scale, 1e-6))
+    edge = int(np.sqrt(memory_budget / max(workers, 1) / bytes_per_pixel))
+    return int(np.clip(edge, MIN_TILE_EDGE, MAX_TILE_EDGE))
+
+
+def warp_tiled(channels, transform, output_shape, out=None, order=1, cval=0.0, clip=True,
+               memory_budget=DEFAULT_MEMORY_BUDGET, tile_edge=None, workers=None, backend="auto",
+               progress=None):
+    """
+    Warps channels tile by tile into ``out`` with bounded working memory.
+
+    Parameters:
+        channels (sequence of np.ndarray): 2-D source channels; memory-mapped
+            arrays are read window by window.
+        transform: skimage geometric transform mapping input -> output coords.
+        output_shape (tuple): (rows, cols) of the warped channels.
+        out (str, np.ndarray or None): Path of a .npy file to create as a
+            memory-mapped (channels, rows, cols) float32 result, an existing
+            array of that shape, or None for an in-memory result.
+        order, cval, clip, backend: As for :func:`warp_channels`.
+        memory_budget (int): Peak bytes of tile working memory.
+        tile_edge (int or None): Tile edge; derived from the budget if None.
+        workers (int or None): Worker threads (default: CPU count).
+        progress (callable or None): ``progress(done, total)`` after every
+            tile; an exception raised by it stops the remaining tiles and is
+            re-raised (used for cancellation).
+
+    Returns:
+        np.ndarray: The (channels, rows, cols) float32 result (a memmap if
+        ``out`` was a path).
+    """
+    output_shape = tuple(int(n) for n in output_shape[:2])
+    shape = (len(channels),) + output_shape
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    elif isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=np.float32, shape=shape)
+
+    params = np.asarray(transform.params, dtype=np.float64)
+    inverse = np.linalg.inv(params)
+    source_shape = np.shape(channels[0])
+    workers = workers or os.cpu_count() or 1
+    if tile_edge is None:
+        scale = abs(np.linalg.det(params[:2, :2]))
+        tile_edge = tile_edge_for_budget(len(channels), scale, memory_budget, workers)
+    if backend == "auto":
+        backend = select_backend((tile_edge, tile_edge), np.float32, len(channels), order, source_shape)
+
+    tiles = [
+        ((r, min(r + tile_edge, output_shape[0])), (c, min(c + tile_edge, output_shape[1])))
+        for r in range(0, output_shape[0], tile_edge)
+        for c in range(0, output_shape[1], tile_edge)
+    ]
+
+    stop = threading.Event()
+    done = [0]
+    lock = threading.Lock()
+
+    def report():
+        if progress is None:
+            return
+        with lock:
+            done[0] += 1
+            count = done[0]
+        try:
+            progress(count, len(tiles))
+        except BaseException:
+            stop.set()
+            raise
+
+    def run(tile):
+        if stop.is_set():
+            return cval, cval
+        rows, cols = tile
+        target = out[:, rows[0]:rows[1], cols[0]:cols[1]]
+        window = source_window(inverse, rows, cols, source_shape, margin=max(order, 1) + 1)
+        if window is None:
+            target[...] = cval
+            report()
+            return cval, cval
+        row0, row1, col0, col1 = window
+        crops = [np.asarray(channel[row0:row1, col0:col1], dtype=np.float32) for channel in channels]
+        # Output tile coords -> global output -> global source -> source window.
+        local = _translation(-cols[0], -rows[0]) @ params @ _translation(col0, row0)
+        warped = warp_channels(crops, _MatrixTransform(local), (rows[1] - rows[0], cols[1] - cols[0]),
+                               order=order, cval=cval, clip=False, backend=backend)
+        target[...] = warped
+        report()
+        # fmin/fmax skip NaNs without warning about all-NaN tiles.
+        return np.fmin.reduce(warped, axis=(1, 2)), np.fmax.reduce(warped, axis=(1, 2))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        extrema = list(pool.map(run, tiles))
+
+    if clip:
+        # Same clip rule as warp, evaluated on the global input and output ranges.
+        out_min = np.fmin.reduce([np.broadcast_to(low, len(channels)) for low, _ in extrema], axis=0)
+        out_max = np.fmax.reduce([np.broadcast_to(high, len(channels)) for _, high in extrema], axis=0)
+        ranges = [
+            clip_range(np.nanmin(channel), np.nanmax(channel), out_min[k], out_max[k], cval)
+            for k, channel in enumerate(channels)
+        ]
+        if any(out_min[k] < low or out_max[k] > high for k, (low, high) in enumerate(ranges)):
+            def clip_tile(tile):
+                rows, cols = tile
+                for k, (low, high) in enumerate(ranges):
+                    view = out[k, rows[0]:rows[1], cols[0]:cols[1]]
+                    np.clip(view, low, high, out=view)
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(clip_tile, tiles))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out